@@ -1,23 +1,283 @@
 # adder_plain.py
-# Cuccaro ripple-carry não-modular, |b⟩ --> |b + const⟩
-from qiskit import QuantumCircuit, QuantumRegister
-
-def adder_n(n_bits, const):
-    """Adder XOR-in-place (Cuccaro 2004) - Toffoli ~ 2*n_bits"""
-    a = QuantumRegister(n_bits, "b")
-    cin = QuantumRegister(1,     "cin")   ### carry-in/out (extra qubit)
-    qc = QuantumCircuit(a, cin, name=f"add{const}")
-
-    ### Propagate
-    for i in range(n_bits-1):
-        qc.ccx(a[i], cin[0], a[i+1])
-        qc.cx(a[i], cin[0])
-    ### Add constant bits
-    for i in range(n_bits):
-        if (const >> i) & 1:
-            qc.cx(cin[0], a[i])
-    ### Un-propagate
-    for i in reversed(range(n_bits-1)):
-        qc.cx(a[i], cin[0])
-        qc.ccx(a[i], cin[0], a[i+1])
+# Somadores ripple-carry não-modulares (sem QFT, só X / CX / CCX), com cada carry num
+# AND temporário (Gidney 2018, "Halving the cost of quantum addition").
+#
+#   carry c_{i+1} = MAJ(b_i, t_i, c_i), t_i = bit i da parcela (0, 1 ou um qubit):
+#       t_i = 0      --> c_{i+1} = b_i AND c_i                               (1 Toffoli)
+#       t_i = 1      --> c_{i+1} = b_i OR c_i = NOT(NOT b_i AND NOT c_i)     (1 Toffoli)
+#       t_i = qubit  --> c_{i+1} = c_i ⊕ ((b_i ⊕ c_i) AND (t_i ⊕ c_i))       (1 Toffoli)
+#   enquanto não há carry (bits baixos com t_i = 0) nada é calculado.
+#   Ida: c_1 .. c_{n-1} em ancillas limpas. Volta, do bit mais alto para o mais baixo:
+#   b_i ^= c_i ⊕ t_i e o AND de c_i é desfeito:
+#       mbu=False: Toffoli inverso (circuito unitário, vira Gate)
+#       mbu=True : medida na base X + CZ condicionado (0 Toffolis --> <= n - 1 no total);
+#                  o circuito ganha o clbit "m" e tem if_test: usar com compose
+#
+#   adder_n              b --> b + const mod 2^n        (controlado: b + c*const)
+#   adder_qq_ripple      b --> b + a mod 2^n_out
+#   adder_mod_qq_ripple  b --> b + a mod N  (a, b < N), mesma sequência do adder_mod_qq
+from qiskit import QuantumCircuit, QuantumRegister, ClassicalRegister
+from gate_cache import cached_gate
+
+
+def _unand(qc, u, v, tgt, m):
+    """Desfaz tgt = u AND v (Toffoli inverso, ou medição se m for um clbit)."""
+    if m is None:
+        qc.ccx(u, v, tgt)
+        return
+    ### resultado 1 --> fase (-1)^(u v), corrigida pelo CZ
+    qc.h(tgt)
+    qc.measure(tgt, m)
+    with qc.if_test((m, 1)):
+        qc.cz(u, v)
+        qc.x(tgt)
+
+
+def _ripple(qc, b, addend, carry, m=None):
+    """
+    b += addend (mod 2^len(b)) no circuito qc.
+    addend[i]: 0, 1 ou um qubit (bit i da parcela). carry: len(b) - 1 qubits limpos, voltam a 0.
+    m: clbit do uncompute por medição (None: Toffoli inverso).
+    """
+    n = len(b)
+    c_in = [None] * n              ### carry que entra no bit i (None = 0)
+    steps = [None] * n             ### como carry[i] = c_{i+1} foi calculado
+
+    ### ida: carries
+    for i in range(n - 1):
+        t, c, tgt = addend[i], c_in[i], carry[i]
+        if c is None:
+            if isinstance(t, int) and t == 0:
+                continue
+            if isinstance(t, int):
+                qc.cx(b[i], tgt)                                  ### c_1 = b_i
+                steps[i] = "copy"
+            else:
+                qc.ccx(b[i], t, tgt)
+                steps[i] = "and"
+        elif isinstance(t, int) and t == 0:
+            qc.ccx(b[i], c, tgt)
+            steps[i] = "and"
+        elif isinstance(t, int):
+            qc.x([b[i], c])
+            qc.ccx(b[i], c, tgt)
+            qc.x([b[i], c, tgt])
+            steps[i] = "or"
+        else:
+            qc.cx(c, b[i])
+            qc.cx(c, t)
+            qc.ccx(b[i], t, tgt)
+            qc.cx(c, tgt)
+            qc.cx(c, t)
+            qc.cx(c, b[i])
+            steps[i] = "maj"
+        c_in[i + 1] = tgt
+
+    ### volta: soma do bit i (com b_{i'} < i ainda originais) e desfaz o carry de baixo
+    for i in reversed(range(n)):
+        if i < n - 1:
+            t, c, tgt = addend[i], c_in[i], carry[i]
+            u = t if c is None else c
+            if steps[i] == "copy":
+                qc.cx(b[i], tgt)
+            elif steps[i] == "and":
+                _unand(qc, b[i], u, tgt, m)
+            elif steps[i] == "or":
+                qc.x([b[i], c, tgt])
+                _unand(qc, b[i], c, tgt, m)
+                qc.x([b[i], c])
+            elif steps[i] == "maj":
+                qc.cx(c, b[i])
+                qc.cx(c, t)
+                qc.cx(c, tgt)
+                _unand(qc, b[i], t, tgt, m)
+                qc.cx(c, t)
+                qc.cx(c, b[i])
+        t = addend[i]
+        if c_in[i] is not None:
+            qc.cx(c_in[i], b[i])
+        if isinstance(t, int):
+            if t:
+                qc.x(b[i])
+        else:
+            qc.cx(t, b[i])
+
+
+def adder_n(n_bits, const, controlado=False, mbu=False):
+    """Retorna o somador ripple-carry de uma constante: b --> b + const mod 2^n_bits.
+
+    Parametros:
+    n_bits : int
+        Número de bits de b.
+    const : int
+        Constante clássica somada (reduzida mod 2^n_bits).
+    controlado : bool
+        Se True soma const só com o qubit de controle "c" em 1.
+    mbu : bool
+        Desfaz os ANDs por medição (n_bits - 1 Toffolis no máximo, em vez de 2(n_bits - 1)).
+        O circuito ganha o registrador clássico "m" e tem if_test (sem versão _gate).
+
+    Retorna:
+    QuantumCircuit
+    circuito montado com os registradores nessa ordem:
+        (registrador_controle "c" (1 bit) se controlado)
+        registrador_operando "b" (n_bits)
+        registrador "carry" (n_bits - 1), volta a 0
+    """
+    reg_c = QuantumRegister(1 if controlado else 0, "c")
+    reg_b = QuantumRegister(n_bits, "b")
+    carry = QuantumRegister(max(n_bits - 1, 0), "carry")
+    qc = QuantumCircuit(reg_c, reg_b, carry, name=f"{'c_' if controlado else ''}add{const}")
+    m = None
+    if mbu:
+        m = ClassicalRegister(1, "m")
+        qc.add_register(m)
+        m = m[0]
+
+    bit = reg_c[0] if controlado else 1
+    _ripple(qc, reg_b, [bit if (const >> i) & 1 else 0 for i in range(n_bits)], carry, m)
     return qc
+
+
+def adder_qq_ripple(n_bits, n_out=None, mbu=False):
+    """Retorna o somador ripple-carry com os dois operandos quânticos: b --> b + a mod 2^n_out.
+
+    Parametros:
+    n_bits : int
+        Número de bits de a.
+    n_out : int
+        Número de bits de b (default n_bits + 1: o último bit é o carry-out).
+    mbu : bool
+        Desfaz os ANDs por medição (ver adder_n).
+
+    Retorna:
+    QuantumCircuit
+    circuito montado com os registradores a (n_bits), b (n_out) e carry (n_out - 1)
+    """
+    n_out = n_bits + 1 if n_out is None else n_out
+    reg_a = QuantumRegister(n_bits, "a")
+    reg_b = QuantumRegister(n_out, "b")
+    carry = QuantumRegister(n_out - 1, "carry")
+    qc = QuantumCircuit(reg_a, reg_b, carry, name="qq_ripple_adder")
+    m = None
+    if mbu:
+        m = ClassicalRegister(1, "m")
+        qc.add_register(m)
+        m = m[0]
+
+    _ripple(qc, reg_b, [reg_a[i] if i < n_bits else 0 for i in range(n_out)], carry, m)
+    return qc
+
+
+def adder_mod_qq_ripple(n_bits, N, mbu=False):
+    """Retorna o Adder Modular registrador-registrador ripple-carry: b --> a + b mod N.
+
+    Mesma sequência do adder_mod_qq (draperqftadder_adapt.py), na base computacional e
+    com as subtrações feitas por complemento (b - k = NOT(NOT b + k)):
+        b += a, b -= N, cx(cout, anc), b += N controlado por anc,
+        b -= a, cx(cout, anc) com controle em 0, b += a
+    Entradas válidas: a, b < N. Sem rotações: ~5 n_bits Toffolis (mbu=True), o dobro sem.
+
+    Parametros:
+    n_bits : int
+        Número de bits dos operandos.
+    N : int
+        Módulo.
+    mbu : bool
+        Desfaz os ANDs por medição (ver adder_n).
+
+    Retorna:
+    QuantumCircuit
+    circuito montado com os registradores nessa ordem:
+        a (n_bits), b (n_bits), cout (1), anc (1), carry (n_bits)
+    """
+    reg_a = QuantumRegister(n_bits, "a")
+    reg_b = QuantumRegister(n_bits, "b")
+    reg_cout = QuantumRegister(1, "cout")
+    reg_anc = QuantumRegister(1, "anc")
+    carry = QuantumRegister(n_bits, "carry")
+    qc = QuantumCircuit(reg_a, reg_b, reg_cout, reg_anc, carry, name="qq_ripple_adder_mod")
+    m = None
+    if mbu:
+        m = ClassicalRegister(1, "m")
+        qc.add_register(m)
+        m = m[0]
+
+    bb = reg_b[:] + reg_cout[:]
+    a_bits = reg_a[:] + [0]
+    N_bits = [(N >> i) & 1 for i in range(n_bits + 1)]
+
+    _ripple(qc, bb, a_bits, carry, m)                             ### b += a
+    qc.x(bb)
+    _ripple(qc, bb, N_bits, carry, m)                             ### b -= N
+    qc.x(bb)
+    qc.cx(reg_cout[0], reg_anc[0])                                ### anc = (a + b < N)
+    _ripple(qc, bb, [reg_anc[0] if x else 0 for x in N_bits], carry, m)   ### b += N se anc
+    qc.x(bb)
+    _ripple(qc, bb, a_bits, carry, m)                             ### b -= a: negativo <=> anc = 0
+    qc.x(bb)
+    qc.cx(reg_cout[0], reg_anc[0], ctrl_state=0)
+    _ripple(qc, bb, a_bits, carry, m)                             ### b += a
+    return qc
+
+
+def adder_n_gate(n_bits, const, controlado=False, inverse=False):
+    """Versão em cache de adder_n (mbu=False), já convertida em porta (ou na sua inversa)."""
+    key = ("adder_n", n_bits, const % (1 << n_bits), controlado, inverse)
+    if inverse:
+        return cached_gate(key, lambda: adder_n_gate(n_bits, const, controlado).inverse())
+    return cached_gate(key, lambda: adder_n(n_bits, const, controlado).to_gate())
+
+
+def adder_qq_ripple_gate(n_bits, n_out=None, inverse=False):
+    """Versão em cache de adder_qq_ripple (mbu=False), já convertida em porta (ou na sua inversa)."""
+    n_out = n_bits + 1 if n_out is None else n_out
+    key = ("adder_qq_ripple", n_bits, n_out, inverse)
+    if inverse:
+        return cached_gate(key, lambda: adder_qq_ripple_gate(n_bits, n_out).inverse())
+    return cached_gate(key, lambda: adder_qq_ripple(n_bits, n_out).to_gate())
+
+
+def adder_mod_qq_ripple_gate(n_bits, N, inverse=False):
+    """Versão em cache de adder_mod_qq_ripple (mbu=False), já convertida em porta (ou na sua inversa)."""
+    key = ("adder_mod_qq_ripple", n_bits, N, inverse)
+    if inverse:
+        return cached_gate(key, lambda: adder_mod_qq_ripple_gate(n_bits, N).inverse())
+    return cached_gate(key, lambda: adder_mod_qq_ripple(n_bits, N).to_gate())
+
+
+if __name__ == "__main__":
+    from qiskit import transpile
+    from qiskit_aer import AerSimulator
+    from qrom import toffoli_count
+
+    ### uncompute por medição == Toffoli inverso: entradas em |+⟩, soma com medida, inversa
+    ### unitária, H de novo --> tudo volta a 0 em todos os shots
+    backend = AerSimulator()
+    for label, mbu_qc, gate in (("adder_n(4, 11, controlado)", adder_n(4, 11, True, mbu=True), adder_n_gate(4, 11, True, inverse=True)),
+                                ("adder_qq_ripple(3, 4)", adder_qq_ripple(3, 4, mbu=True), adder_qq_ripple_gate(3, 4, inverse=True)),
+                                ("adder_mod_qq_ripple(3, 7)", adder_mod_qq_ripple(3, 7, mbu=True), None)):
+        res = ClassicalRegister(mbu_qc.num_qubits, "res")
+        qc = QuantumCircuit(*mbu_qc.qregs, *mbu_qc.cregs, res)
+        n_in = mbu_qc.num_qubits - len(mbu_qc.qregs[-1])
+        if gate is None:
+            ### adder_mod: entradas válidas só a, b < N --> a e b em |+⟩ nos 2 bits baixos
+            ins = mbu_qc.qregs[0][:2] + mbu_qc.qregs[1][:2]
+            gate = adder_mod_qq_ripple_gate(3, 7, inverse=True)
+        else:
+            ins = qc.qubits[:n_in]
+        qc.h(ins)
+        qc.compose(mbu_qc, inplace=True)
+        qc.append(gate, qc.qubits)
+        qc.h(ins)
+        qc.measure(qc.qubits, res)
+        counts = backend.run(transpile(qc, backend), shots=512).result().get_counts()
+        zeros = sum(v for key, v in counts.items() if int(key.split()[0], 2) == 0)
+        assert zeros == 512, (label, counts)
+        print(f"{label:28s} AND desfeito por medição: P(0) = {zeros / 512:.3f}")
+
+    ### Toffolis: Toffoli inverso vs medição
+    for n in (8, 16, 32):
+        const = (0xB5A3C7E1 >> (32 - n)) | 1
+        print(f"adder_n n = {n:2d}: {toffoli_count(adder_n(n, const)):3d} Toffolis (unitário), "
+              f"{toffoli_count(adder_n(n, const, mbu=True)):3d} com medição")
@@ -0,0 +1,312 @@
+# benchmark.py
+#
+# Benchmark dos builders (construção, transpile para o AerSimulator e simulação)
+# para uma grade de módulos N, bases e janelas, com saída em JSON.
+#
+#   python benchmark.py run --bits 4 6 8 --out base.json
+#   python benchmark.py run --bits 4 6 8 --out novo.json --compare base.json
+#   python benchmark.py compare base.json novo.json --threshold 0.25
+#
+#   O compare termina com código 1 se algum builder piorar mais que threshold
+#   (relativo) em tempo, memória, profundidade ou nº de portas.
+#
+#   Medidas por caso:
+#       build_s / transpile_s / sim_s : tempo de parede, numa execução sem tracemalloc
+#                   (cache de portas zerado antes do build)
+#       peak_mb   : aumento do RSS do processo durante build + transpile, na mesma execução
+#                   dos tempos (no qiskit 2 o CircuitData e quase todo o transpile ficam em
+#                   Rust, invisíveis ao tracemalloc): ru_maxrss + amostragem de /proc/self/statm
+#       py_peak_mb: pico de memória Python (tracemalloc) de build + transpile, medido numa
+#                   segunda execução (o tracing deixa o build ~5x mais lento)
+#       sim_mb    : aumento do RSS durante a simulação (memória nativa do Aer), como peak_mb
+#       qubits, depth, size, ops : circuito transpilado
+#       toffoli, cnot, rotations : contagem lógica (resources.count_circuit)
+#   A simulação (statevector) só roda até --max-sim-qubits.
+
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import threading
+import tracemalloc
+from datetime import datetime, timezone
+from math import gcd
+from time import perf_counter
+
+import qiskit
+from qiskit import QuantumCircuit, transpile
+from qiskit_aer import AerSimulator
+
+from gate_cache import cache_clear
+from draperqftadder_adapt import adder_mod
+from ctrl_mult_mod import ctrl_mult_mod
+from expmod import expmod
+from expmod_windowed import expmod_windowed
+from qrom import qrom
+from resources import count_circuit
+
+BUILDERS = ("adder_mod", "ctrl_mult_mod", "expmod", "expmod_windowed", "qrom")
+METRICS = ("build_s", "transpile_s", "sim_s", "peak_mb", "py_peak_mb", "sim_mb", "depth", "size")
+
+
+def modulus(bits, base):
+    """Primeiro N ímpar com 'bits' bits, coprimo da base e > base."""
+    N = (1 << (bits - 1)) + 1
+    while gcd(N, base) != 1 or N <= base:
+        N += 2
+    return N
+
+
+def cases(bits_list, bases, windows, n_exp, builders):
+    """Gera (builder, params, função que monta o circuito), sem casos repetidos."""
+    seen = set()
+    for builder, params, build in _all_cases(bits_list, bases, windows, n_exp, builders):
+        key = case_key(builder, params)
+        if key not in seen:
+            seen.add(key)
+            yield builder, params, build
+
+
+def _all_cases(bits_list, bases, windows, n_exp, builders):
+    for bits in bits_list:
+        for base in bases:
+            N = modulus(bits, base)
+            n = N.bit_length()
+            a = pow(base, 2, N)
+            if "adder_mod" in builders:
+                yield "adder_mod", dict(n_bits=n, a=a, N=N, control_number=2), \
+                    lambda n=n, a=a, N=N: adder_mod(n, a, N, controlado=True, control_number=2)
+            if "ctrl_mult_mod" in builders:
+                yield "ctrl_mult_mod", dict(n_bits=n, a=a, N=N), \
+                    lambda n=n, a=a, N=N: ctrl_mult_mod(n, a, N)
+            if "expmod" in builders:
+                yield "expmod", dict(N=N, base=base, n_exp=n_exp), \
+                    lambda N=N, base=base: expmod(N, base, n_exp)
+            for c_exp, c_mul in windows:
+                if "expmod_windowed" in builders:
+                    yield "expmod_windowed", dict(N=N, base=base, n_exp=n_exp, c_exp=c_exp, c_mul=c_mul), \
+                        lambda N=N, base=base, ce=c_exp, cm=c_mul: expmod_windowed(N, base, n_exp, ce, cm)
+        ### qrom não depende da base: uma tabela por janela
+        if "qrom" in builders:
+            N = modulus(bits, bases[0])
+            for c_mul in sorted({cm for _, cm in windows}):
+                L = 1 << c_mul
+                table = [(k * bases[0]) % N for k in range(L)]
+                yield "qrom", dict(L=L, w_bits=N.bit_length() + 1), \
+                    lambda t=table, w=N.bit_length() + 1: qrom(t, w)
+
+
+def case_key(builder, params):
+    return builder + " " + " ".join(f"{k}={v}" for k, v in params.items())
+
+
+def _rss_mb():
+    """RSS atual do processo (MB), de /proc/self/statm; None fora do Linux."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return None
+
+
+def _maxrss_mb():
+    """Pico de RSS do processo até agora (ru_maxrss: KB no Linux, bytes no macOS)."""
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / 2**20 if sys.platform == "darwin" else maxrss / 2**10
+
+
+def native_peak(fn, interval=0.005):
+    """Roda fn() e devolve o aumento de RSS (MB) durante a chamada.
+
+    ru_maxrss só sobe (é o pico do processo inteiro), então ele só é exato quando fn
+    passa do pico anterior; por isso uma thread também amostra o RSS atual a cada
+    interval segundos (o Aer solta o GIL durante a simulação).
+    """
+    base, max_before = _rss_mb(), _maxrss_mb()
+    peak = [base or 0.0]
+    done = threading.Event()
+
+    def sample():
+        while not done.wait(interval):
+            peak[0] = max(peak[0], _rss_mb() or 0.0)
+
+    sampler = threading.Thread(target=sample, daemon=True) if base is not None else None
+    if sampler:
+        sampler.start()
+    try:
+        fn()
+    finally:
+        done.set()
+        if sampler:
+            sampler.join()
+    max_after = _maxrss_mb()
+    if base is None:
+        return max(0.0, max_after - max_before)
+    top = max(peak[0], _rss_mb(), max_after if max_after > max_before else 0.0)
+    return max(0.0, top - base)
+
+
+def _prepare(builder, qc):
+    """Circuito medido que vai para o transpile/simulação."""
+    circ = QuantumCircuit(*qc.qregs)
+    if builder == "expmod":
+        circ.h(qc.qregs[0])                 ### expoente em superposição
+    circ.compose(qc, inplace=True)
+    circ.measure_all()
+    return circ
+
+
+def run_case(builder, params, build, backend, max_sim_qubits, shots, do_transpile):
+    """Mede um caso; devolve o dicionário que vai para o JSON."""
+    res = {"builder": builder, "params": params, "key": case_key(builder, params)}
+
+    ### tempos e aumento do RSS de build + transpile, sem tracemalloc
+    cache_clear()
+    built = {}
+
+    def build_and_transpile():
+        t0 = perf_counter()
+        built["qc"] = build()
+        res["build_s"] = perf_counter() - t0
+        built["tcirc"] = _prepare(builder, built["qc"])
+        res["transpile_s"] = None
+        if do_transpile:
+            t0 = perf_counter()
+            built["tcirc"] = transpile(built["tcirc"], backend)
+            res["transpile_s"] = perf_counter() - t0
+
+    res["peak_mb"] = native_peak(build_and_transpile)
+    qc, tcirc = built["qc"], built["tcirc"]
+
+    logical = count_circuit(qc)
+    res.update(toffoli=logical.toffoli, cnot=logical.cnot, rotations=logical.rotations)
+
+    res["sim_s"] = res["sim_mb"] = None
+    if do_transpile and qc.num_qubits <= max_sim_qubits:
+        t0 = perf_counter()
+        res["sim_mb"] = native_peak(lambda: backend.run(tcirc, shots=shots).result())
+        res["sim_s"] = perf_counter() - t0
+
+    ### pico de memória Python de build + transpile, numa execução separada com tracemalloc
+    cache_clear()
+    tracemalloc.start()
+    try:
+        traced = _prepare(builder, build())
+        if do_transpile:
+            transpile(traced, backend)
+        res["py_peak_mb"] = tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+    del traced
+
+    res["qubits"] = qc.num_qubits
+    res["depth"] = tcirc.depth()
+    res["size"] = tcirc.size()
+    res["ops"] = {k: int(v) for k, v in tcirc.count_ops().items()}
+    return res
+
+
+def run(args):
+    backend = AerSimulator()
+    windows = [tuple(int(c) for c in w.split("x")) for w in args.windows]
+    results = []
+    ### aquecimento (imports preguiçosos do qiskit/aer não entram no primeiro caso)
+    run_case("qrom", {}, lambda: qrom([1, 2, 3, 0], 2), backend, args.max_sim_qubits, 1, not args.no_transpile)
+    for builder, params, build in cases(args.bits, args.bases, windows, args.n_exp, args.builders):
+        r = run_case(builder, params, build, backend, args.max_sim_qubits, args.shots, not args.no_transpile)
+        results.append(r)
+        sim = f"{r['sim_s']:.3f}" if r["sim_s"] is not None else "-"
+        tr = f"{r['transpile_s']:.3f}" if r["transpile_s"] is not None else "-"
+        sim_mb = f"{r['sim_mb']:.1f}" if r["sim_mb"] is not None else "-"
+        print(f"{r['key']:60s} build {r['build_s']:8.3f}s  transpile {tr:>8s}s  sim {sim:>8s}s  "
+              f"{r['peak_mb']:8.1f} MB (py {r['py_peak_mb']:.1f})  sim {sim_mb:>7s} MB  q={r['qubits']:3d}  depth={r['depth']}")
+
+    data = {
+        "meta": {
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "qiskit": qiskit.__version__,
+            "machine": platform.machine(),
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(data, f, indent=1)
+    if args.compare:
+        with open(args.compare) as f:
+            return compare(json.load(f), data, args.threshold, args.min_seconds, args.min_mb)
+    return 0
+
+
+def compare(base, new, threshold=0.25, min_seconds=0.05, min_mb=5.0):
+    """
+    Compara dois resultados de benchmark (mesma chave de caso).
+    Uma métrica regride se new > base * (1 + threshold); tempos abaixo de
+    min_seconds nos dois lados são ignorados (ruído), assim como memórias abaixo de min_mb.
+    Retorna 1 se houve regressão, senão 0.
+    """
+    old = {r["key"]: r for r in base["results"]}
+    regressions = 0
+    for r in new["results"]:
+        b = old.get(r["key"])
+        if b is None:
+            print(f"{r['key']:60s} (novo, sem baseline)")
+            continue
+        worse = []
+        for m in METRICS:
+            x, y = b.get(m), r.get(m)
+            if x is None or y is None:
+                continue
+            if m.endswith("_s") and max(x, y) < min_seconds:
+                continue
+            if m.endswith("_mb") and max(x, y) < min_mb:
+                continue
+            if y > x * (1 + threshold) and y - x > 1e-12:
+                worse.append(f"{m} {x:.4g} -> {y:.4g} ({(y / x - 1) * 100 if x else float('inf'):+.0f}%)")
+        if worse:
+            regressions += 1
+            print(f"{r['key']:60s} REGRESSÃO: " + ", ".join(worse))
+        else:
+            print(f"{r['key']:60s} ok")
+    print(f"{regressions} caso(s) com regressão (threshold {threshold:.0%})")
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Benchmark dos builders aritméticos")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    r = sub.add_parser("run", help="roda a grade e grava o JSON")
+    r.add_argument("--bits", type=int, nargs="+", default=[4, 5, 6], help="tamanhos de N em bits (4-30)")
+    r.add_argument("--bases", type=int, nargs="+", default=[2, 7])
+    r.add_argument("--windows", nargs="+", default=["2x2", "3x3"], help="pares c_expxc_mul")
+    r.add_argument("--n-exp", type=int, default=4, help="qubits do expoente em expmod/expmod_windowed")
+    r.add_argument("--builders", nargs="+", default=list(BUILDERS), choices=BUILDERS)
+    r.add_argument("--max-sim-qubits", type=int, default=20)
+    r.add_argument("--shots", type=int, default=1, help="shots da simulação (circuitos com reset simulam shot a shot)")
+    r.add_argument("--no-transpile", action="store_true", help="só construção (sem transpile/simulação)")
+    r.add_argument("--out", help="arquivo JSON de saída")
+    r.add_argument("--compare", help="baseline JSON para comparar ao final")
+    r.add_argument("--threshold", type=float, default=0.25)
+    r.add_argument("--min-seconds", type=float, default=0.05)
+    r.add_argument("--min-mb", type=float, default=5.0)
+
+    c = sub.add_parser("compare", help="compara dois JSON (baseline, novo)")
+    c.add_argument("baseline")
+    c.add_argument("new")
+    c.add_argument("--threshold", type=float, default=0.25)
+    c.add_argument("--min-seconds", type=float, default=0.05)
+    c.add_argument("--min-mb", type=float, default=5.0)
+
+    args = p.parse_args(argv)
+    if args.cmd == "run":
+        return run(args)
+    with open(args.baseline) as f, open(args.new) as g:
+        return compare(json.load(f), json.load(g), args.threshold, args.min_seconds, args.min_mb)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+# coset.py
+#
+# Representação em coset (Zalka 2006; Gidney, "Approximate encoded permutations and
+# piecewise quantum adders", 2019) para a aritmética mod N.
+#
+#   x mod N fica num registrador de n_bits + m qubits (m = coset_bits, de "padding") como
+#       |x⟩_coset = 2^(-m/2) Σ_{j < 2^m} |x + jN⟩
+#   Somar uma constante c < N mod N vira uma soma comum mod 2^(n+m) (um draper_adder):
+#   x + c + jN é o coset de (x + c) mod N com j deslocado de no máximo 1, e só a parcela
+#   da borda (j = 2^m - 1 dando a volta em 2^(n+m), ou j = 0 numa subtração) fica errada.
+#   Desvio <= 2^-m por soma (coset_deviation), sem comparação, sem IQFT/QFT no meio,
+#   sem ancilla de carry.
+#
+#   Usado pelos builders com coset_bits = m > 0 (ctrl_mult_mod, mult_mod_windowed,
+#   expmod, expmod_windowed): os registradores aritméticos passam a ter n_bits + m
+#   qubits e o valor lido no fim é reduzido mod N classicamente.
+#
+#   coset_init prepara o coset de uma constante a partir de |0⟩:
+#       H nos m qubits baixos                           --> Σ_j |j⟩
+#       multiplicação in-place por N (ímpar) mod 2^(n+m): para i = m-1 .. 0, soma
+#       (N - 1) * 2^i controlada pelo bit i (não altera os bits <= i)  --> Σ_j |jN⟩
+#       + value                                          --> Σ_j |value + jN⟩
+
+from qiskit import QuantumCircuit, QuantumRegister
+from draperqftadder_adapt import qft_gate, draper_adder_gate, qft_error, draper_adder_error
+from gate_cache import cached_gate
+
+
+def coset_init(n_bits, N, coset_bits, value=0, min_angle=0.0):
+    """Retorna o circuito |0⟩ --> |value⟩_coset num registrador de n_bits + coset_bits qubits.
+
+    Parametros:
+    n_bits : int
+        Número de bits de N.
+    N : int
+        Módulo (ímpar).
+    coset_bits : int
+        Qubits de padding m (desvio <= 2^-m por soma modular).
+    value : int
+        Constante clássica (< N) representada.
+    min_angle : float
+        Rotações menores que min_angle são descartadas nas QFTs e nos adders (modo aproximado).
+
+    Retorna:
+    QuantumCircuit
+    circuito montado com o registrador "x" (n_bits + coset_bits qubits).
+    """
+    if N % 2 == 0:
+        raise ValueError("coset_init: N precisa ser ímpar")
+    w = n_bits + coset_bits
+    reg = QuantumRegister(w, "x")
+    qc = QuantumCircuit(reg, name=f"coset{value}")
+
+    qc.h(reg[:coset_bits])
+
+    # x --> x * N mod 2^w, do bit mais alto de j para o mais baixo
+    for i in reversed(range(coset_bits)):
+        sub = reg[i + 1:]
+        qc.append(qft_gate(len(sub), min_angle=min_angle), sub)
+        qc.append(draper_adder_gate(len(sub) - 1, (N - 1) // 2, controlado=True, min_angle=min_angle),
+                  reg[i:i + 1] + sub)
+        qc.append(qft_gate(len(sub), inverse=True, min_angle=min_angle), sub)
+
+    if value % N:
+        qc.append(qft_gate(w, min_angle=min_angle), reg)
+        qc.append(draper_adder_gate(w - 1, value % N, min_angle=min_angle), reg)
+        qc.append(qft_gate(w, inverse=True, min_angle=min_angle), reg)
+
+    return qc
+
+
+def coset_init_gate(n_bits, N, coset_bits, value=0, inverse=False, min_angle=0.0):
+    """Versão em cache de coset_init, já convertida em porta (ou na sua inversa)."""
+    key = ("coset_init", n_bits, N, coset_bits, value % N, inverse, min_angle)
+    if inverse:
+        return cached_gate(key, lambda: coset_init_gate(n_bits, N, coset_bits, value, min_angle=min_angle).inverse())
+    return cached_gate(key, lambda: coset_init(n_bits, N, coset_bits, value, min_angle).to_gate())
+
+
+def coset_init_error(n_bits, N, coset_bits, value=0, min_angle=0.0):
+    """Cota do erro de rotação (norma) do coset_init aproximado."""
+    if min_angle <= 0:
+        return 0.0
+    err = 0.0
+    for i in range(coset_bits):
+        L = n_bits + coset_bits - i - 1
+        err += 2 * qft_error(L, min_angle) + draper_adder_error(L - 1, (N - 1) // 2, min_angle)
+    if value % N:
+        w = n_bits + coset_bits
+        err += 2 * qft_error(w, min_angle) + draper_adder_error(w - 1, value % N, min_angle)
+    return err
+
+
+def coset_deviation(n_adds, coset_bits):
+    """Cota do desvio (distância do estado ideal) depois de n_adds somas de constantes < N."""
+    return min(1.0, n_adds * 2.0**-coset_bits)
+
+
+def coset_metadata(metadata, n_adds, coset_bits):
+    """metadata (approx_metadata) + "coset_deviation" quando coset_bits > 0."""
+    if coset_bits:
+        metadata = dict(metadata, coset_deviation=coset_deviation(n_adds, coset_bits))
+    return metadata
+
+
+if __name__ == "__main__":
+    import numpy as np
+    from qiskit.quantum_info import Statevector
+
+    ### coset_init == Σ_j |value + jN⟩ / 2^(m/2)
+    for n_bits, N, m, value in ((3, 5, 2, 0), (4, 13, 3, 1), (4, 11, 4, 7), (5, 21, 3, 20)):
+        w = n_bits + m
+        want = np.zeros(1 << w)
+        want[[value + j * N for j in range(1 << m)]] = 2 ** (-m / 2)
+        sv = Statevector(coset_init(n_bits, N, m, value))
+        assert sv.equiv(Statevector(want)), (n_bits, N, m, value)
+        print(f"coset_init n = {n_bits} N = {N:2d} m = {m} value = {value:2d}: ok")
+
+    ### expmod em coset (Aer, com os coset_init de verdade): x em |+⟩, b medido mod N
+    from qiskit import ClassicalRegister, transpile
+    from qiskit_aer import AerSimulator
+    from expmod import expmod
+
+    backend = AerSimulator()
+    N, base, n_exp, m = 5, 2, 2, 7
+    qc = expmod(N, base, n_exp, coset_bits=m)
+    cx, cb = ClassicalRegister(n_exp, "cx"), ClassicalRegister(len(qc.qregs[1]), "cb")
+    full = qc.copy_empty_like()
+    full.add_register(cx)
+    full.add_register(cb)
+    full.h(qc.qregs[0])
+    full.compose(qc, inplace=True)
+    full.measure(qc.qregs[0], cx)
+    full.measure(qc.qregs[1], cb)
+    counts = backend.run(transpile(full, backend), shots=2048).result().get_counts()
+    good = sum(v for key, v in counts.items()
+               if int(key.split()[0], 2) % N == pow(base, int(key.split()[1], 2), N))
+    dev = qc.metadata["coset_deviation"]
+    print(f"expmod({N}, {base}, {n_exp}) coset m = {m}: P(b mod N correto) = {good / 2048:.3f}  (cota 1 - {dev:.3f})")
+    assert good / 2048 >= 1 - dev
+
+    ### portas em cx/u: adder_mod (comparação) vs coset (soma comum), e modelo em 2048 bits
+    from ctrl_mult_mod import ctrl_mult_mod
+    from resources import estimate_expmod, estimate_expmod_windowed
+
+    for n_bits, a, N in ((6, 40, 55), (8, 100, 251)):
+        for m in (0, 4, 8):
+            tqc = transpile(ctrl_mult_mod(n_bits, a, N, coset_bits=m), basis_gates=["cx", "u"], optimization_level=1)
+            print(f"ctrl_mult_mod n = {n_bits} m = {m}: {tqc.num_qubits:3d} qubits  {tqc.count_ops().get('cx', 0):6d} cx  "
+                  f"profundidade {tqc.depth():6d}")
+
+    N = (1 << 2047) + 1234567
+    for m in (0, 32, 64):
+        r = estimate_expmod(N, 3, 4096, coset_bits=m)
+        rw = estimate_expmod_windowed(N, 3, 4096, 5, 5, coset_bits=m)
+        print(f"N 2048 bits m = {m:2d}: expmod {r.qubits} qubits {r.rotations:.3e} rotações | "
+              f"expmod_windowed {rw.qubits} qubits {rw.toffoli:.3e} Toffolis {rw.rotations:.3e} rotações")
@@ -1,8 +1,10 @@
-from qiskit import QuantumCircuit, QuantumRegister
-from draperqftadder_adapt import adder_mod
-from qiskit.circuit.library import QFT
+from qiskit import QuantumCircuit, QuantumRegister, ClassicalRegister
+from draperqftadder_adapt import adder_mod_gate, qft_gate, adder_mod_error, qft_error, approx_metadata
+from draperqftadder_adapt import draper_adder_gate, draper_adder_error
+from coset import coset_metadata
+from gate_cache import cached_gate
 
-def ctrl_mult_mod(n_bits, a, N):
+def ctrl_mult_mod(n_bits, a, N, min_angle=0.0, factor_controls=False, mbu=False, coset_bits=0, optimize=False):
     """Retorna um circuito que implementa o Multiplicador Modular proposto no artigo [1],
        com 2 operandos clássicamente calculados (a e N).
        
@@ -44,6 +46,25 @@ help: ────────┤7             ├┤7             ├┤7
         Operando implícito calculado classicamente.
     N : int
         Operando implícito que controla o mod
+    min_angle : float
+        Rotações menores que min_angle são descartadas (modo aproximado, ver adder_mod).
+        A cota do erro fica em qc.metadata["approx_error"] (ver ctrl_mult_mod_error).
+    factor_controls : bool
+        Se True calcula AND(c, b_i) uma vez num qubit extra "and" (ccx) e usa o adder_mod
+        com 1 controle (cp em vez de mcphase, ccx em vez de mcx de 3 controles).
+    mbu : bool
+        Com factor_controls, desfaz o AND por medição (H, medida, CZ(c, b_i) e X condicionados)
+        em vez do segundo ccx. O circuito ganha o registrador clássico "m" e tem if_test:
+        usar com compose (sem versão _gate). Sem factor_controls é ValueError.
+    coset_bits : int
+        m > 0: registradores b e "0" em representação de coset (ver coset.py) com n_bits + m
+        qubits cada; cada adder_mod vira um draper_adder comum mod 2^(n+m) (sem comparação,
+        sem "help"). Entradas: b e "0" em coset (valor x + jN); saída ≡ "0" + a*b mod N com
+        desvio <= (n_bits + m) * 2^-m em qc.metadata["coset_deviation"].
+    optimize : bool
+        Se True passa o circuito pelos passes do fourier_opt.py: os adder_mod são abertos e
+        os draper_adder vizinhos com os mesmos controles (+a e -N) viram um só. O que foi
+        removido fica em qc.metadata["fourier_opt"].
 
     Retorna:
     QuantumCircuit 
@@ -52,27 +73,133 @@ help: ────────┤7             ├┤7             ├┤7
         registrador_controle (1 bit)
         registrador_operando (n_bits)
         registrador_ancilla (n_bits + 2)
+        (+ registrador "and" (1 bit) com factor_controls)
+        com coset_bits = m: c (1), b (n_bits + m), "0" (n_bits + m) (+ "and"), sem "help"
 
     References: 
         [1] Vlatko Vedral, Adriano Barenco, and Artur Ekert, Quantum networks for elementary arithmetic operations, quant-ph/9511018
     """    
 
+    if mbu and not factor_controls:
+        raise ValueError("ctrl_mult_mod: mbu=True precisa de factor_controls=True")
+
     reg_control = QuantumRegister(1, "c")
     
-    reg_b = QuantumRegister(n_bits, "b")
+    reg_b = QuantumRegister(n_bits + coset_bits, "b")
 
-    reg_0 = QuantumRegister(n_bits + 1, "0")
+    reg_0 = QuantumRegister(n_bits + max(coset_bits, 1), "0")
 
-    reg_help = QuantumRegister(1, "help")
+    # em coset a soma é comum (mod 2^(n+m)): não tem comparação, não precisa do help
+    reg_help = QuantumRegister(0 if coset_bits else 1, "help")
 
     qc = QuantumCircuit(reg_control, reg_b, reg_0, reg_help, name="mult_mod")
 
-    qc.append(QFT(n_bits + 1, do_swaps=False), reg_0)
+    qc.append(qft_gate(len(reg_0), min_angle=min_angle), reg_0)
+
+    if factor_controls:
+        reg_and = QuantumRegister(1, "and")
+        qc.add_register(reg_and)
+        if mbu:
+            reg_m = ClassicalRegister(1, "m")
+            qc.add_register(reg_m)
+
+    for i in range(len(reg_b)):
+
+        cn = 1 if factor_controls else 2
+        if coset_bits:
+            adder = draper_adder_gate(len(reg_0) - 1, ((2**i) * a) % N, controlado=True, control_number=cn, min_angle=min_angle)
+        else:
+            adder = adder_mod_gate(n_bits, ((2**i) * a) % N, N, controlado=True, control_number=cn, min_angle=min_angle)
+
+        if not factor_controls:
+            qc.append(adder, reg_control[:] + reg_b[i:i+1] + reg_0[:] + reg_help[:])
+            continue
+
+        # AND(c, b_i) num qubit limpo, adder com um controle só
+        qc.ccx(reg_control[0], reg_b[i], reg_and[0])
+
+        qc.append(adder, reg_and[:] + reg_0[:] + reg_help[:])
+
+        if mbu:
+            # desfaz o AND medindo na base X: resultado 1 --> fase (-1)^(c b_i), corrigida pelo CZ
+            qc.h(reg_and[0])
+            qc.measure(reg_and[0], reg_m[0])
+            with qc.if_test((reg_m[0], 1)):
+                qc.cz(reg_control[0], reg_b[i])
+                qc.x(reg_and[0])
+        else:
+            qc.ccx(reg_control[0], reg_b[i], reg_and[0])
+
+    qc.append(qft_gate(len(reg_0), inverse=True, min_angle=min_angle), reg_0)
+
+    qc.metadata = coset_metadata(approx_metadata(ctrl_mult_mod_error(n_bits, a, N, min_angle, coset_bits)),
+                                 len(reg_b), coset_bits)
+
+    if optimize:
+        from fourier_opt import optimize_fourier   ### só aqui: fourier_opt puxa fourier_sim e o qiskit.transpiler
+        qc = optimize_fourier(qc)
+
+    return qc
+
+
+def ctrl_mult_mod_gate(n_bits, a, N, inverse=False, min_angle=0.0, factor_controls=False, coset_bits=0, optimize=False):
+    """Versão em cache de ctrl_mult_mod, já convertida em porta (ou na sua inversa).
+
+    Chamadas com os mesmos argumentos devolvem o mesmo objeto Gate.
+    """
+    key = ("ctrl_mult_mod", n_bits, a, N, inverse, min_angle, factor_controls, coset_bits, optimize)
+    if inverse:
+        return cached_gate(key, lambda: ctrl_mult_mod_gate(n_bits, a, N, min_angle=min_angle, factor_controls=factor_controls,
+                                                           coset_bits=coset_bits, optimize=optimize).inverse())
+    return cached_gate(key, lambda: ctrl_mult_mod(n_bits, a, N, min_angle, factor_controls, coset_bits=coset_bits,
+                                                  optimize=optimize).to_gate())
+
+
+def ctrl_mult_mod_error(n_bits, a, N, min_angle=0.0, coset_bits=0):
+    """Cota do erro (norma de operador) do ctrl_mult_mod aproximado: n adder_mod + QFT + IQFT.
+
+    Com coset_bits = m: n + m draper_adder de n + m qubits (o desvio do coset fica à parte).
+    """
+    if min_angle <= 0:
+        return 0.0
+    if coset_bits:
+        w = n_bits + coset_bits
+        return 2 * qft_error(w, min_angle) + sum(draper_adder_error(w - 1, ((2**i) * a) % N, min_angle) for i in range(w))
+    return (2 * qft_error(n_bits + 1, min_angle)
+            + sum(adder_mod_error(n_bits, ((2**i) * a) % N, N, min_angle) for i in range(n_bits)))
 
-    for i in range(n_bits):
+if __name__ == "__main__":
+    from qiskit import transpile
+    from qiskit_aer import AerSimulator
 
-        qc.append(adder_mod(n_bits, ((2**i) * a) % N, N, controlado=True, control_number=2), reg_control[:] + reg_b[i:i+1] + reg_0[:] + reg_help[:])
+    ### portas depois do transpile (base cx/u): 2 controles vs AND num qubit extra
+    for n_bits, a, N in ((3, 5, 7), (4, 7, 13), (5, 12, 21), (6, 40, 55)):
+        for label, kw in (("2 controles ", {}), ("and + ccx   ", dict(factor_controls=True)),
+                          ("and + medida", dict(factor_controls=True, mbu=True))):
+            tqc = transpile(ctrl_mult_mod(n_bits, a, N, **kw), basis_gates=["cx", "u"], optimization_level=1)
+            ops = tqc.count_ops()
+            print(f"n = {n_bits}  {label}: {tqc.size():6d} portas  {ops.get('cx', 0):6d} cx  profundidade {tqc.depth():6d}")
 
-    qc.append(QFT(n_bits + 1, do_swaps=False).inverse(), reg_0)
+    ### desfazer o AND por medição == segundo ccx: (c, b) em |+⟩, mult com medida, inversa
+    ### unitária, H de novo --> tudo volta a 0 em todos os shots
+    backend = AerSimulator()
+    for n_bits, a, N in ((3, 5, 7), (4, 7, 13)):
+        mult = ctrl_mult_mod(n_bits, a, N, factor_controls=True, mbu=True)
+        res = ClassicalRegister(mult.num_qubits, "res")
+        qc = QuantumCircuit(*mult.qregs, *mult.cregs, res)
+        qc.h(range(n_bits + 1))
+        qc.compose(mult, inplace=True)
+        qc.append(ctrl_mult_mod_gate(n_bits, a, N, inverse=True, factor_controls=True), qc.qubits)
+        qc.h(range(n_bits + 1))
+        qc.measure(qc.qubits, res)
+        counts = backend.run(transpile(qc, backend), shots=512).result().get_counts()
+        zeros = sum(v for key, v in counts.items() if int(key.split()[0], 2) == 0)
+        assert zeros == 512, (n_bits, a, N, counts)
+        print(f"n = {n_bits}  AND desfeito por medição: P(0) = {zeros / 512:.3f}")
 
-    return qc
\ No newline at end of file
+    ### mbu sem factor_controls não tem AND para desfazer
+    try:
+        ctrl_mult_mod(3, 5, 7, mbu=True)
+        raise AssertionError("mbu sem factor_controls deveria falhar")
+    except ValueError as err:
+        print(err)
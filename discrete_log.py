@@ -0,0 +1,257 @@
+# discrete_log.py
+#
+# Circuito do logaritmo discreto (log discreto.ipynb) montado de uma vez:
+#
+#   a, b em superposição uniforme de 0..p-2 (UniformSuperpositionGate), c = 1,
+#       c  <--  g^a · x^(-b) mod p
+#   QFT_{p-1}⁻¹ (matriz p-1 x p-1, identidade no resto) em a e em b, e medida de a e b
+#   no registrador "resultado" (a nos bits baixos), resolvida por
+#   shor_postprocess.recover_discrete_log (c·r + d ≡ 0 mod p - 1).
+#
+#   O notebook chamava expmod(p, g, n) e expmod(p, x⁻¹, n) como blocos separados e
+#   montava a QFT modificada elemento a elemento. Aqui:
+#       dlog_tables: uma só tabela clássica de g^(2^i), x^(2^i) mod p e inversos
+#           (x^(-2^i) é o fator da metade b e x^(2^i) o da desmultiplicação dela)
+#       as duas metades entram no mesmo circuito com os ctrl_mult_mod_gate em cache
+#       (gate_cache), e a QFT modificada é uma porta em cache montada com NumPy
+#   windowed=True troca as duas metades pela janela conjunta do expmod_windowed
+#   (mult_mod_windowed_lookup com fatores g^(j·2^lo) e x^(-j·2^lo)): as janelas de a e
+#   depois as de b acumulam no mesmo acc/tmp.
+
+from collections import namedtuple
+import numpy as np
+from qiskit import QuantumCircuit, QuantumRegister, ClassicalRegister
+from qiskit.circuit.library import UnitaryGate
+from qiskit.circuit.library.data_preparation import UniformSuperpositionGate
+from ctrl_mult_mod import ctrl_mult_mod_gate, ctrl_mult_mod_error
+from mult_mod_windowed import mult_mod_windowed_lookup_gate, mult_mod_windowed_error
+from draperqftadder_adapt import approx_metadata
+from qrom import lookup_ancillas
+from gate_cache import cached_gate
+
+DlogTables = namedtuple("DlogTables", ["g_pows", "g_invs", "x_pows", "x_invs"])
+
+
+def dlog_tables(p, g, x, n_bits):
+    """g^(2^i), g^(-2^i), x^(2^i), x^(-2^i) mod p para i < n_bits (quadrados sucessivos)."""
+    def squares(v):
+        out = [v % p]
+        for _ in range(n_bits - 1):
+            out.append(out[-1] * out[-1] % p)
+        return out
+
+    g_pows, x_pows = squares(g), squares(x)
+    return DlogTables(g_pows, squares(pow(g, -1, p)), x_pows, squares(pow(x, -1, p)))
+
+
+def qft_mod_gate(p, n_bits, inverse=True):
+    """QFT_{p-1} (ou a inversa) em n_bits qubits, identidade nos estados >= p - 1 (em cache)."""
+    def build():
+        M = p - 1
+        jk = np.outer(np.arange(M), np.arange(M)) % M
+        U = np.eye(1 << n_bits, dtype=complex)
+        U[:M, :M] = np.exp((-2j if inverse else 2j) * np.pi * jk / M) / np.sqrt(M)
+        return UnitaryGate(U, label="Modified QFT" + ("_dg" if inverse else ""))
+
+    return cached_gate(("qft_mod", p, n_bits, inverse), build)
+
+
+def _superposition(qc, p, reg_a, reg_b):
+    """a e b em superposição uniforme de 0..p-2 (a mesma porta, em cache, nos dois)."""
+    n_bits = len(reg_a)
+    gate = cached_gate(("uniform", p - 1, n_bits), lambda: UniformSuperpositionGate(p - 1, n_bits))
+    qc.append(gate, reg_a)
+    qc.append(gate, reg_b)
+
+
+def discrete_log_circuit(p, g, x, n_bits=None, windowed=False, c_exp=3, c_mul=3, min_angle=0.0, lam=1,
+                         arith="fourier", measure=True):
+    """
+    Circuito do logaritmo discreto de x na base g mod p (g^r ≡ x), como no log discreto.ipynb.
+
+    Parametros:
+    p : int
+        Primo (módulo).
+    g, x : int
+        Base e alvo (coprimos de p).
+    n_bits : int
+        Qubits de cada registrador de expoente a, b (default p.bit_length(), 2^n_bits >= p - 1).
+    windowed : bool
+        True: as duas exponenciações com a janela conjunta do expmod_windowed (c_exp, c_mul,
+        lam, arith repassados); False: 2 ctrl_mult_mod por bit de a e de b (como o expmod).
+    min_angle : float
+        Rotações menores que min_angle são descartadas (cota em metadata["approx_error"]).
+    measure : bool
+        Mede a e b no registrador "resultado" (a nos n_bits baixos, b nos altos).
+
+    Retorna:
+    QuantumCircuit
+        registradores a, b, o registrador aritmético (c/0/cout/help ou acc/tmp/anc/look/help/carry)
+        e "resultado"; metadata com approx_error e "tables" (dlog_tables).
+    """
+    n_bits = p.bit_length() if n_bits is None else n_bits
+    if (1 << n_bits) < p - 1:
+        raise ValueError(f"discrete_log_circuit: n_bits = {n_bits} não cobre 0..p-2")
+    w = p.bit_length()
+    tables = dlog_tables(p, g, x, n_bits)
+
+    reg_a = QuantumRegister(n_bits, "a")
+    reg_b = QuantumRegister(n_bits, "b")
+    if windowed:
+        qc, error = _windowed_halves(p, reg_a, reg_b, tables, c_exp, c_mul, min_angle, lam, arith)
+    else:
+        qc, error = _plain_halves(p, reg_a, reg_b, tables, min_angle)
+
+    ### QFT_{p-1}⁻¹ nos dois registradores de expoente
+    qc.append(qft_mod_gate(p, n_bits), reg_a)
+    qc.append(qft_mod_gate(p, n_bits), reg_b)
+    qc.name = "discrete_log"
+
+    if measure:
+        cl = ClassicalRegister(2 * n_bits, "resultado")
+        qc.add_register(cl)
+        qc.measure(reg_a, cl[:n_bits])
+        qc.measure(reg_b, cl[n_bits:])
+
+    qc.metadata = dict(approx_metadata(error), tables=tables, arith_bits=w)
+    return qc
+
+
+def _plain_halves(p, reg_a, reg_b, tables, min_angle):
+    """c = 1 --> g^a · x^(-b): por bit, ctrl_mult_mod pelo fator, desfaz o 0 pelo inverso, cswap."""
+    w = p.bit_length()
+    reg_c = QuantumRegister(w, "c")
+    reg_0 = QuantumRegister(w, "0")
+    reg_cout = QuantumRegister(1, "cout")
+    reg_help = QuantumRegister(1, "help")
+    qc = QuantumCircuit(reg_a, reg_b, reg_c, reg_0, reg_cout, reg_help)
+    _superposition(qc, p, reg_a, reg_b)
+    qc.x(reg_c[0])
+
+    error = 0.0
+    ### metade a: fatores g^(2^i); metade b: fatores x^(-2^i), desfeitos com x^(2^i)
+    for reg, facs, invs in ((reg_a, tables.g_pows, tables.g_invs), (reg_b, tables.x_invs, tables.x_pows)):
+        for i in range(len(reg)):
+            qc.append(ctrl_mult_mod_gate(w, facs[i], p, min_angle=min_angle),
+                      reg[i:i+1] + reg_c[:] + reg_0[:] + reg_cout[:] + reg_help[:])
+            qc.append(ctrl_mult_mod_gate(w, invs[i], p, inverse=True, min_angle=min_angle),
+                      reg[i:i+1] + reg_0[:] + reg_c[:] + reg_cout[:] + reg_help[:])
+            error += ctrl_mult_mod_error(w, facs[i], p, min_angle) + ctrl_mult_mod_error(w, invs[i], p, min_angle)
+            for j in range(w):
+                qc.cswap(reg[i], reg_0[j], reg_c[j])
+    return qc, error
+
+
+def _windowed_halves(p, reg_a, reg_b, tables, c_exp, c_mul, min_angle, lam, arith):
+    """Janelas de a e depois de b no mesmo acc/tmp (janela conjunta, ver expmod_windowed)."""
+    w = p.bit_length()
+    windows = [(reg, lo, min(lo + c_exp, len(reg)), facs, invs)
+               for reg, facs, invs in ((reg_a, tables.g_pows, tables.g_invs), (reg_b, tables.x_invs, tables.x_pows))
+               for lo in range(0, len(reg), c_exp)]
+
+    acc = QuantumRegister(w + 1, "acc")
+    tmp = QuantumRegister(w + 1, "tmp")
+    L_max = 1 << (min(c_exp, len(reg_a)) + min(c_mul, w))
+    anc = QuantumRegister(lookup_ancillas(L_max, w, lam), "anc")
+    look = QuantumRegister(w, "look")
+    reg_help = QuantumRegister(1, "help")
+    carry = QuantumRegister(w if arith == "ripple" else 0, "carry")
+    qc = QuantumCircuit(reg_a, reg_b, acc, tmp, anc, look, reg_help, carry)
+    _superposition(qc, p, reg_a, reg_b)
+
+    ### nº ímpar de janelas: o 1 começa no tmp para o resultado terminar no acc
+    cur, other = (acc, tmp) if len(windows) % 2 == 0 else (tmp, acc)
+    qc.x(cur[0])
+
+    error = 0.0
+    for reg, lo, hi, facs, invs in windows:
+        ### fatores k^j e -k^(-j) da janela, com k = fator^(2^lo) e k⁻¹ da mesma tabela
+        k, k_inv = facs[lo], invs[lo]
+        factors = [pow(k, j, p) for j in range(1 << (hi - lo))]
+        minus_inv = [(-pow(k_inv, j, p)) % p for j in range(1 << (hi - lo))]
+        work = anc[:lookup_ancillas(len(factors) << min(c_mul, w), w, lam)] + look[:] + reg_help[:] + carry[:]
+
+        qc.append(mult_mod_windowed_lookup_gate(w, factors, p, c_mul, min_angle=min_angle, lam=lam, arith=arith),
+                  reg[lo:hi] + cur[:w] + other[:] + work)
+        qc.append(mult_mod_windowed_lookup_gate(w, minus_inv, p, c_mul, min_angle=min_angle, lam=lam, arith=arith),
+                  reg[lo:hi] + other[:w] + cur[:] + work)
+        error += 2 * mult_mod_windowed_error(w, p, c_mul, min_angle, 0, arith)
+        cur, other = other, cur
+    return qc, error
+
+
+def discrete_log_notebook(p, g, x):
+    """O circuito do log discreto.ipynb, montado como lá (referência de tempo/qubits)."""
+    from expmod import expmod
+
+    n_bits = p.bit_length()
+    reg_a = QuantumRegister(n_bits, 'a')
+    reg_b = QuantumRegister(n_bits, 'b')
+    reg_c = QuantumRegister(n_bits, 'c')
+    reg_0 = QuantumRegister(n_bits, "0")
+    reg_cout = QuantumRegister(1, "cout")
+    reg_help = QuantumRegister(1, "help")
+    cl = ClassicalRegister(2*n_bits, 'resultado')
+    circuito = QuantumCircuit(reg_a, reg_b, reg_c, reg_0, reg_cout, reg_help, cl)
+    circuito.append(UniformSuperpositionGate(p-1, n_bits), reg_a)
+    circuito.append(UniformSuperpositionGate(p-1, n_bits), reg_b)
+    circuito.x(reg_c[0])
+    circuito.append(expmod(p, g, n_bits), reg_a[:] + reg_c[:] + reg_0[:] + reg_cout[:] + reg_help[:])
+    circuito.append(expmod(p, pow(x, -1, p), n_bits), reg_b[:] + reg_c[:] + reg_0[:] + reg_cout[:] + reg_help[:])
+
+    ### qft_modf do notebook: matriz preenchida elemento a elemento
+    N = p - 1
+    U = np.zeros((2**n_bits, 2**n_bits), dtype=complex)
+    for j in range(N):
+        for k in range(N):
+            U[j, k] = np.exp(2 * np.pi * 1j * j * k / N) / np.sqrt(N)
+    for j in range(N, 2**n_bits):
+        U[j, j] = 1
+    for reg in (reg_a, reg_b):
+        circuito.append(UnitaryGate(U, label='Modified QFT').inverse(), reg)
+
+    circuito.measure(reg_a, cl[:n_bits])
+    circuito.measure(reg_b, cl[n_bits:])
+    return circuito
+
+
+if __name__ == "__main__":
+    from time import perf_counter
+    from qiskit import transpile
+    from qiskit_aer import AerSimulator
+    from qiskit_aer.primitives import SamplerV2 as Sampler
+    from gate_cache import cache_clear
+    from shor_postprocess import recover_discrete_log
+
+    ### QFT modificada vetorizada == a do notebook
+    for p in (7, 11, 13):
+        n = p.bit_length()
+        nb = discrete_log_notebook(p, 2, 3)
+        want = [inst.operation for inst in nb.data if inst.operation.name == "unitary"][0]
+        assert np.allclose(want.to_matrix(), qft_mod_gate(p, n).to_matrix())
+    print("qft_mod_gate == qft_modf do notebook (inversa)")
+
+    ### Aer: as medidas resolvem r pelo shor_postprocess (plano e janelado)
+    backend = AerSimulator()
+    for p, g, x, kw in ((7, 3, 4, {}), (7, 3, 6, dict(windowed=True, c_exp=2, c_mul=2)), (11, 2, 9, {})):
+        qc = discrete_log_circuit(p, g, x, **kw)
+        counts = Sampler().run([transpile(qc, backend)], shots=4096).result()[0].data.resultado.get_int_counts()
+        res = recover_discrete_log(counts, p, g, x)
+        r = next(k for k in range(p - 1) if pow(g, k, p) == x)
+        print(f"p = {p} g = {g} x = {x} {'janelado' if kw else 'plano':8s} ({qc.num_qubits} qubits): "
+              f"r = {res.candidates[0].value} (real {r}), sucesso {res.success_rate:.1%}")
+        assert res.candidates[0].value == r
+
+    ### tempo de montagem e qubits contra o notebook (cache de portas vazio em cada um)
+    for p, g, x in ((61, 2, 17), (251, 6, 100), (1021, 10, 555)):
+        cache_clear()
+        t0 = perf_counter()
+        nb = discrete_log_notebook(p, g, x)
+        t_nb = perf_counter() - t0
+        line = f"p = {p:4d}: notebook {t_nb:6.2f} s {nb.num_qubits:3d} qubits"
+        for kw in ({}, dict(windowed=True, c_exp=3, c_mul=3)):
+            cache_clear()
+            t0 = perf_counter()
+            qc = discrete_log_circuit(p, g, x, **kw)
+            line += f" | {'janelado' if kw else 'plano'} {perf_counter() - t0:6.2f} s {qc.num_qubits:3d} qubits"
+        print(line)
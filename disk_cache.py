@@ -0,0 +1,253 @@
+# disk_cache.py
+#
+# Cache em disco (QPY) de circuitos montados e transpilados, entre execuções.
+#
+#   O gate_cache.py só vale dentro do processo: cada notebook / test.py monta e
+#   transpila os mesmos expmod / ctrl_mult_mod de novo. Aqui o circuito fica num
+#   arquivo <chave>.qpy, com a chave = sha256 de
+#       builder (módulo.nome), argumentos, versão do qiskit,
+#       alvo do transpile (backend + opções) e o código dos .py deste diretório
+#   (mexer em qualquer builder invalida as entradas antigas).
+#
+#       qc  = cached_circuit(ctrl_mult_mod, 7, 2, 77)                       # só o build
+#       tqc = cached_circuit(expmod, 77, 2, 7, backend=AerSimulator())      # build + transpile
+#
+#   Tamanho limitado (max_bytes): ao gravar, os arquivos menos usados recentemente
+#   (mtime, atualizado a cada hit) são apagados. Vários processos podem usar o mesmo
+#   diretório: a escrita é atômica (arquivo temporário + os.replace) e gravação /
+#   remoção passam por um lock de arquivo (fcntl no Linux/macOS, msvcrt no Windows).
+#
+#   Diretório: variável QC_CACHE_DIR ou ~/.cache/my-qiskit-circuits.
+
+import hashlib
+import os
+import tempfile
+from collections import namedtuple
+from glob import glob
+
+import qiskit
+from qiskit import qpy, transpile
+
+DiskCacheInfo = namedtuple("DiskCacheInfo", ["hits", "misses", "files", "bytes", "max_bytes"])
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+_code_version = None
+
+
+def _source_hash():
+    """sha256 dos .py do repositório (calculado uma vez por processo)."""
+    global _code_version
+    if _code_version is None:
+        h = hashlib.sha256()
+        for path in sorted(glob(os.path.join(_HERE, "*.py"))):
+            with open(path, "rb") as f:
+                h.update(os.path.basename(path).encode() + b"\0" + f.read())
+        _code_version = h.hexdigest()
+    return _code_version
+
+
+def target_id(backend, transpile_options):
+    """Descrição estável do alvo do transpile (None: circuito sem transpile)."""
+    if backend is None:
+        return None
+    target = backend.target
+    edges = sorted(target.build_coupling_map().get_edges()) if target.build_coupling_map() else None
+    return (backend.name, target.num_qubits, sorted(target.operation_names), edges,
+            sorted((transpile_options or {}).items()))
+
+
+class _FileLock:
+    """Lock exclusivo entre processos num arquivo (bloqueante)."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        self._f = open(self.path, "a+b")
+        if os.name == "nt":
+            import msvcrt
+            self._f.seek(0)
+            msvcrt.locking(self._f.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(self._f.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if os.name == "nt":
+            import msvcrt
+            self._f.seek(0)
+            msvcrt.locking(self._f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(self._f.fileno(), fcntl.LOCK_UN)
+        self._f.close()
+
+
+class DiskCache:
+    """Cache LRU em disco de circuitos (QPY) indexado por hash.
+
+    Parametros:
+    path : str
+        Diretório dos arquivos (criado se não existir).
+    max_bytes : int
+        Tamanho máximo total dos .qpy; os menos usados recentemente são apagados.
+    """
+
+    def __init__(self, path=None, max_bytes=1 << 30):
+        if path is None:
+            path = os.environ.get("QC_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "my-qiskit-circuits"))
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(path, exist_ok=True)
+        self._lock = os.path.join(path, ".lock")
+
+    def key(self, builder, args=(), kwargs=None, backend=None, transpile_options=None):
+        """Chave (hex) de builder(*args, **kwargs), transpilado para backend se não for None."""
+        desc = repr((f"{builder.__module__}.{builder.__qualname__}", tuple(args), sorted((kwargs or {}).items()),
+                     qiskit.__version__, target_id(backend, transpile_options), _source_hash()))
+        return hashlib.sha256(desc.encode()).hexdigest()
+
+    def _file(self, key):
+        return os.path.join(self.path, key + ".qpy")
+
+    def get(self, key):
+        """Circuito guardado em key (marcado como usado agora) ou None."""
+        path = self._file(key)
+        try:
+            with open(path, "rb") as f:
+                qc = qpy.load(f)[0]
+        except (FileNotFoundError, EOFError, qpy.QpyError):
+            ### ausente, ou apagado / sobrescrito por outro processo no meio da leitura
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        self.hits += 1
+        return qc
+
+    def put(self, key, qc):
+        """Grava qc em key (atômico) e apaga os arquivos mais antigos acima de max_bytes."""
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                qpy.dump(qc, f)
+            with _FileLock(self._lock):
+                os.replace(tmp, self._file(key))
+                self._evict()
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def _evict(self):
+        """Apaga os .qpy menos usados até caber em max_bytes (chamar com o lock)."""
+        files = []
+        for path in glob(os.path.join(self.path, "*.qpy")):
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def circuit(self, builder, *args, backend=None, transpile_options=None, **kwargs):
+        """builder(*args, **kwargs) (transpilado para backend, se dado), do disco se já existir."""
+        key = self.key(builder, args, kwargs, backend, transpile_options)
+        qc = self.get(key)
+        if qc is None:
+            qc = builder(*args, **kwargs)
+            if backend is not None:
+                qc = transpile(qc, backend, **(transpile_options or {}))
+            self.put(key, qc)
+        return qc
+
+    def info(self):
+        """DiskCacheInfo(hits, misses, files, bytes, max_bytes) (hits/misses deste processo)."""
+        sizes = []
+        for path in glob(os.path.join(self.path, "*.qpy")):
+            try:
+                sizes.append(os.path.getsize(path))
+            except FileNotFoundError:
+                pass
+        return DiskCacheInfo(self.hits, self.misses, len(sizes), sum(sizes), self.max_bytes)
+
+    def clear(self):
+        """Apaga todos os arquivos do cache e zera os contadores."""
+        with _FileLock(self._lock):
+            for path in glob(os.path.join(self.path, "*.qpy")):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        self.hits = 0
+        self.misses = 0
+
+
+_DISK_CACHE = None
+
+
+def disk_cache():
+    """Cache global do processo (criado no primeiro uso, ver QC_CACHE_DIR)."""
+    global _DISK_CACHE
+    if _DISK_CACHE is None:
+        _DISK_CACHE = DiskCache()
+    return _DISK_CACHE
+
+
+def cached_circuit(builder, *args, backend=None, transpile_options=None, **kwargs):
+    """Atalho para disk_cache().circuit(builder, *args, backend=..., **kwargs)."""
+    return disk_cache().circuit(builder, *args, backend=backend, transpile_options=transpile_options, **kwargs)
+
+
+def _worker(args):
+    path, max_bytes, n, a = args
+    from ctrl_mult_mod import ctrl_mult_mod
+    cache = DiskCache(path, max_bytes)
+    return cache.circuit(ctrl_mult_mod, n, a, 13).num_qubits
+
+
+if __name__ == "__main__":
+    from multiprocessing import Pool
+    from time import perf_counter
+    from qiskit_aer import AerSimulator
+    from expmod import expmod
+
+    backend = AerSimulator()
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = DiskCache(tmp)
+
+        ### miss (build + transpile) vs hit (uma leitura de QPY)
+        t0 = perf_counter()
+        first = cache.circuit(expmod, 77, 2, 7, backend=backend)
+        t_miss = perf_counter() - t0
+        t0 = perf_counter()
+        again = DiskCache(tmp).circuit(expmod, 77, 2, 7, backend=backend)
+        t_hit = perf_counter() - t0
+        assert again == first and again.metadata == first.metadata
+        assert cache.key(expmod, (77, 2, 7)) != cache.key(expmod, (77, 2, 7), backend=backend)
+        assert cache.key(expmod, (77, 2, 7)) != cache.key(expmod, (77, 3, 7))
+        print(f"expmod(77, 2, 7) transpilado: miss {t_miss:.1f} s, hit {t_hit:.2f} s")
+
+        ### vários processos no mesmo diretório, com despejo (limite menor que as 12 entradas)
+        cache.clear()
+        limit = 200_000
+        jobs = [(tmp, limit, n, a) for n in (4, 5) for a in (2, 3, 4, 5, 6, 7)] * 3
+        with Pool(4) as pool:
+            pool.map(_worker, jobs)
+        info = DiskCache(tmp, limit).info()
+        left = [f for f in os.listdir(tmp) if f.endswith(".tmp")]
+        assert info.bytes <= info.max_bytes and not left, (info, left)
+        print(f"4 processos, {len(jobs)} chamadas: {info.files} arquivos, {info.bytes} bytes (limite {info.max_bytes})")
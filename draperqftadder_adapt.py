@@ -1,8 +1,11 @@
 from qiskit import QuantumCircuit, QuantumRegister
 from qiskit.circuit.library import QFT, PhaseGate, XGate
 import numpy as np
+from math import floor, log2
+from gate_cache import cached_gate
 
-def draper_adder(n_bits, a, controlado=False, div=False, control_number=1):
+def draper_adder(n_bits, a, controlado=False, div=False, control_number=1, merge_angles=True, min_angle=0.0,
+                 angles=None):
     """Retorna um circuito que corresponde ao DraperQFTAdder [1], sem as QFTs e com um operando clássicamente calculado.
 
     Faz a operação a + b : b é o número que está no registrador reg_b.
@@ -18,6 +21,16 @@ def draper_adder(n_bits, a, controlado=False, div=False, control_number=1):
         Se o adder será utilizado em uma divisão.
     control_number : int
         Número de qubits que controlam esse operador (c qubits).
+    merge_angles : bool
+        Se True (default) soma classicamente os ângulos de todas as fases que caem no
+        mesmo qubit alvo e emite uma única porta (controlada) por alvo: O(n) portas.
+        Se False mantém o layout antigo, uma porta por par (j, k): O(n²) portas.
+    min_angle : float
+        Rotações pi/2^k menores que min_angle são descartadas (modo aproximado).
+        0 (default) mantém o adder exato. Cota do erro: draper_adder_error(n_bits, a, min_angle).
+    angles : sequência de n_bits + 1 ângulos (float ou Parameter), opcional
+        Modo template: ignora a e emite as n_bits + 1 fases (uma por alvo, inclusive as nulas)
+        com esses ângulos. Os valores de um a são draper_angles(n_bits, a, div, min_angle).
 
     Retorna:
     QuantumCircuit 
@@ -41,11 +54,29 @@ def draper_adder(n_bits, a, controlado=False, div=False, control_number=1):
     reg_b = QuantumRegister(n_bits, "b")
     reg_cout = QuantumRegister(1, "cout")
 
-    if div: # Se for divisão, *2 até ficar com n_bits
-        bitstring = bin(a)[2:] + ("0" * (n_bits - len(bin(a)) + 2))
-    else: # Se não for divisão, igualar o numero de bits sem alterar o valor
-        bitstring = bin(a)[2:].zfill(n_bits)
-    bitstring = bitstring[::-1]
+    bitstring = _bitstring(n_bits, a, div)
+
+    if merge_angles or angles is not None:
+        # Todas as portas são diagonais, então basta o ângulo total de cada alvo (ver draper_angles)
+        template = angles is not None
+        if not template:
+            angles = draper_angles(n_bits, a, div, min_angle)
+
+        if not controlado:
+            qc = QuantumCircuit(reg_b, reg_cout, name="adapt_drap_adder")
+            targets = reg_b[:] + reg_cout[:]
+            for t, lam in enumerate(angles):
+                if template or lam != 0:
+                    qc.p(lam, targets[t])
+        else:
+            reg_c = QuantumRegister(control_number, "c")
+            qc = QuantumCircuit(reg_c, reg_b, reg_cout, name="c_adapt_drap_adder")
+            targets = reg_b[:] + reg_cout[:]
+            for t, lam in enumerate(angles):
+                if template or lam != 0:
+                    qc.append(PhaseGate(lam).control(control_number), reg_c[:] + [targets[t]])
+
+        return qc
 
     if not controlado:
         qc = QuantumCircuit(reg_b, reg_cout, name="adapt_drap_adder")
@@ -55,12 +86,14 @@ def draper_adder(n_bits, a, controlado=False, div=False, control_number=1):
             for k in range(n_bits - j):
                 if bitstring[j] == "1":
                     lam = np.pi / (2**k)
-                    qc.p(lam, reg_b[j + k])
+                    if lam >= min_angle:
+                        qc.p(lam, reg_b[j + k])
 
         for j in range(n_bits):
             if bitstring[n_bits - j - 1] == "1":
                 lam = np.pi / (2 ** (j + 1))
-                qc.p(lam, reg_cout[0])
+                if lam >= min_angle:
+                    qc.p(lam, reg_cout[0])
 
     else:
         # Registrador de controle
@@ -73,17 +106,42 @@ def draper_adder(n_bits, a, controlado=False, div=False, control_number=1):
             for k in range(n_bits - j):
                 if bitstring[j] == "1":
                     lam = np.pi / (2**k)
-                    qc.append(PhaseGate(lam).control(control_number), reg_c[:] + reg_b[j + k:j + k + 1])
+                    if lam >= min_angle:
+                        qc.append(PhaseGate(lam).control(control_number), reg_c[:] + reg_b[j + k:j + k + 1])
 
         for j in range(n_bits):
             if bitstring[n_bits - j - 1] == "1":
                 lam = np.pi / (2 ** (j + 1))
-                qc.append(PhaseGate(lam).control(control_number), reg_c[:] + reg_cout[:])
+                if lam >= min_angle:
+                    qc.append(PhaseGate(lam).control(control_number), reg_c[:] + reg_cout[:])
 
     return qc
 
 
-def adder_mod(n_bits, a, N, controlado=False, control_number=1):
+def _bitstring(n_bits, a, div=False):
+    """Bits de a (little-endian) como o draper_adder usa."""
+    if div: # Se for divisão, *2 até ficar com n_bits
+        bitstring = bin(a)[2:] + ("0" * (n_bits - len(bin(a)) + 2))
+    else: # Se não for divisão, igualar o numero de bits sem alterar o valor
+        bitstring = bin(a)[2:].zfill(n_bits)
+    return bitstring[::-1]
+
+
+def draper_angles(n_bits, a, div=False, min_angle=0.0):
+    """Ângulo total de cada alvo (b_0 .. b_{n-1}, cout) do draper_adder de a.
+
+        b_t  recebe  sum_{j<=t, a_j=1} pi/2^(t-j) = pi * (a mod 2^(t+1)) / 2^t
+        cout recebe  pi * a / 2^n
+    No modo aproximado os termos pi/2^(t-j) < min_angle saem da soma.
+    """
+    bitstring = _bitstring(n_bits, a, div)
+    a_bits = sum(1 << j for j in range(n_bits) if bitstring[j] == "1")
+    k_max = rotation_cutoff(min_angle)
+    return [np.pi * (_kept_bits(a_bits, t, k_max) / 2**t) for t in range(n_bits + 1)]   # int / int: sem overflow para n > 1023
+
+
+def adder_mod(n_bits, a, N, controlado=False, control_number=1, merge_angles=True, min_angle=0.0,
+              a_angles=None, N_angles=None, optimize=False):
     """Retorna um circuito que implementa o Adder Modular proposto no artigo [1]
         usando o DraperQFTAdder com 1 operando clássicamente calculado como Adder e aplicando
         otimizações do artigo [2] quanto as QFTs.
@@ -119,6 +177,17 @@ cout: ┤5                    ├┤5                       ├┤4      ├─
         Se o adder será controlado ou não (precisa do bit de controle).
     control_number : int
         Número de qubits que controlam esse operador (c qubits).
+    merge_angles : bool
+        Repassado aos draper_adder internos (True: uma fase por qubit alvo, False: layout antigo).
+    min_angle : float
+        Rotações menores que min_angle são descartadas nos adders e nas QFTs (modo aproximado).
+        A cota do erro fica em qc.metadata["approx_error"] (ver adder_mod_error).
+    a_angles, N_angles : sequências de n_bits + 1 ângulos (float ou Parameter), opcionais
+        Modo template: os draper_adder de a / N usam esses ângulos (ver draper_adder(angles=...))
+        e a / N são ignorados. Valores: draper_angles(n_bits, a, min_angle=min_angle).
+    optimize : bool
+        Se True passa o circuito pelos passes do fourier_opt.py (o draper_adder de a e o de -N,
+        nos mesmos controles, viram um só). O que foi removido fica em qc.metadata["fourier_opt"].
 
     Retorna:
     QuantumCircuit 
@@ -151,89 +220,380 @@ cout: ┤5                    ├┤5                       ├┤4      ├─
 
     reg_anc = QuantumRegister(1, "anc")
 
+    # Portas compartilhadas (cache LRU, ver gate_cache.py)
+    opts = dict(merge_angles=merge_angles, min_angle=min_angle)
+    qft = qft_gate(n_bits + 1, min_angle=min_angle)
+    iqft = qft_gate(n_bits + 1, inverse=True, min_angle=min_angle)
+
     if controlado:
         if control_number == 1:
             # Construção do circuito
             qc = QuantumCircuit(reg_control, reg_b, reg_cout, reg_anc, name="c_adder_mod") 
         
-            qc.append(draper_adder(n_bits, a, controlado=True), reg_control[:] + reg_b[:] + reg_cout[:])
+            qc.append(_adder_gate(n_bits, a, a_angles, controlado=True, **opts), reg_control[:] + reg_b[:] + reg_cout[:])
 
-            qc.append(draper_adder(n_bits, N, controlado=True).inverse(), reg_control[:] + reg_b[:] + reg_cout[:])
+            qc.append(_adder_gate(n_bits, N, N_angles, controlado=True, inverse=True, **opts), reg_control[:] + reg_b[:] + reg_cout[:])
 
-            qc.append(QFT(n_bits + 1, do_swaps=False).inverse(), reg_b[:] + reg_cout[:])
+            qc.append(iqft, reg_b[:] + reg_cout[:])
 
             qc.cx(reg_cout[0], reg_anc[0])
 
-            qc.append(QFT(n_bits + 1, do_swaps=False), reg_b[:] + reg_cout[:])
+            qc.append(qft, reg_b[:] + reg_cout[:])
 
-            qc.append(draper_adder(n_bits, N, controlado=True), reg_anc[:] + reg_b[:] + reg_cout[:])
+            qc.append(_adder_gate(n_bits, N, N_angles, controlado=True, **opts), reg_anc[:] + reg_b[:] + reg_cout[:])
         
-            qc.append(draper_adder(n_bits, a, controlado=True).inverse(), reg_control[:] + reg_b[:] + reg_cout[:])
+            qc.append(_adder_gate(n_bits, a, a_angles, controlado=True, inverse=True, **opts), reg_control[:] + reg_b[:] + reg_cout[:])
 
-            qc.append(QFT(n_bits + 1, do_swaps=False).inverse(), reg_b[:] + reg_cout[:])
+            qc.append(iqft, reg_b[:] + reg_cout[:])
 
             qc.x(reg_cout)
             qc.ccx(reg_control[0], reg_cout[0], reg_anc[0])
             qc.x(reg_cout)
 
-            qc.append(QFT(n_bits + 1, do_swaps=False), reg_b[:] + reg_cout[:])
+            qc.append(qft, reg_b[:] + reg_cout[:])
 
-            qc.append(draper_adder(n_bits, a, controlado=True), reg_control[:] + reg_b[:] + reg_cout[:])
+            qc.append(_adder_gate(n_bits, a, a_angles, controlado=True, **opts), reg_control[:] + reg_b[:] + reg_cout[:])
         elif control_number == 2:
             qc = QuantumCircuit(reg_control, reg_b, reg_cout, reg_anc, name="c_adder_mod") 
         
-            qc.append(draper_adder(n_bits, a, controlado=True, control_number=control_number), reg_control[:] + reg_b[:] + reg_cout[:])
+            qc.append(_adder_gate(n_bits, a, a_angles, controlado=True, control_number=control_number, **opts), reg_control[:] + reg_b[:] + reg_cout[:])
 
-            qc.append(draper_adder(n_bits, N, controlado=True, control_number=control_number).inverse(), reg_control[:] + reg_b[:] + reg_cout[:])
+            qc.append(_adder_gate(n_bits, N, N_angles, controlado=True, control_number=control_number, inverse=True, **opts), reg_control[:] + reg_b[:] + reg_cout[:])
 
-            qc.append(QFT(n_bits + 1, do_swaps=False).inverse(), reg_b[:] + reg_cout[:])
+            qc.append(iqft, reg_b[:] + reg_cout[:])
 
             qc.cx(reg_cout[0], reg_anc[0])
 
-            qc.append(QFT(n_bits + 1, do_swaps=False), reg_b[:] + reg_cout[:])
+            qc.append(qft, reg_b[:] + reg_cout[:])
 
-            qc.append(draper_adder(n_bits, N, controlado=True), reg_anc[:] + reg_b[:] + reg_cout[:])
+            qc.append(_adder_gate(n_bits, N, N_angles, controlado=True, **opts), reg_anc[:] + reg_b[:] + reg_cout[:])
         
-            qc.append(draper_adder(n_bits, a, controlado=True, control_number=control_number).inverse(), reg_control[:] + reg_b[:] + reg_cout[:])
+            qc.append(_adder_gate(n_bits, a, a_angles, controlado=True, control_number=control_number, inverse=True, **opts), reg_control[:] + reg_b[:] + reg_cout[:])
 
-            qc.append(QFT(n_bits + 1, do_swaps=False).inverse(), reg_b[:] + reg_cout[:])
+            qc.append(iqft, reg_b[:] + reg_cout[:])
 
             qc.x(reg_cout)
             qc.append(XGate().control(control_number+1), reg_control[:] + reg_cout[:] + reg_anc[:])
             qc.x(reg_cout)
 
-            qc.append(QFT(n_bits + 1, do_swaps=False), reg_b[:] + reg_cout[:])
+            qc.append(qft, reg_b[:] + reg_cout[:])
 
-            qc.append(draper_adder(n_bits, a, controlado=True, control_number=control_number), reg_control[:] + reg_b[:] + reg_cout[:])
+            qc.append(_adder_gate(n_bits, a, a_angles, controlado=True, control_number=control_number, **opts), reg_control[:] + reg_b[:] + reg_cout[:])
 
 
     else:
         qc = QuantumCircuit(reg_b, reg_cout, reg_anc, name="adder_mod")
 
-        qc.append(draper_adder(n_bits, a), reg_b[:] + reg_cout[:])
+        qc.append(_adder_gate(n_bits, a, a_angles, **opts), reg_b[:] + reg_cout[:])
 
-        qc.append(draper_adder(n_bits, N).inverse(), reg_b[:] + reg_cout[:])
+        qc.append(_adder_gate(n_bits, N, N_angles, inverse=True, **opts), reg_b[:] + reg_cout[:])
 
-        qc.append(QFT(n_bits + 1, do_swaps=False).inverse(), reg_b[:] + reg_cout[:])
+        qc.append(iqft, reg_b[:] + reg_cout[:])
 
         qc.cx(reg_cout[0], reg_anc[0])
 
-        qc.append(QFT(n_bits + 1, do_swaps=False).inverse(), reg_b[:] + reg_cout[:])
+        qc.append(qft, reg_b[:] + reg_cout[:])
 
-        qc.append(draper_adder(n_bits, N, controlado=True), reg_anc[:] + reg_b[:] + reg_cout[:])
+        qc.append(_adder_gate(n_bits, N, N_angles, controlado=True, **opts), reg_anc[:] + reg_b[:] + reg_cout[:])
     
-        qc.append(draper_adder(n_bits, a).inverse(), reg_b[:] + reg_cout[:])
+        qc.append(_adder_gate(n_bits, a, a_angles, inverse=True, **opts), reg_b[:] + reg_cout[:])
 
-        qc.append(QFT(n_bits + 1, do_swaps=False).inverse(), reg_b[:] + reg_cout[:])
+        qc.append(iqft, reg_b[:] + reg_cout[:])
 
         qc.cx(reg_cout[0], reg_anc[0], ctrl_state="0")
 
-        qc.append(QFT(n_bits + 1, do_swaps=False).inverse(), reg_b[:] + reg_cout[:])
+        qc.append(qft, reg_b[:] + reg_cout[:])
+
+        qc.append(_adder_gate(n_bits, a, a_angles, **opts), reg_b[:] + reg_cout[:])
+
+    qc.metadata = approx_metadata(adder_mod_error(n_bits, a, N, min_angle))
+
+    if optimize:
+        from fourier_opt import optimize_fourier   ### só aqui: fourier_opt puxa fourier_sim e o qiskit.transpiler
+        qc = optimize_fourier(qc)
+
+    return qc
+
+
+def draper_adder_qq(n_bits, min_angle=0.0, n_out=None):
+    """Retorna o DraperQFTAdder [1] com os dois operandos quânticos, sem as QFTs.
+
+    Faz a operação a + b : a no registrador reg_a (base computacional) e b no reg_b + cout
+    (já na base de Fourier). O bit a_j soma pi/2^(t-j) no alvo t >= j (cp controlado por a_j).
+    As cp são emitidas por diagonal d = t - j: cada diagonal usa qubits disjuntos, então a
+    profundidade é o nº de diagonais (n_bits + 1), não o nº de portas (~n²/2).
+
+    Parametros:
+    n_bits : int
+        Número de bits dos operandos.
+    min_angle : float
+        Rotações pi/2^d menores que min_angle são descartadas (modo aproximado).
+        Cota do erro: draper_adder_qq_error(n_bits, min_angle, n_out).
+    n_out : int
+        Nº de qubits do alvo (reg_b + cout), default n_bits + 1. Com n_out maior a soma é
+        mod 2^n_out (registradores em coset, ver coset.py).
+
+    Retorna:
+    QuantumCircuit
+    circuito montado com os registradores nessa ordem:
+        n + n_out qubits
+        registrador_a (n bits)
+        registrador_operando (n_out - 1 bits)
+        registrador_carryout (1 bit)
+
+    References:
+        [1] T. G. Draper, Addition on a Quantum Computer, 2000. arXiv:quant-ph/0008033
+    """
+    if n_out is None:
+        n_out = n_bits + 1
+    reg_a = QuantumRegister(n_bits, "a")
+    reg_b = QuantumRegister(n_out - 1, "b")
+    reg_cout = QuantumRegister(1, "cout")
+    qc = QuantumCircuit(reg_a, reg_b, reg_cout, name="qq_drap_adder")
 
-        qc.append(draper_adder(n_bits, a), reg_b[:] + reg_cout[:])
+    targets = reg_b[:] + reg_cout[:]
+    k_max = rotation_cutoff(min_angle)
+    d_max = n_out - 1 if k_max is None else min(n_out - 1, k_max)
+    for d in range(d_max + 1):
+        for j in range(min(n_bits, n_out - d)):
+            qc.cp(np.pi / 2**d, reg_a[j], targets[j + d])
 
     return qc
 
+
+def adder_mod_qq(n_bits, N, min_angle=0.0):
+    """Retorna o Adder Modular [1] com os dois operandos quânticos (a + b mod N), na base de Fourier.
+
+    Mesma sequência do adder_mod sem controle [2], com os adders de a trocados pelo
+    draper_adder_qq (a num registrador) e o adder de N continuando clássico:
+        b += a, b -= N, IQFT, cx(cout, anc), QFT, b += N controlado por anc,
+        b -= a, IQFT, cx(cout, anc) com controle em 0, QFT, b += a
+    Entradas válidas: a, b < N (o registrador reg_b + cout entra e sai na base de Fourier).
+
+    Parametros:
+    n_bits : int
+        Número de bits dos operandos.
+    N : int
+        Operando implícito que controla o mod
+    min_angle : float
+        Rotações menores que min_angle são descartadas nos adders e nas QFTs (modo aproximado).
+        A cota do erro fica em qc.metadata["approx_error"] (ver adder_mod_qq_error).
+
+    Retorna:
+    QuantumCircuit
+    circuito montado com os registradores nessa ordem:
+        2n + 2 qubits
+        registrador_a (n bits)
+        registrador_operando (n bits)
+        registrador_carryout (1 bit)
+        registrador_ancilla (1 bit)
+
+    References:
+        [1] Vlatko Vedral, Adriano Barenco, and Artur Ekert, Quantum networks for elementary arithmetic operations, quant-ph/9511018
+        [2] Stephane Beauregard, Circuit for Shor's algorithm using 2n+3 qubits, arXiv:quant-ph/0205095
+    """
+    reg_a = QuantumRegister(n_bits, "a")
+    reg_b = QuantumRegister(n_bits, "b")
+    reg_cout = QuantumRegister(1, "cout")
+    reg_anc = QuantumRegister(1, "anc")
+    qc = QuantumCircuit(reg_a, reg_b, reg_cout, reg_anc, name="qq_adder_mod")
+
+    qft = qft_gate(n_bits + 1, min_angle=min_angle)
+    iqft = qft_gate(n_bits + 1, inverse=True, min_angle=min_angle)
+    add = draper_adder_qq_gate(n_bits, min_angle=min_angle)
+    sub = draper_adder_qq_gate(n_bits, inverse=True, min_angle=min_angle)
+    wires = reg_a[:] + reg_b[:] + reg_cout[:]
+
+    qc.append(add, wires)
+
+    qc.append(draper_adder_gate(n_bits, N, inverse=True, min_angle=min_angle), reg_b[:] + reg_cout[:])
+
+    qc.append(iqft, reg_b[:] + reg_cout[:])
+
+    qc.cx(reg_cout[0], reg_anc[0])
+
+    qc.append(qft, reg_b[:] + reg_cout[:])
+
+    qc.append(draper_adder_gate(n_bits, N, controlado=True, min_angle=min_angle), reg_anc[:] + reg_b[:] + reg_cout[:])
+
+    qc.append(sub, wires)
+
+    qc.append(iqft, reg_b[:] + reg_cout[:])
+
+    qc.cx(reg_cout[0], reg_anc[0], ctrl_state="0")
+
+    qc.append(qft, reg_b[:] + reg_cout[:])
+
+    qc.append(add, wires)
+
+    qc.metadata = approx_metadata(adder_mod_qq_error(n_bits, N, min_angle))
+
+    return qc
+
+
+def _adder_gate(n_bits, x, angles, controlado=False, control_number=1, inverse=False, **opts):
+    """draper_adder_gate de x, ou no modo template (angles != None) o draper_adder com esses ângulos."""
+    if angles is None:
+        return draper_adder_gate(n_bits, x, controlado, control_number=control_number, inverse=inverse, **opts)
+    gate = draper_adder(n_bits, 0, controlado, control_number=control_number, angles=angles).to_gate()
+    return gate.inverse() if inverse else gate
+
+
+### nomes das portas de qft_gate (e das inversas) --> 1 = QFT, -1 = IQFT
+QFT_DIR = {"QFT": 1, "IQFT_dg": 1, "IQFT": -1, "QFT_dg": -1}
+
+
+def qft_gate(n_qubits, inverse=False, min_angle=0.0):
+    """Retorna a porta QFT(n_qubits, do_swaps=False) (ou a IQFT), compartilhada pelo cache de portas.
+
+    Com min_angle > 0 as rotações controladas menores que min_angle são descartadas
+    (approximation_degree da QFT do qiskit).
+    """
+    degree = qft_approximation_degree(n_qubits, min_angle)
+    return cached_gate(("qft", n_qubits, inverse, degree),
+                       lambda: QFT(n_qubits, do_swaps=False, inverse=inverse, approximation_degree=degree).to_gate())
+
+
+def n_cp(circ):
+    """Nº de rotações controladas dentro de uma QFT (para detectar approximation_degree > 0)."""
+    total = 0
+    for inst in circ.data:
+        if inst.operation.name == "cp":
+            total += 1
+        elif inst.operation.definition is not None and inst.operation.name not in ("h",):
+            total += n_cp(inst.operation.definition)
+    return total
+
+
+def draper_adder_gate(n_bits, a, controlado=False, div=False, control_number=1, inverse=False, merge_angles=True,
+                      min_angle=0.0):
+    """Versão em cache de draper_adder, já convertida em porta (ou na sua inversa).
+
+    Chamadas com os mesmos argumentos devolvem o mesmo objeto Gate.
+    """
+    key = ("draper_adder", n_bits, a, controlado, div, control_number, inverse, merge_angles, min_angle)
+    if inverse:
+        return cached_gate(key, lambda: draper_adder_gate(n_bits, a, controlado, div, control_number,
+                                                          merge_angles=merge_angles, min_angle=min_angle).inverse())
+    return cached_gate(key, lambda: draper_adder(n_bits, a, controlado, div, control_number, merge_angles,
+                                                 min_angle).to_gate())
+
+
+def adder_mod_gate(n_bits, a, N, controlado=False, control_number=1, inverse=False, merge_angles=True,
+                   min_angle=0.0, optimize=False):
+    """Versão em cache de adder_mod, já convertida em porta (ou na sua inversa).
+
+    Chamadas com os mesmos argumentos devolvem o mesmo objeto Gate.
+    """
+    key = ("adder_mod", n_bits, a, N, controlado, control_number, inverse, merge_angles, min_angle, optimize)
+    if inverse:
+        return cached_gate(key, lambda: adder_mod_gate(n_bits, a, N, controlado, control_number,
+                                                       merge_angles=merge_angles, min_angle=min_angle,
+                                                       optimize=optimize).inverse())
+    return cached_gate(key, lambda: adder_mod(n_bits, a, N, controlado, control_number, merge_angles,
+                                              min_angle, optimize=optimize).to_gate())
+
+
+def draper_adder_qq_gate(n_bits, inverse=False, min_angle=0.0, n_out=None):
+    """Versão em cache de draper_adder_qq, já convertida em porta (ou na sua inversa)."""
+    n_out = n_bits + 1 if n_out is None else n_out
+    key = ("draper_adder_qq", n_bits, inverse, min_angle, n_out)
+    if inverse:
+        return cached_gate(key, lambda: draper_adder_qq_gate(n_bits, min_angle=min_angle, n_out=n_out).inverse())
+    return cached_gate(key, lambda: draper_adder_qq(n_bits, min_angle, n_out).to_gate())
+
+
+def adder_mod_qq_gate(n_bits, N, inverse=False, min_angle=0.0):
+    """Versão em cache de adder_mod_qq, já convertida em porta (ou na sua inversa)."""
+    key = ("adder_mod_qq", n_bits, N, inverse, min_angle)
+    if inverse:
+        return cached_gate(key, lambda: adder_mod_qq_gate(n_bits, N, min_angle=min_angle).inverse())
+    return cached_gate(key, lambda: adder_mod_qq(n_bits, N, min_angle).to_gate())
+
+
+# Modo aproximado
+#
+#   Rotações pi/2^k com pi/2^k < min_angle são descartadas. Cada rotação descartada de
+#   ângulo θ muda o operador de no máximo |1 - e^(iθ)| <= θ (norma de operador), então a
+#   soma dos ângulos descartados é uma cota ε para ||U - U_aprox||, e a infidelidade
+#   de qualquer estado fica limitada por ε².
+
+def rotation_cutoff(min_angle):
+    """Maior k tal que pi/2^k >= min_angle (None se min_angle <= 0, i.e. modo exato)."""
+    if min_angle <= 0:
+        return None
+    k = floor(log2(np.pi / min_angle))
+    while np.pi / 2**(k + 1) >= min_angle:
+        k += 1
+    while np.pi / 2**k < min_angle:
+        k -= 1
+    return k
+
+
+def _kept_bits(a_bits, t, k_max):
+    """Parte de a que contribui para a fase do qubit t (bits j com t - j <= k_max)."""
+    val = a_bits % (1 << (t + 1))
+    if k_max is None:
+        return val
+    lo = min(t + 1, max(0, t - k_max))
+    return (val >> lo) << lo
+
+
+def qft_approximation_degree(n_qubits, min_angle):
+    """approximation_degree da QFT(n_qubits) que descarta as rotações menores que min_angle."""
+    k_max = rotation_cutoff(min_angle)
+    if k_max is None:
+        return 0
+    return min(max(0, n_qubits - 1 - k_max), max(0, n_qubits - 1))
+
+
+def qft_error(n_qubits, min_angle=0.0):
+    """Cota do erro (norma de operador) da QFT(n_qubits) aproximada."""
+    degree = qft_approximation_degree(n_qubits, min_angle)
+    # rotações de distância d (ângulo pi/2^d) aparecem n_qubits - d vezes; as de d >= n_qubits - degree saem
+    return sum((n_qubits - d) * np.pi / 2**d for d in range(n_qubits - degree, n_qubits))
+
+
+def draper_adder_error(n_bits, a, min_angle=0.0):
+    """Cota do erro (norma de operador) do draper_adder aproximado: soma dos ângulos descartados."""
+    k_max = rotation_cutoff(min_angle)
+    if k_max is None:
+        return 0.0
+    a_bits = a % (1 << n_bits)
+    return sum(np.pi * ((a_bits % (1 << (t + 1))) - _kept_bits(a_bits, t, k_max)) / 2**t
+               for t in range(n_bits + 1))
+
+
+def adder_mod_error(n_bits, a, N, min_angle=0.0):
+    """Cota do erro do adder_mod aproximado (3 adders de a, 2 de N e 4 QFT/IQFT)."""
+    if min_angle <= 0:
+        return 0.0
+    return (3 * draper_adder_error(n_bits, a, min_angle) + 2 * draper_adder_error(n_bits, N, min_angle)
+            + 4 * qft_error(n_bits + 1, min_angle))
+
+
+def draper_adder_qq_error(n_bits, min_angle=0.0, n_out=None):
+    """Cota do erro do draper_adder_qq aproximado: as cp de distância d > k_max (min(n_bits, n_out - d) de cada)."""
+    k_max = rotation_cutoff(min_angle)
+    if k_max is None:
+        return 0.0
+    n_out = n_bits + 1 if n_out is None else n_out
+    return sum(min(n_bits, n_out - d) * np.pi / 2**d for d in range(max(k_max + 1, 0), n_out))
+
+
+def adder_mod_qq_error(n_bits, N, min_angle=0.0):
+    """Cota do erro do adder_mod_qq aproximado (3 adders de a, 2 de N e 4 QFT/IQFT)."""
+    if min_angle <= 0:
+        return 0.0
+    return (3 * draper_adder_qq_error(n_bits, min_angle) + 2 * draper_adder_error(n_bits, N, min_angle)
+            + 4 * qft_error(n_bits + 1, min_angle))
+
+
+def approx_metadata(error):
+    """Metadata com a cota do erro de aproximação (norma) e da infidelidade resultante."""
+    return {"approx_error": error, "infidelity_bound": min(1.0, error**2)}
+
+
 '''
 def draper_adder(n_bits, a, controlado=False, kind="half", control_number=1, div=False):
     """Retorna um circuito que corresponde ao DraperQFTAdder [1], sem as QFTs e com um operando clássicamente calculado.
@@ -1,39 +1,73 @@
 from qiskit import QuantumCircuit, QuantumRegister, ClassicalRegister
-from qiskit.circuit.library import QFT
-from ctrl_mult_mod import ctrl_mult_mod
+from ctrl_mult_mod import ctrl_mult_mod_gate, ctrl_mult_mod_error
+from draperqftadder_adapt import approx_metadata
+from coset import coset_init_gate, coset_init_error, coset_metadata
 from math import log2
 
-def expmod(N, base, bits_expoente):
+def expmod(N, base, bits_expoente, min_angle=0.0, factor_controls=False, coset_bits=0, optimize=False):
+    """Exponenciação modular |x>|1> -> |x>|base^x mod N> com 2 ctrl_mult_mod por bit do expoente.
+
+    min_angle > 0 descarta as rotações menores que min_angle (modo aproximado, ver adder_mod);
+    a cota do erro total fica em expmod.metadata["approx_error"].
+    factor_controls: ctrl_mult_mod com o AND(x_i, b_j) num qubit extra "and" (adders com 1 controle).
+    coset_bits = m > 0: b e 0 em coset com n + m qubits cada (ver coset.py), sem cout/help.
+        Aqui b começa em |0> e o circuito prepara b = coset(1) e 0 = coset(0); no fim
+        b ≡ base^x mod N (reduzir a leitura mod N) e 0 fica ~coset(0).
+        Cota do desvio em expmod.metadata["coset_deviation"].
+    optimize: passa o circuito pelos passes do fourier_opt.py (abre os blocos, junta os
+        draper_adder vizinhos nos mesmos controles e cancela QFT·IQFT vizinhas); o que foi
+        removido fica em expmod.metadata["fourier_opt"].
+    """
     n_bits = int(log2(N))+1
 
     reg_x = QuantumRegister(bits_expoente, "x")
 
-    reg_b = QuantumRegister(n_bits, "b")
+    reg_b = QuantumRegister(n_bits + coset_bits, "b")
 
     reg_c_aux = QuantumRegister(1, "c_aux")
 
-    reg_0 = QuantumRegister(n_bits, "0")
+    reg_0 = QuantumRegister(n_bits + coset_bits, "0")
 
-    reg_cout = QuantumRegister(1, "cout")
+    reg_cout = QuantumRegister(0 if coset_bits else 1, "cout")
 
-    reg_help = QuantumRegister(1, "help")
+    reg_help = QuantumRegister(0 if coset_bits else 1, "help")
 
     #reg_result = ClassicalRegister(x_bits, "resultado")
 
     #x_bits + 3*n_bits
     expmod = QuantumCircuit(reg_x, reg_b, reg_0, reg_cout, reg_help, name="expmod")
 
+    reg_and = []
+    if factor_controls:
+        reg_and = QuantumRegister(1, "and")
+        expmod.add_register(reg_and)
+
+    error = 0.0
+
+    if coset_bits:
+        expmod.append(coset_init_gate(n_bits, N, coset_bits, 1, min_angle=min_angle), reg_b)
+        expmod.append(coset_init_gate(n_bits, N, coset_bits, 0, min_angle=min_angle), reg_0)
+        error += coset_init_error(n_bits, N, coset_bits, 1, min_angle) + coset_init_error(n_bits, N, coset_bits, 0, min_angle)
+
     for i in range(bits_expoente):
-        expmod.append(ctrl_mult_mod(n_bits, (base**(2**i)) % N, N), reg_x[i:i+1] + reg_b[:] + reg_0[:] + reg_cout[:] + reg_help[:])
+        a_i = pow(base, 2**i, N)
 
-        for j in range(N):
-            if (base**(2**i) * j) % N == 1:
-                a_inv = j
-                break
+        expmod.append(ctrl_mult_mod_gate(n_bits, a_i, N, min_angle=min_angle, factor_controls=factor_controls, coset_bits=coset_bits), reg_x[i:i+1] + reg_b[:] + reg_0[:] + reg_cout[:] + reg_help[:] + reg_and[:])
 
-        expmod.append(ctrl_mult_mod(n_bits, a_inv, N).inverse(), reg_x[i:i+1] + reg_0[:] + reg_b[:] + reg_cout[:] + reg_help[:])
+        a_inv = pow(a_i, -1, N)
 
-        for j in range(n_bits):
+        expmod.append(ctrl_mult_mod_gate(n_bits, a_inv, N, inverse=True, min_angle=min_angle, factor_controls=factor_controls, coset_bits=coset_bits), reg_x[i:i+1] + reg_0[:] + reg_b[:] + reg_cout[:] + reg_help[:] + reg_and[:])
+
+        error += ctrl_mult_mod_error(n_bits, a_i, N, min_angle, coset_bits) + ctrl_mult_mod_error(n_bits, a_inv, N, min_angle, coset_bits)
+
+        for j in range(len(reg_b)):
             expmod.cswap(reg_x[i], reg_0[j], reg_b[j])
 
+    # 2 multiplicações de n + m somas por bit do expoente
+    expmod.metadata = coset_metadata(approx_metadata(error), 2 * bits_expoente * len(reg_b), coset_bits)
+
+    if optimize:
+        from fourier_opt import optimize_fourier   ### só aqui: fourier_opt puxa fourier_sim e o qiskit.transpiler
+        expmod = optimize_fourier(expmod)
+
     return expmod
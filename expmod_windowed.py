@@ -9,18 +9,49 @@
 #       c_mul  --> janela sobre multiplicação (nº de somas)
 #   multiplicação modular constante implementada no
 #   arquivo mult_mod_windowed.py
+#
+#   janela conjunta: em cada janela e_w do expoente, com K = k^e_w,
+#       tmp += acc * K      (mod N)   lookup endereçado por (e_w, janela de acc)
+#       acc -= tmp * K^-1   (mod N)   lookup endereçado por (e_w, janela de tmp)  --> acc = 0
+#   e acc/tmp trocam de papel (só renomeia, sem swap). Duas multiplicações por
+#   janela do expoente, circuito unitário (sem reset).
+#
+#   coset_bits = m > 0: acc/tmp em coset (coset.py) com n + m qubits, começam em
+#   coset(1) / coset(0) e as somas das multiplicações são comuns (sem comparação).
+#
+#   arith = "fourier" | "ripple": somas das multiplicações na base de Fourier (rotações)
+#   ou ripple-carry (Toffolis), ver mult_mod_windowed.py. "auto" escolhe junto com as
+#   janelas pelo objective (ex.: "toffoli" --> fourier, "rotations" --> ripple).
+#   O objective default (resources.synthesized_t_count) conta Toffolis e rotações
+#   juntos: só com Toffolis a escolha em fourier seria sempre c_exp = c_mul = 1
+#   (as somas não têm Toffolis, só os lookups).
 
 
+from collections import namedtuple
 from math import ceil, log2, prod
 from qiskit import QuantumCircuit, QuantumRegister
-from mult_mod_windowed import mult_mod_windowed
+from mult_mod_windowed import mult_mod_windowed_lookup_gate, mult_mod_windowed_error
+from draperqftadder_adapt import approx_metadata
+from coset import coset_init_gate, coset_init_error, coset_metadata
+from qrom import lookup_ancillas
+from resources import estimate_expmod_windowed, synthesized_t_count
+
+
+WindowChoice = namedtuple("WindowChoice", ["c_exp", "c_mul", "resources", "arith"], defaults=["fourier"])
 
 
 def expmod_windowed(N: int,
                     base: int,
                     n_exp: int,
-                    c_exp: int = 3,
-                    c_mul: int = 3):
+                    c_exp: int | str = 3,
+                    c_mul: int | str = 3,
+                    min_angle: float = 0.0,
+                    lam: int = 1,
+                    coset_bits: int = 0,
+                    arith: str = "fourier",
+                    objective=synthesized_t_count,
+                    max_qubits: int | None = None,
+                    optimize: bool = False):
     """
     Modular exponentiation  |e⟩|0⟩  ->  |e⟩|base**e mod N⟩
     ------------------------------------------------------
@@ -29,32 +60,80 @@ def expmod_windowed(N: int,
         n_exp  - qubits do expoente |e⟩
         c_exp  - largura da janela no expoente (default 3) (quantas multiplicações quânticas serão agrupadas)
         c_mul  - largura da janela dentro das multiplicações (quantas adições bit-a-bit serão agrupadas)
+                 c_exp e/ou c_mul = "auto": escolhidos por autotune_windows (menor objective, default T-count com síntese das rotações)
+        min_angle - rotações menores que isso são descartadas (modo aproximado),
+                    cota do erro total em qc.metadata["approx_error"]
+        lam    - cópias do lookup nas multiplicações (1 = qrom, > 1 = QROAM select-swap,
+                 menos Toffolis em troca de (lam-1)*n_bits ancillas)
+        coset_bits - m > 0: acc/tmp em representação de coset (ver coset.py), n_bits + m
+                 qubits cada, sem help. No fim acc ≡ base**e mod N (reduzir a leitura mod N)
+                 e tmp fica ~coset(0) (não |0⟩); cota do desvio em qc.metadata["coset_deviation"]
+        arith  - "fourier" (default), "ripple" (somas ripple-carry, sem rotações, + registrador
+                 "carry") ou "auto" (escolhida por autotune_windows junto com as janelas)
+        objective - critério das escolhas "auto" (ver autotune_windows), default
+                 resources.synthesized_t_count
+        max_qubits - orçamento de qubits das escolhas "auto" (None: sem limite)
+        optimize - passa o circuito pelos passes do fourier_opt.py: a IQFT do fim de uma
+                 janela e a QFT do começo da seguinte (mesmo registrador) se cancelam;
+                 relatório em qc.metadata["fourier_opt"]
+
+        Circuito unitário: 2 multiplicações (janela conjunta expoente + fator) por janela do expoente.
 
 
 
     Registradores de trabalho:
         e      : n_exp    - expoente (input)
-        acc    : n_bits+1 - acumulador / resultado
-        tmp    : n_bits+1 - workspace (para multiplicações)
-        anc    :     2    - ancillas (QROM)
+        acc    : n_bits+1 (n_bits + m em coset) - acumulador / resultado
+        tmp    : n_bits+1 (n_bits + m em coset) - workspace (para multiplicações), volta a |0⟩
+                 (~coset(0) em coset)
+        anc    :   ...    - ancillas do lookup (ver qrom.lookup_ancillas)
+        look   : n_bits   - workspace do lookup das multiplicações
+        help   : 1        - ancilla da soma modular (adder_mod_qq), 0 em coset
+        carry  : n_bits (n_bits + m - 1 em coset) - carries do ripple-carry, só com arith="ripple"
     """
+    ## janelas / aritmética automáticas (modelo de custo do resources.py)
+    if c_exp == "auto" or c_mul == "auto" or arith == "auto":
+        metric = objective if callable(objective) else (lambda r: getattr(r, objective))
+        front = autotune_windows(N, n_exp, objective=objective, max_qubits=max_qubits, lam=lam, min_angle=min_angle,
+                                 coset_bits=coset_bits,
+                                 c_exp=None if c_exp == "auto" else c_exp,
+                                 c_mul=None if c_mul == "auto" else c_mul,
+                                 arith=None if arith == "auto" else arith)
+        if not front:
+            raise ValueError(f"expmod_windowed: nenhuma escolha de janelas cabe em max_qubits = {max_qubits}")
+        best = min(front, key=lambda ch: (metric(ch.resources), ch.resources.toffoli + ch.resources.cnot + ch.resources.rotations))
+        c_exp, c_mul, arith = best.c_exp, best.c_mul, best.arith
+
     ## tamanhos 
     n_bits = int(log2(N)) + 1                ## nº de qubits para representar N
     w_exp  = ceil(n_exp / c_exp)             ## nº de janelas no expoente
+    b_len  = n_bits + coset_bits             ## bits do fator nas multiplicações
 
     ## registradores
     reg_e   = QuantumRegister(n_exp,   "e")      ## expoente |e>
-    acc     = QuantumRegister(n_bits + 1, "acc") ## acumulador |resultado>
-    tmp     = QuantumRegister(n_bits + 1, "tmp") ## workspace (sobra  |0>)
-    anc     = QuantumRegister(2,         "anc")  ## ancillas QROM
-
-    qc = QuantumCircuit(reg_e, acc, tmp, anc, name="expmodW")
-
-    ## inicializa acumulador em 1  (|001…⟩)
-    qc.x(acc[0])
+    acc     = QuantumRegister(n_bits + max(coset_bits, 1), "acc") ## acumulador |resultado>
+    tmp     = QuantumRegister(n_bits + max(coset_bits, 1), "tmp") ## workspace (sobra  |0>)
+    L_max   = 1 << (min(c_exp, n_exp) + min(c_mul, b_len))   ## endereço = janela do expoente + janela do fator
+    anc     = QuantumRegister(lookup_ancillas(L_max, n_bits, lam), "anc")  ## ancillas QROM/QROAM
+    look    = QuantumRegister(n_bits, "look")    ## workspace do lookup
+    reg_help = QuantumRegister(0 if coset_bits else 1, "help")
+    carry   = QuantumRegister(len(acc) - 1 if arith == "ripple" else 0, "carry")
 
+    qc = QuantumCircuit(reg_e, acc, tmp, anc, look, reg_help, carry, name="expmodW")
 
+    ## acc e tmp trocam de papel a cada janela: com nº ímpar de janelas
+    ## o 1 começa no tmp para o resultado terminar no acc
+    cur, other = (acc, tmp) if w_exp % 2 == 0 else (tmp, acc)
 
+    error = 0.0
+    if coset_bits:
+        ## acumulador em coset(1), workspace em coset(0)
+        qc.append(coset_init_gate(n_bits, N, coset_bits, 1, min_angle=min_angle), cur)
+        qc.append(coset_init_gate(n_bits, N, coset_bits, 0, min_angle=min_angle), other)
+        error += coset_init_error(n_bits, N, coset_bits, 1, min_angle) + coset_init_error(n_bits, N, coset_bits, 0, min_angle)
+    else:
+        ## inicializa acumulador em 1  (|001…⟩)
+        qc.x(cur[0])
 
     ## Percorre janelas do expoente:  menos significativo --> MSB
     for w in range(w_exp):
@@ -65,47 +144,137 @@ def expmod_windowed(N: int,
         ### calcula k = base^(2^(lo)) (mod N)
         k_pow = pow(base, 1 << lo, N)   # base^(2^lo)  mod N
 
-        ### tabela dos 2^width fatores
+        ### tabela dos 2^width fatores e dos inversos com sinal trocado
         factors = [ pow(k_pow, j, N) for j in range(1 << width) ]
+        minus_inv = [ (-pow(f, -1, N)) % N for f in factors ]
 
-        ### qubits da janela de expoente que indexam a lookup-multiplicação
+        ### qubits da janela de expoente: bits altos do endereço dos lookups
         addr_exp = [reg_e[q] for q in range(lo, hi)]
+        work = anc[:lookup_ancillas(len(factors) << min(c_mul, b_len), n_bits, lam)] + look[:] + reg_help[:] + carry[:]
+
+        ###  other += cur * K   (other começa em 0)
+        qc.append(mult_mod_windowed_lookup_gate(n_bits, factors, N, c_mul, min_angle=min_angle, lam=lam, coset_bits=coset_bits,
+                                                arith=arith),
+                  addr_exp + cur[:b_len] + other[:] + work)
+        ###  cur -= other * K^-1  -->  cur = 0
+        qc.append(mult_mod_windowed_lookup_gate(n_bits, minus_inv, N, c_mul, min_angle=min_angle, lam=lam, coset_bits=coset_bits,
+                                                arith=arith),
+                  addr_exp + other[:b_len] + cur[:] + work)
+        error += 2 * mult_mod_windowed_error(n_bits, N, c_mul, min_angle, coset_bits, arith)
+
+        cur, other = other, cur
+
+    ## 2 multiplicações de ⌈b_len / c_mul⌉ somas por janela do expoente
+    qc.metadata = coset_metadata(approx_metadata(error), 2 * w_exp * ceil(b_len / c_mul), coset_bits)
 
-        ###  multiplicação modular (acc *= factor)
-        ###  multiplicação é NÃO-controlada, o controle se reflete
-        ###  no lookup que devolve 1 quando a sub-janela vale 0.
-        mul_gate = mult_mod_windowed(n_bits, 1, N, c_mul) 
-
-        ###   Para cada possível valor da janela, precisamos multiplicar
-        ###   o acumulador pela constante "factors[val]".
-        ###   Fazemos isso como um cascade de lookups no estilo
-        ###   “select-swap”. Pra clareza e simplicidade usei
-        ###   multiplicações constantes controladas por "addr_exp".
-        for val, const in enumerate(factors):
-            if const == 1:
-                continue                     
-            const_mul = mult_mod_windowed(n_bits, const, N, c_mul)
-            ### controles, todos os qubits de addr_exp em estado correspondente a "val"
-
-
-            ### qubit auxiliar
-            ctrl_aux = tmp[-1]
-            ### argumentos esperados por const_mul
-            wire_list = [ctrl_aux] + tmp[:-1] + acc[:] + anc[:]
-
-            bin_val = [(val >> b) & 1 for b in range(width)]
-            conds   = []
-            for qb, bit in zip(addr_exp, bin_val):
-                if bit == 0:
-                    qc.x(qb)
-                conds.append(qb)
-            qc.mcx(conds, ctrl_aux)          ### usa tmp[-1] como controle auxiliar
-            qc.append(const_mul, wire_list)
-            qc.mcx(conds, ctrl_aux)
-            qc.reset(ctrl_aux)
-            for qb, bit in zip(addr_exp, bin_val):
-                if bit == 0:
-                    qc.x(qb)
+    if optimize:
+        from fourier_opt import optimize_fourier   ### só aqui: fourier_opt puxa fourier_sim e o qiskit.transpiler
+        qc = optimize_fourier(qc)
 
     #resultado em |acc⟩
     return qc
+
+
+def autotune_windows(N, n_exp, objective=synthesized_t_count, max_qubits=None, lam=1, min_angle=0.0,
+                     c_exp=None, c_mul=None, c_max=10, coset_bits=0, arith="fourier"):
+    """
+    Procura (c_exp, c_mul) para expmod_windowed no modelo de custo de resources.py
+    (estimate_expmod_windowed, fórmula fechada), sem montar circuitos.
+
+        objective  - campo de Resources a minimizar ("toffoli", "t_count", "cnot",
+                     "rotations", "depth_bound") ou função Resources -> número; default
+                     resources.synthesized_t_count (7 por Toffoli + T_PER_ROTATION por rotação)
+        max_qubits - descarta as escolhas com mais qubits que isso
+        c_exp, c_mul - fixam uma das janelas (None: varre 1..c_max)
+        coset_bits - representação em coset (ver expmod_windowed)
+        arith      - "fourier" / "ripple", ou None para comparar as duas
+
+    Empates no objective são decididos pelo total de portas (toffoli + cnot + rotations).
+    Retorna a frente de Pareto (qubits x objective) como lista de
+    WindowChoice(c_exp, c_mul, resources, arith), ordenada por nº de qubits.
+    Lista vazia se nada couber em max_qubits.
+    """
+    n_bits = int(log2(N)) + 1
+    metric = objective if callable(objective) else (lambda r: getattr(r, objective))
+    cost = lambda r: (metric(r), r.toffoli + r.cnot + r.rotations)
+    exps = [c_exp] if c_exp is not None else range(1, min(n_exp, c_max) + 1)
+    muls = [c_mul] if c_mul is not None else range(1, min(n_bits + coset_bits, c_max) + 1)
+
+    ariths = [arith] if arith is not None else ["fourier", "ripple"]
+
+    choices = []
+    for ce in exps:
+        for cm in muls:
+            for ar in ariths:
+                r = estimate_expmod_windowed(N, base=2, n_exp=n_exp, c_exp=ce, c_mul=cm, min_angle=min_angle,
+                                             lam=lam, exact=False, coset_bits=coset_bits, arith=ar)
+                if max_qubits is None or r.qubits <= max_qubits:
+                    choices.append(WindowChoice(ce, cm, r, ar))
+
+    ### frente de Pareto: por qubits crescentes, fica quem melhora o objetivo
+    front = []
+    for ch in sorted(choices, key=lambda ch: (ch.resources.qubits, cost(ch.resources))):
+        if not front or cost(ch.resources) < cost(front[-1].resources):
+            front.append(ch)
+    return front
+
+
+if __name__ == "__main__":
+    from qiskit import ClassicalRegister, transpile
+    from qiskit_aer import AerSimulator
+    from fourier_sim import verify_expmod_windowed
+
+    ### todos os expoentes --> base^e mod N (simulador na base de Fourier)
+    for N, base, n_exp, c_exp, c_mul in ((15, 7, 4, 2, 2), (21, 2, 5, 3, 2), (55, 3, 6, 2, 3)):
+        wrong = verify_expmod_windowed(N, base, n_exp, c_exp, c_mul)
+        assert wrong == 0, (N, base, n_exp, c_exp, c_mul, wrong)
+        wrong = verify_expmod_windowed(N, base, n_exp, c_exp, c_mul, arith="ripple")
+        assert wrong == 0, (N, base, n_exp, c_exp, c_mul, "ripple", wrong)
+        print(f"N = {N}  base = {base}  e < 2^{n_exp}  c_exp = {c_exp}  c_mul = {c_mul}: ok (fourier e ripple)")
+
+    ### unitário: e em |+⟩, circuito e a inversa, H de novo --> tudo volta a 0 (um statevector só)
+    backend = AerSimulator()
+    qc = expmod_windowed(7, 3, 3, 2, 2)
+    res = ClassicalRegister(qc.num_qubits, "res")
+    full = qc.copy_empty_like()
+    full.add_register(res)
+    full.h(range(3))
+    full.compose(qc, inplace=True)
+    full.compose(qc.inverse(), inplace=True)
+    full.h(range(3))
+    full.measure(range(qc.num_qubits), res)
+    counts = backend.run(transpile(full, backend), shots=256).result().get_counts()
+    assert counts == {"0" * qc.num_qubits: 256}, counts
+    print(f"expmod_windowed(7, 3, 3) · inversa = identidade ({qc.num_qubits} qubits, sem reset)")
+
+    ### 2 multiplicações por janela do expoente (modelo do resources.py, 512 bits):
+    ### as somas caem com 1/c_exp, as tabelas crescem com 2^c_exp
+    N = (1 << 511) + 187
+    for c_exp in (1, 2, 4, 6, 8):
+        r = estimate_expmod_windowed(N, 3, 1024, c_exp, 6, exact=False)
+        print(f"n = 512  n_exp = 1024  c_exp = {c_exp}  c_mul = 6: {ceil(1024 / c_exp):5d} janelas  "
+              f"{r.toffoli:12d} Toffolis  {r.rotations:14d} rotações  {r.qubits} qubits")
+
+    ### "auto" sob orçamento de qubits: a escolha respeita max_qubits, e sem escolha possível é ValueError
+    for max_qubits in (None, 44, 40):
+        qc = expmod_windowed(221, 3, 8, "auto", "auto", objective="rotations", max_qubits=max_qubits)
+        print(f"N = 221  n_exp = 8  auto (rotations)  max_qubits = {max_qubits}: {qc.num_qubits} qubits")
+        assert max_qubits is None or qc.num_qubits <= max_qubits
+    try:
+        expmod_windowed(221, 3, 8, "auto", "auto", max_qubits=30)
+        raise AssertionError("max_qubits = 30 deveria falhar")
+    except ValueError as err:
+        print(err)
+
+    ### objective default: conta as rotações, então em fourier a escolha não cai em 1 x 1
+    best = min(autotune_windows(N, 1024), key=lambda ch: synthesized_t_count(ch.resources))
+    hard = estimate_expmod_windowed(N, 3, 1024, 3, 3, exact=False)
+    assert (best.c_exp, best.c_mul) != (1, 1) and best.resources.rotations < hard.rotations
+    print(f"n = 512  objective default: c_exp = {best.c_exp} c_mul = {best.c_mul}  "
+          f"{best.resources.rotations} rotações (3 x 3: {hard.rotations})")
+
+    ### Fourier vs ripple-carry no autotune: qual ganha depende do objective
+    for objective in ("toffoli", "rotations", "cnot"):
+        best = min(autotune_windows(N, 1024, objective, arith=None), key=lambda ch: getattr(ch.resources, objective))
+        print(f"n = 512  objective = {objective:9s}: {best.arith:7s} c_exp = {best.c_exp} c_mul = {best.c_mul}  "
+              f"{best.resources.toffoli:12d} Toffolis  {best.resources.rotations:14d} rotações  {best.resources.qubits} qubits")
@@ -0,0 +1,352 @@
+# fourier_opt.py
+#
+# Passes de transpile que enxergam dentro dos blocos aritméticos (adder_mod, ctrl_mult_mod,
+# expmod, ...), que para os passes genéricos do qiskit são portas opacas com nome.
+#
+#   InlineArithmeticBlocks - desce nas definições até sobrarem só portas da biblioteca,
+#                            QFT / IQFT (qft_gate) e blocos diagonais (draper_adder, ...)
+#   CancelQFTPairs         - remove QFT·IQFT (e IQFT·QFT) vizinhas nos mesmos qubits, na
+#                            mesma ordem. Ex.: no expmod_windowed a IQFT do acumulador no
+#                            fim de uma janela e a QFT do começo da seguinte (no expmod e
+#                            no ctrl_mult_mod o cswap entre as multiplicações impede)
+#   FuseDiagonalAdders     - junta blocos diagonais vizinhos (mesmos controles / alvos, ou
+#                            um contido no outro) num bloco só, somando as fases por
+#                            conjunto de qubits. Ex.: no adder_mod os draper_adder de +a e
+#                            -N com os mesmos controles viram um draper_adder de a - N
+#
+#   "Vizinhos" = nenhuma porta no meio toca os qubits do segundo (ele comuta com tudo que
+#   está entre os dois). Fases que somam 0 mod 2π somem; um bloco que vira identidade sai.
+#   fourier_pass_manager repete CancelQFTPairs e FuseDiagonalAdders até nada mudar: um bloco
+#   que vira identidade na fusão pode deixar um par QFT·IQFT vizinho.
+#   Os passes guardam o que removeram em property_set["fourier_opt"]:
+#       qft_pairs, qft_gates_removed, adders_fused, rotations_removed
+#
+#       qc = optimize_fourier(ctrl_mult_mod(6, 40, 55))     (= ctrl_mult_mod(..., optimize=True))
+#       qc.metadata["fourier_opt"]
+#
+#   O circuito resultante é o mesmo unitário, mas sem o compartilhamento do gate_cache
+#   (os blocos de fora são desfeitos). A detecção de blocos diagonais é memorizada por
+#   objeto em property_set["fourier_phase_memo"], que vale só durante um pm.run.
+
+from collections import Counter, defaultdict
+from math import pi
+from qiskit import QuantumCircuit
+from qiskit.circuit import ControlledGate
+from qiskit.circuit.library import PhaseGate
+from qiskit.converters import circuit_to_dag, dag_to_circuit
+from qiskit.transpiler import PassManager, DoWhileController
+from qiskit.transpiler.basepasses import TransformationPass
+from draperqftadder_adapt import QFT_DIR, n_cp
+from gate_cache import is_custom
+
+_DIAG_PI = {"z": 1, "cz": 2}          ### fase π com todos os qubits em 1
+_TOL = 1e-12
+
+
+def _phases(op, memo):
+    """
+    Porta diagonal de fases --> (fase global, [(qubits locais, λ)]): fase λ quando todos
+    os qubits do conjunto estão em 1. None se op não é só p / cp / mcphase / z / cz.
+    memo: id(op) --> (op, resultado) dos blocos já vistos (ver _phase_memo).
+    """
+    if op.name == "p":
+        return _float_terms(0.0, [((0,), op.params[0])])
+    if op.name in _DIAG_PI:
+        return 0.0, [(tuple(range(_DIAG_PI[op.name])), pi)]
+    if isinstance(op, ControlledGate) and op.base_gate.name == "p":
+        k = op.num_ctrl_qubits
+        if op.ctrl_state != (1 << k) - 1:
+            return None
+        return _float_terms(0.0, [(tuple(range(k + 1)), op.base_gate.params[0])])
+    if not is_custom(op) or op.name in QFT_DIR:
+        return None
+
+    ### bloco: memo por objeto (os blocos do gate_cache se repetem muito)
+    key = id(op)
+    if key in memo:
+        return memo[key][1]
+    defn = op.definition
+    terms = (float(defn.global_phase), [])
+    for inst in defn.data:
+        sub = _phases(inst.operation, memo)
+        if sub is None or inst.clbits:
+            terms = None
+            break
+        qs = [defn.find_bit(q).index for q in inst.qubits]
+        terms = (terms[0] + sub[0], terms[1] + [(tuple(qs[i] for i in t), lam) for t, lam in sub[1]])
+    memo[key] = (op, terms)                    ### guarda op: id() não pode ser reaproveitado
+    return terms
+
+
+def _phase_memo(property_set):
+    """Memo do _phases para o pm.run atual (descartado junto com o property_set)."""
+    if property_set["fourier_phase_memo"] is None:
+        property_set["fourier_phase_memo"] = {}
+    return property_set["fourier_phase_memo"]
+
+
+def _float_terms(phase, terms):
+    try:
+        return phase, [(t, float(lam)) for t, lam in terms]
+    except TypeError:                          ### Parameter (modo template)
+        return None
+
+
+def _wrap(lam):
+    lam = (lam + pi) % (2 * pi) - pi
+    return 0.0 if abs(lam) < _TOL or abs(abs(lam) - 2 * pi) < _TOL else lam
+
+
+def _size(op):
+    """Nº de portas da biblioteca dentro de op."""
+    if op.definition is None or not is_custom(op) and op.name not in QFT_DIR:
+        return 1
+    return sum(_size(inst.operation) for inst in op.definition.data)
+
+
+def _items(qc):
+    return [(inst.operation, tuple(qc.find_bit(q).index for q in inst.qubits),
+             tuple(qc.find_bit(c).index for c in inst.clbits)) for inst in qc.data]
+
+
+def _rebuild(qc, items, phase=0.0):
+    """Circuito com os registradores / metadata de qc e as operações items (índices globais)."""
+    out = QuantumCircuit(*qc.qregs, *qc.cregs, name=qc.name, global_phase=qc.global_phase + phase,
+                         metadata=dict(qc.metadata or {}))
+    for q in qc.qubits:
+        if not qc.find_bit(q).registers:
+            out.add_bits([q])
+    for c in qc.clbits:
+        if not qc.find_bit(c).registers:
+            out.add_bits([c])
+    for op, qs, cs in items:
+        out.append(op, [out.qubits[i] for i in qs], [out.clbits[i] for i in cs], copy=False)
+    return out
+
+
+def _add_stats(property_set, **kw):
+    stats = property_set["fourier_opt"] or Counter()
+    stats.update(kw)
+    property_set["fourier_opt"] = stats
+
+
+class InlineArithmeticBlocks(TransformationPass):
+    """Desce nos blocos compostos; ficam portas da biblioteca, QFT/IQFT e blocos diagonais."""
+
+    def run(self, dag):
+        qc = dag_to_circuit(dag)
+        items, phase = [], 0.0
+        memo = _phase_memo(self.property_set)
+
+        def inline(circ, qmap, cmap):
+            nonlocal phase
+            for op, qs, cs in _items(circ):
+                qs, cs = tuple(qmap[i] for i in qs), tuple(cmap[i] for i in cs)
+                if is_custom(op) and op.name not in QFT_DIR and _phases(op, memo) is None:
+                    phase += float(op.definition.global_phase)
+                    inline(op.definition, qs, cs)
+                else:
+                    items.append((op, qs, cs))
+
+        inline(qc, range(qc.num_qubits), range(qc.num_clbits))
+        return circuit_to_dag(_rebuild(qc, items, phase))
+
+
+class _Entry:
+    """Operação na saída do peephole; diagonais guardam as fases por conjunto de qubits globais."""
+    __slots__ = ("op", "qs", "cs", "terms", "phase", "fused")
+
+    def __init__(self, op, qs, cs):
+        self.op, self.qs, self.cs = op, qs, cs
+        self.terms, self.phase, self.fused = None, 0.0, False
+
+    def load_terms(self, memo):
+        """{frozenset(qubits): [λ, qubits na ordem original]} a partir de _phases(op)."""
+        if self.terms is None:
+            phase, terms = _phases(self.op, memo)
+            self.phase, self.terms = phase, {}
+            _merge_terms(self.terms, [(tuple(self.qs[i] for i in t), lam) for t, lam in terms])
+        return self.terms
+
+    def gate(self):
+        if not self.fused:
+            return self.op
+        idx = {q: i for i, q in enumerate(self.qs)}
+        circ = QuantumCircuit(len(self.qs), name="fused_drap_adder", global_phase=self.phase)
+        for lam, order in self.terms.values():
+            local = [idx[q] for q in order]
+            if len(local) == 1:
+                circ.p(lam, local[0])
+            else:
+                circ.append(PhaseGate(lam).control(len(local) - 1), local)
+        return circ.to_gate()
+
+
+def _merge_terms(terms, new):
+    for t, lam in new:
+        key = frozenset(t)
+        if key in terms:
+            terms[key][0] = _wrap(terms[key][0] + lam)
+        else:
+            terms[key] = [_wrap(lam), t]
+    for key in [k for k, v in terms.items() if v[0] == 0.0]:
+        del terms[key]
+
+
+def _peephole(qc, qft, fuse, property_set):
+    """Uma passada: cada operação olha a última entrada que toca algum dos seus qubits."""
+    out = []
+    stacks = defaultdict(list)                 ### qubit --> índices em out que o tocam
+    stats = Counter()
+    phase_out = 0.0
+    memo = _phase_memo(property_set)
+
+    def last_of(qs):
+        return max((stacks[q][-1] for q in qs if stacks[q]), default=None)
+
+    def drop(i):
+        for q in out[i].qs:
+            stacks[q].remove(i)
+        out[i] = None
+
+    for op, qs, cs in _items(qc):
+        i = last_of(qs)
+        prev = out[i] if i is not None else None
+
+        ### QFT seguida da inversa (mesmos qubits, mesma ordem, mesma aproximação)
+        if (qft and prev is not None and not cs and op.name in QFT_DIR and prev.op.name in QFT_DIR
+                and prev.qs == qs and QFT_DIR[op.name] == -QFT_DIR[prev.op.name]
+                and n_cp(op.definition) == n_cp(prev.op.definition)):
+            stats.update(qft_pairs=1, qft_gates_removed=_size(op) + _size(prev.op))
+            drop(i)
+            continue
+
+        ### bloco diagonal vizinho de outro, com os qubits de um contidos nos do outro
+        if (fuse and prev is not None and not cs and _phases(op, memo) is not None
+                and _phases(prev.op, memo) is not None and (set(qs) <= set(prev.qs) or set(prev.qs) <= set(qs))):
+            terms = prev.load_terms(memo)
+            before = len(terms)
+            phase, new = _phases(op, memo)
+            prev.terms = terms = dict((k, list(v)) for k, v in terms.items())
+            _merge_terms(terms, [(tuple(qs[j] for j in t), lam) for t, lam in new])
+            prev.phase += phase
+            prev.fused = True
+            stats.update(adders_fused=1, rotations_removed=before + len(new) - len(terms))
+            extra = tuple(q for q in qs if q not in prev.qs)
+            if extra:
+                prev.qs = prev.qs + extra
+                for q in extra:
+                    stacks[q].append(i)
+            if not terms:
+                ### virou identidade (a menos da fase global)
+                phase_out += prev.phase
+                drop(i)
+            continue
+
+        for q in qs:
+            stacks[q].append(len(out))
+        out.append(_Entry(op, qs, cs))
+
+    _add_stats(property_set, **stats)
+    return _rebuild(qc, [(e.gate(), e.qs, e.cs) for e in out if e is not None], phase_out)
+
+
+class CancelQFTPairs(TransformationPass):
+    """Remove pares QFT / IQFT vizinhos (depois de InlineArithmeticBlocks)."""
+
+    def run(self, dag):
+        return circuit_to_dag(_peephole(dag_to_circuit(dag), True, False, self.property_set))
+
+
+class FuseDiagonalAdders(TransformationPass):
+    """Junta blocos diagonais vizinhos (draper_adder de constantes nos mesmos controles)."""
+
+    def run(self, dag):
+        return circuit_to_dag(_peephole(dag_to_circuit(dag), False, True, self.property_set))
+
+
+def _changed(property_set):
+    """True se a última volta de CancelQFTPairs + FuseDiagonalAdders removeu alguma coisa."""
+    total = sum((property_set["fourier_opt"] or Counter()).values())
+    changed = total != (property_set["fourier_opt_seen"] or 0)
+    property_set["fourier_opt_seen"] = total
+    return changed
+
+
+def fourier_pass_manager():
+    """PassManager com InlineArithmeticBlocks e CancelQFTPairs + FuseDiagonalAdders até nada mudar."""
+    return PassManager([InlineArithmeticBlocks(),
+                        DoWhileController([CancelQFTPairs(), FuseDiagonalAdders()], do_while=_changed)])
+
+
+def optimize_fourier(qc):
+    """Roda fourier_pass_manager em qc; o que foi removido fica em metadata["fourier_opt"]."""
+    pm = fourier_pass_manager()
+    out = pm.run(qc)
+    stats = dict(pm.property_set["fourier_opt"] or {})
+    out.metadata = dict(qc.metadata or {}, fourier_opt={k: stats.get(k, 0) for k in
+                        ("qft_pairs", "qft_gates_removed", "adders_fused", "rotations_removed")})
+    return out
+
+
+if __name__ == "__main__":
+    import numpy as np
+    from qiskit import transpile
+    from qiskit.quantum_info import Operator
+    from draperqftadder_adapt import adder_mod
+    from ctrl_mult_mod import ctrl_mult_mod
+    from expmod import expmod
+    from mult_mod_windowed import mult_mod_windowed
+    from expmod_windowed import expmod_windowed
+    from fourier_sim import run_fourier
+    from resources import count_circuit
+
+    ### mesmo unitário (casos pequenos)
+    for qc in (adder_mod(3, 5, 7, controlado=True), adder_mod(3, 5, 7, controlado=True, control_number=2),
+               ctrl_mult_mod(3, 5, 7), ctrl_mult_mod(3, 5, 7, factor_controls=True), ctrl_mult_mod(2, 2, 3, coset_bits=2),
+               expmod(7, 3, 2), mult_mod_windowed(2, 2, 3, 2)):
+        opt = optimize_fourier(qc)
+        assert Operator(opt).equiv(Operator(qc)), qc.name
+    print("optimize_fourier == circuito original (Operator)")
+
+    ### memo do _phases: um por pm.run, não cresce entre chamadas
+    pm = fourier_pass_manager()
+    pm.run(ctrl_mult_mod(4, 5, 11))
+    memo = pm.property_set["fourier_phase_memo"]
+    pm.run(adder_mod(3, 5, 7, controlado=True))
+    assert memo and pm.property_set["fourier_phase_memo"] is not memo
+    print(f"memo do _phases por pm.run ({len(memo)} blocos no ctrl_mult_mod(4, 5, 11))")
+
+    ### fusão que vira identidade expõe um par QFT·IQFT: a segunda volta o cancela
+    from draperqftadder_adapt import qft_gate, draper_adder_gate
+    qc = QuantumCircuit(5)
+    qc.append(qft_gate(5), range(5))
+    qc.append(draper_adder_gate(4, 5), range(5))
+    qc.append(draper_adder_gate(4, 5, inverse=True), range(5))
+    qc.append(qft_gate(5, inverse=True), range(5))
+    opt = optimize_fourier(qc)
+    assert opt.size() == 0 and opt.metadata["fourier_opt"]["qft_pairs"] == 1, opt.metadata
+    assert Operator(opt).equiv(Operator(qc))
+    print(f"QFT · (+5) · (-5) · IQFT --> circuito vazio {opt.metadata['fourier_opt']}")
+
+    ### mesma saída no simulador da base de Fourier, todas as entradas (casos maiores)
+    rng = np.random.default_rng(3)
+    for qc, inputs in ((ctrl_mult_mod(8, 100, 251), {"c": rng.integers(0, 2, 4096), "b": rng.integers(0, 256, 4096)}),
+                       (expmod(55, 3, 6), {"x": np.arange(64), "b": 1}),
+                       (expmod_windowed(221, 5, 8, 2, 3), {"e": np.arange(256)})):
+        opt = optimize_fourier(qc)
+        out, phase = run_fourier(qc, inputs)
+        out_opt, phase_opt = run_fourier(opt, inputs)
+        assert all(np.array_equal(out[k], out_opt[k]) for k in out), qc.name
+        assert np.allclose(np.exp(1j * phase), np.exp(1j * (phase_opt + opt.global_phase - qc.global_phase))), qc.name
+        print(f"{qc.name:10s} {opt.metadata['fourier_opt']}: mesma saída (fourier_sim)")
+
+    ### portas: com e sem os passes
+    for label, build in (("ctrl_mult_mod(8, 100, 251)", lambda o: ctrl_mult_mod(8, 100, 251, optimize=o)),
+                         ("expmod(77, 2, 3)", lambda o: expmod(77, 2, 3, optimize=o)),
+                         ("expmod_windowed(221, 5, 8, 2, 3)", lambda o: expmod_windowed(221, 5, 8, 2, 3, optimize=o))):
+        r0, r1 = count_circuit(build(False)), count_circuit(build(True))
+        tqc0 = transpile(build(False), basis_gates=["cx", "u"], optimization_level=1)
+        tqc1 = transpile(build(True), basis_gates=["cx", "u"], optimization_level=1)
+        print(f"{label:32s}: rotações {r0.rotations:6d} --> {r1.rotations:6d}  |  cx/u: {tqc0.count_ops().get('cx', 0):6d} --> "
+              f"{tqc1.count_ops().get('cx', 0):6d} cx, profundidade {tqc0.depth():6d} --> {tqc1.depth():6d}")
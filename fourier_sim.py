@@ -0,0 +1,482 @@
+# fourier_sim.py
+#
+# Simulador "simbólico" na base de Fourier para adder_mod / ctrl_mult_mod.
+#
+#   Entre uma QFT e a IQFT o registrador aritmético só recebe fases (draper_adder),
+#   então cada qubit t dele fica no estado |0⟩ + e^{iθ_t}|1⟩. Em vez do statevector
+#   guardamos, para cada entrada do lote:
+#       - o valor (0/1) dos qubits fora da base de Fourier (controles, ancillas, ...)
+#       - o vetor de fases θ_t dos qubits do registrador de Fourier
+#       - a fase global acumulada
+#
+#   QFT(m, do_swaps=False)|x⟩ tem θ_t = 2π x / 2^(t+1), então usando a unidade 2π/2^m
+#   as fases são inteiros mod 2^m:  θ_t = x * 2^(m-1-t).  Uma fase λ no qubit t soma
+#   λ*2^m/2π a θ_t (precisa ser inteiro, senão ValueError).
+#
+#   Na IQFT o valor é lido do qubit mais sensível (t = m-1, o cout: θ = x) e todas
+#   as outras fases são conferidas contra esse x. Se não baterem o estado não é mais
+#   um estado da base e o simulador acusa (ValueError).
+#
+#   Portas aceitas: X / CX / CCX / MCX / SWAP / CSWAP nos qubits comuns, fases (p, cp,
+#   mcphase) controladas por qubits comuns, QFT / IQFT exatas (qft_gate) e portas
+#   compostas dessas (draper_adder, adder_mod, ctrl_mult_mod, mult_mod_windowed, ... e as inversas).
+#   Os somadores ripple-carry do adder_plain (mbu=False) são só X / CX / CCX: arith="ripple"
+#   nas versões janeladas também roda aqui.
+
+from math import ceil
+import numpy as np
+from qiskit import QuantumCircuit
+from qiskit.circuit import ControlledGate
+from draperqftadder_adapt import QFT_DIR, n_cp
+
+_SKIP = ("barrier", "id", "delay")
+
+
+def _compile(qc, qubits=None, ops=None):
+    """
+    Desce nas definições e devolve a lista de operações do simulador:
+        ("x",    controles, ctrl_state, [alvo])
+        ("swap", controles, ctrl_state, [a, b])
+        ("p",    controles, ctrl_state, [alvo], λ)
+        ("qft",  (),        0,          qubits, ±1)
+    """
+    if qubits is None:
+        qubits = list(range(qc.num_qubits))
+    if ops is None:
+        ops = []
+    for inst in qc.data:
+        op = inst.operation
+        qs = [qubits[qc.find_bit(q).index] for q in inst.qubits]
+        if op.name in _SKIP:
+            continue
+        if inst.clbits or op.name in ("measure", "reset"):
+            raise ValueError(f"operação não suportada: {op.name}")
+        if op.name in QFT_DIR:
+            m = len(qs)
+            if n_cp(op.definition) != m * (m - 1) // 2:
+                raise ValueError("QFT aproximada não é suportada (use min_angle = 0)")
+            ops.append(("qft", (), 0, qs, QFT_DIR[op.name]))
+        elif op.name in ("x", "swap"):
+            ops.append((op.name, (), 0, qs))
+        elif op.name == "p":
+            ops.append(("p", (), 0, qs, float(op.params[0])))
+        elif isinstance(op, ControlledGate) and op.base_gate.name in ("x", "swap", "p"):
+            k = op.num_ctrl_qubits
+            if op.base_gate.name == "p":
+                ops.append(("p", qs[:k], op.ctrl_state, qs[k:], float(op.base_gate.params[0])))
+            else:
+                ops.append((op.base_gate.name, qs[:k], op.ctrl_state, qs[k:]))
+        elif op.definition is not None:
+            _compile(op.definition, qs, ops)
+        else:
+            raise ValueError(f"porta fora do modelo: {op.name}")
+    return ops
+
+
+class _State:
+    """Estado do lote: bits dos qubits comuns, fases do registrador de Fourier e fase global."""
+
+    def __init__(self, n_qubits, batch):
+        self.bits = np.zeros((n_qubits, batch), dtype=bool)
+        self.theta = np.zeros((n_qubits, batch), dtype=np.int64)
+        self.m = [0] * n_qubits                 ### 0: qubit comum, m: qubit de uma QFT de m qubits
+        self.phase = np.zeros(batch)
+
+    def mask(self, ctrls, ctrl_state):
+        mask = np.ones(self.bits.shape[1], dtype=bool)
+        for j, c in enumerate(ctrls):
+            if self.m[c]:
+                raise ValueError("controle dentro do registrador de Fourier")
+            mask &= self.bits[c] if (ctrl_state >> j) & 1 else ~self.bits[c]
+        return mask
+
+    def classical(self, qs):
+        if any(self.m[q] for q in qs):
+            raise ValueError("porta clássica sobre o registrador de Fourier")
+
+
+def _apply(st, op):
+    kind, ctrls, ctrl_state, qs = op[:4]
+    if kind == "x":
+        st.classical(qs)
+        st.bits[qs[0]] ^= st.mask(ctrls, ctrl_state)
+    elif kind == "swap":
+        st.classical(qs)
+        a, b = qs
+        diff = (st.bits[a] ^ st.bits[b]) & st.mask(ctrls, ctrl_state)
+        st.bits[a] ^= diff
+        st.bits[b] ^= diff
+    elif kind == "p":
+        lam = op[4]
+        mask = st.mask(ctrls, ctrl_state)
+        t = qs[0]
+        if st.m[t]:
+            units = lam * 2**st.m[t] / (2 * np.pi)
+            k = round(units)
+            if abs(units - k) > 1e-9 * max(1.0, abs(units)):      ### erro relativo do float (m grande)
+                raise ValueError(f"fase {lam} fora da grade 2π/2^{st.m[t]}")
+            st.theta[t] = (st.theta[t] + k * mask) % (1 << st.m[t])
+        else:
+            ### fase num qubit comum: só fase global quando o alvo está em 1
+            st.phase += lam * (mask & st.bits[t])
+    else:
+        m = len(qs)
+        if op[4] == 1:
+            if any(st.m[q] for q in qs):
+                raise ValueError("QFT sobre registrador que já está na base de Fourier")
+            x = np.zeros(st.bits.shape[1], dtype=np.int64)
+            for t, q in enumerate(qs):
+                x |= st.bits[q].astype(np.int64) << t
+            for t, q in enumerate(qs):
+                st.theta[q] = (x << (m - 1 - t)) % (1 << m)
+                st.bits[q] = False
+                st.m[q] = m
+        else:
+            if any(st.m[q] != m for q in qs):
+                raise ValueError("IQFT sobre registrador fora da base de Fourier")
+            x = st.theta[qs[-1]].copy()           ### qubit mais sensível: θ = x
+            for t, q in enumerate(qs):
+                bad = st.theta[q] != (x << (m - 1 - t)) % (1 << m)
+                if bad.any():
+                    raise ValueError(f"{np.count_nonzero(bad)} entradas saíram da base (fases inconsistentes na IQFT)")
+            for t, q in enumerate(qs):
+                st.bits[q] = (x >> t) & 1
+                st.theta[q] = 0
+                st.m[q] = 0
+
+
+def run_fourier(qc, inputs, batch=None, ops=None):
+    """
+    Executa qc sobre um lote de estados da base tratando QFT/IQFT simbolicamente.
+
+    Parametros:
+    qc : QuantumCircuit
+        Circuito com as portas aceitas (ver cabeçalho do arquivo).
+    inputs : dict
+        nome do registrador --> inteiro ou array de inteiros. Registradores ausentes
+        começam em 0.
+    batch : int, opcional
+        Tamanho do lote (default: maior array em inputs).
+    ops : list, opcional
+        Resultado de _compile(qc) já pronto (para rodar vários lotes do mesmo circuito).
+
+    Retorna:
+    (valores, fase)
+        valores: dict nome do registrador --> array (batch,) int64
+        fase: array (batch,) com a fase global de cada entrada, em [0, 2π)
+    """
+    regs = {r.name: r for r in qc.qregs}
+    if batch is None:
+        batch = max([np.size(v) for v in inputs.values()] + [1])
+    if ops is None:
+        ops = _compile(qc)
+
+    st = _State(qc.num_qubits, batch)
+    for name, v in inputs.items():
+        v = np.broadcast_to(np.asarray(v, dtype=np.int64), (batch,))
+        for t, q in enumerate(regs[name]):
+            st.bits[qc.find_bit(q).index] = (v >> t) & 1
+
+    for op in ops:
+        _apply(st, op)
+
+    if any(st.m):
+        raise ValueError("circuito terminou com qubits na base de Fourier")
+    out = {}
+    for name, r in regs.items():
+        val = np.zeros(batch, dtype=np.int64)
+        for t, q in enumerate(r):
+            val |= st.bits[qc.find_bit(q).index].astype(np.int64) << t
+        out[name] = val
+    return out, np.mod(st.phase, 2 * np.pi)
+
+
+def _wrong(out, phase, want):
+    """Máscara das entradas cuja saída difere de want ou com fase global != 0."""
+    bad = np.abs(np.angle(np.exp(1j * phase))) > 1e-6
+    for name, val in want.items():
+        bad |= out[name] != val
+    return bad
+
+
+def verify_adder_mod(n_bits, a, N, control_number=1, chunk=1 << 16):
+    """
+    Confere adder_mod(n_bits, a, N, controlado=True, control_number) para todo
+    b < N e todos os valores dos controles: b --> b + a mod N se todos os
+    controles = 1, senão b. control_number = 0 confere o adder_mod sem controle
+    (controlado=False). cout/anc devem voltar a 0 e a fase global a 0.
+
+    Retorna o nº de entradas erradas.
+    """
+    from draperqftadder_adapt import adder_mod, adder_mod_gate, qft_gate
+
+    ### adder_mod espera b (+ cout) já na base de Fourier
+    controlado = control_number > 0
+    opts = dict(controlado=True, control_number=control_number) if controlado else {}
+    inner = adder_mod(n_bits, a, N, **opts)
+    qc = QuantumCircuit(*inner.qregs)
+    b, cout = inner.qregs[-3:-1]
+    qc.append(qft_gate(n_bits + 1), b[:] + cout[:])
+    qc.append(adder_mod_gate(n_bits, a, N, **opts), qc.qubits)
+    qc.append(qft_gate(n_bits + 1, inverse=True), b[:] + cout[:])
+    ops = _compile(qc)
+    all_on = (1 << control_number) - 1
+    total = N << control_number
+    wrong = 0
+    for start in range(0, total, chunk):
+        idx = np.arange(start, min(start + chunk, total), dtype=np.int64)
+        c, b = idx & all_on, idx >> control_number
+        inputs, want = {"b": b}, {"b": np.where(c == all_on, (b + a) % N, b), "cout": 0, "anc": 0}
+        if controlado:
+            inputs["c"] = want["c"] = c
+        out, phase = run_fourier(qc, inputs, ops=ops)
+        wrong += int(np.count_nonzero(_wrong(out, phase, want)))
+    return wrong
+
+
+def _coset_inputs(x, N, coset_bits, rng):
+    """x + jN com j < 2^coset_bits aleatório (um estado da base do coset de x, ver coset.py)."""
+    if not coset_bits:
+        return x
+    return x + rng.integers(0, 1 << coset_bits, np.shape(x)) * N
+
+
+def _coset_wrong(out, phase, want, N, coset):
+    """_wrong com os registradores em coset comparados mod N."""
+    bad = np.abs(np.angle(np.exp(1j * phase))) > 1e-6
+    for name, val in want.items():
+        bad |= (out[name] % N != val % N) if name in coset else (out[name] != val)
+    return bad
+
+
+def verify_ctrl_mult_mod(n_bits, a, N, acc=None, chunk=1 << 16, factor_controls=False, coset_bits=0, seed=0):
+    """
+    Confere ctrl_mult_mod(n_bits, a, N, factor_controls=..., coset_bits=...) para todo (c, b) com b < N:
+        c = 1: 0 --> acc + a*b mod N,   c = 0: acc inalterado
+    acc: valores iniciais do registrador "0" (default 0). Pode ser um inteiro ou
+         um array com um valor por b (ex.: amostras aleatórias < N).
+    coset_bits = m > 0: b e "0" entram como x + jN (j < 2^m aleatório, semente seed) e a
+         saída é comparada mod N. Os erros são as parcelas que dão a volta em 2^(n+m):
+         a fração deve ficar abaixo de qc.metadata["coset_deviation"].
+
+    Retorna o nº de entradas erradas.
+    """
+    from ctrl_mult_mod import ctrl_mult_mod
+
+    qc = ctrl_mult_mod(n_bits, a, N, factor_controls=factor_controls, coset_bits=coset_bits)
+    ops = _compile(qc)
+    rng = np.random.default_rng(seed)
+    acc0 = np.zeros(N, dtype=np.int64) if acc is None else np.broadcast_to(np.asarray(acc, dtype=np.int64), (N,))
+    total = 2 * N
+    wrong = 0
+    for start in range(0, total, chunk):
+        idx = np.arange(start, min(start + chunk, total), dtype=np.int64)
+        c, b = idx & 1, _coset_inputs(idx >> 1, N, coset_bits, rng)
+        y = _coset_inputs(acc0[idx >> 1], N, coset_bits, rng)
+        out, phase = run_fourier(qc, {"c": c, "b": b, "0": y}, ops=ops)
+        want = {"c": c, "b": b, "0": np.where(c == 1, (y + a * b) % N, y)}
+        if not coset_bits:
+            want["help"] = 0
+        if factor_controls:
+            want["and"] = 0
+        wrong += int(np.count_nonzero(_coset_wrong(out, phase, want, N, ("0",) if coset_bits else ())))
+    return wrong
+
+
+def verify_mult_mod_windowed(n_bits, a, N, c_mul=4, lam=1, chunk=1 << 16, coset_bits=0, seed=0, arith="fourier"):
+    """
+    Confere mult_mod_windowed(n_bits, a, N, c_mul, lam=lam, coset_bits=..., arith=...) para todo
+    (c, b, acc) com b < 2^n_bits e acc < N:
+        c = 1: acc --> acc + a*b mod N,   c = 0: acc inalterado
+    look/help/anc (e carry) devem voltar a 0 e a fase global a 0.
+    coset_bits = m > 0: b < N e acc < N entram como x + jN (ver verify_ctrl_mult_mod) e acc
+    é comparado mod N.
+
+    Retorna o nº de entradas erradas.
+    """
+    from mult_mod_windowed import mult_mod_windowed
+
+    qc = mult_mod_windowed(n_bits, a, N, c_mul, lam=lam, coset_bits=coset_bits, arith=arith)
+    ops = _compile(qc)
+    rng = np.random.default_rng(seed)
+    b_bits = (N - 1).bit_length() if coset_bits else n_bits
+    total = (2 * N) << b_bits
+    wrong = 0
+    for start in range(0, total, chunk):
+        idx = np.arange(start, min(start + chunk, total), dtype=np.int64)
+        c, b, acc = idx & 1, (idx >> 1) & ((1 << b_bits) - 1), idx >> (b_bits + 1)
+        if coset_bits:
+            keep = b < N
+            c, b, acc = c[keep], _coset_inputs(b[keep], N, coset_bits, rng), _coset_inputs(acc[keep], N, coset_bits, rng)
+        out, phase = run_fourier(qc, {"c": c, "b": b, "acc": acc}, ops=ops)
+        want = {"c": c, "b": b, "acc": np.where(c == 1, (acc + a * b) % N, acc), "anc": 0, "look": 0}
+        if not coset_bits:
+            want["help"] = 0
+        if arith == "ripple":
+            want["carry"] = 0
+        wrong += int(np.count_nonzero(_coset_wrong(out, phase, want, N, ("acc",) if coset_bits else ())))
+    return wrong
+
+
+def _strip_coset_init(qc):
+    """Remove os coset_init (têm H, fora do modelo): as entradas passam a ser x + jN da base."""
+    qc.data = [inst for inst in qc.data if not inst.operation.name.startswith("coset")]
+    return qc
+
+
+def verify_expmod(N, base, bits_expoente, factor_controls=False, coset_bits=0, seed=0, chunk=1 << 16):
+    """
+    Confere expmod(N, base, bits_expoente, ...) para todo x < 2^bits_expoente:
+        b: 1 --> base^x mod N, 0/cout/help voltam a 0 e fase global 0.
+    coset_bits = m > 0: sem os coset_init, b = 1 + jN e 0 = kN (j, k < 2^m aleatórios)
+    e b / 0 comparados mod N.
+
+    Retorna o nº de entradas erradas.
+    """
+    from expmod import expmod
+
+    qc = _strip_coset_init(expmod(N, base, bits_expoente, factor_controls=factor_controls, coset_bits=coset_bits))
+    ops = _compile(qc)
+    rng = np.random.default_rng(seed)
+    total = 1 << bits_expoente
+    wrong = 0
+    for start in range(0, total, chunk):
+        x = np.arange(start, min(start + chunk, total), dtype=np.int64)
+        b, z = _coset_inputs(np.ones_like(x), N, coset_bits, rng), _coset_inputs(np.zeros_like(x), N, coset_bits, rng)
+        out, phase = run_fourier(qc, {"x": x, "b": b, "0": z}, ops=ops)
+        want = {"x": x, "b": np.array([pow(base, int(v), N) for v in x]), "0": 0, "cout": 0, "help": 0}
+        if factor_controls:
+            want["and"] = 0
+        wrong += int(np.count_nonzero(_coset_wrong(out, phase, want, N, ("b", "0") if coset_bits else ())))
+    return wrong
+
+
+def verify_expmod_windowed(N, base, n_exp, c_exp=3, c_mul=3, lam=1, chunk=1 << 16, coset_bits=0, seed=0,
+                           arith="fourier"):
+    """
+    Confere expmod_windowed(N, base, n_exp, c_exp, c_mul, lam=lam, arith=...) para todo e < 2^n_exp:
+        acc --> base^e mod N, tmp/anc/look/help/carry voltam a 0 e fase global 0.
+    coset_bits = m > 0: sem os coset_init, o registrador que começa com o 1 entra como
+    1 + jN e o outro como kN; acc / tmp comparados mod N.
+
+    Retorna o nº de entradas erradas.
+    """
+    from expmod_windowed import expmod_windowed
+
+    qc = _strip_coset_init(expmod_windowed(N, base, n_exp, c_exp, c_mul, lam=lam, coset_bits=coset_bits, arith=arith))
+    ops = _compile(qc)
+    rng = np.random.default_rng(seed)
+    ### com nº ímpar de janelas o 1 começa no tmp
+    first = "acc" if ceil(n_exp / c_exp) % 2 == 0 else "tmp"
+    total = 1 << n_exp
+    wrong = 0
+    for start in range(0, total, chunk):
+        e = np.arange(start, min(start + chunk, total), dtype=np.int64)
+        inputs = {"e": e}
+        if coset_bits:
+            inputs["acc"] = _coset_inputs(np.full_like(e, first == "acc"), N, coset_bits, rng)
+            inputs["tmp"] = _coset_inputs(np.full_like(e, first == "tmp"), N, coset_bits, rng)
+        out, phase = run_fourier(qc, inputs, ops=ops)
+        want = {"e": e, "acc": np.array([pow(base, int(x), N) for x in e]), "tmp": 0, "anc": 0, "look": 0, "help": 0}
+        if arith == "ripple":
+            want["carry"] = 0
+        wrong += int(np.count_nonzero(_coset_wrong(out, phase, want, N, ("acc", "tmp") if coset_bits else ())))
+    return wrong
+
+
+if __name__ == "__main__":
+    from time import perf_counter
+    from math import gcd
+
+    rng = np.random.default_rng(7)
+
+    ### adder_mod sem controle e controlado (1 e 2 controles), todos os b < N
+    for N in (13, 221, 40_009, 1_048_573):
+        n = N.bit_length()
+        a = int(rng.integers(1, N))
+        for cn in (0, 1, 2):
+            t0 = perf_counter()
+            wrong = verify_adder_mod(n, a, N, control_number=cn)
+            assert wrong == 0, (N, a, cn, wrong)
+            print(f"adder_mod     N = {N:8d} ({n:2d} bits) c = {cn}: ok  {perf_counter() - t0:6.2f} s")
+
+    ### ctrl_mult_mod: todos os (c, b), acc = 0 e acc aleatório
+    for N in (15, 221, 4_093, 65_521):
+        n = N.bit_length()
+        a = int(rng.integers(2, N))
+        while gcd(a, N) != 1:
+            a += 1
+        t0 = perf_counter()
+        for acc in (None, rng.integers(0, N, N)):
+            for fc in (False, True):
+                wrong = verify_ctrl_mult_mod(n, a, N, acc, factor_controls=fc)
+                assert wrong == 0, (N, a, fc, wrong)
+        print(f"ctrl_mult_mod N = {N:8d} ({n:2d} bits): ok  {perf_counter() - t0:6.2f} s")
+
+    ### mult_mod_windowed: todos os (c, b, acc), algumas janelas e QROAM
+    for N, c_mul, lam in ((13, 2, 1), (29, 3, 1), (221, 3, 2), (451, 4, 1)):
+        n = N.bit_length()
+        a = int(rng.integers(2, N))
+        while gcd(a, N) != 1:
+            a += 1
+        t0 = perf_counter()
+        wrong = verify_mult_mod_windowed(n, a, N, c_mul, lam)
+        assert wrong == 0, (N, a, c_mul, lam, wrong)
+        print(f"mult_mod_windowed N = {N:4d} ({n:2d} bits) c_mul = {c_mul} lam = {lam}: ok  {perf_counter() - t0:6.2f} s")
+
+    ### expmod_windowed: todos os expoentes
+    for N, base, n_exp, c_exp, c_mul, lam in ((15, 7, 6, 2, 2, 1), (21, 2, 4, 2, 3, 1), (221, 5, 8, 3, 3, 1),
+                                              (451, 2, 10, 4, 3, 2)):
+        t0 = perf_counter()
+        wrong = verify_expmod_windowed(N, base, n_exp, c_exp, c_mul, lam)
+        assert wrong == 0, (N, base, n_exp, c_exp, c_mul, lam, wrong)
+        print(f"expmod_windowed N = {N:4d} e < 2^{n_exp} c_exp = {c_exp} c_mul = {c_mul} lam = {lam}: ok  {perf_counter() - t0:6.2f} s")
+
+    ### representação em coset: entradas x + jN, saída comparada mod N; a fração errada
+    ### (parcelas que dão a volta em 2^(n+m)) fica abaixo de metadata["coset_deviation"]
+    from ctrl_mult_mod import ctrl_mult_mod
+    from mult_mod_windowed import mult_mod_windowed
+    from expmod import expmod
+    from expmod_windowed import expmod_windowed
+
+    for N, m in ((221, 6), (4_093, 10), (65_521, 12)):
+        n = N.bit_length()
+        a = int(rng.integers(2, N))
+        while gcd(a, N) != 1:
+            a += 1
+        t0 = perf_counter()
+        for fc in (False, True):
+            wrong = verify_ctrl_mult_mod(n, a, N, rng.integers(0, N, N), factor_controls=fc, coset_bits=m)
+            dev = ctrl_mult_mod(n, a, N, coset_bits=m).metadata["coset_deviation"]
+            assert wrong / (2 * N) <= dev, (N, m, fc, wrong)
+        print(f"ctrl_mult_mod coset N = {N:6d} m = {m:2d}: {wrong / (2 * N):.4f} <= {dev:.4f}  {perf_counter() - t0:6.2f} s")
+    for N, c_mul, lam, m in ((29, 3, 1, 6), (221, 3, 2, 8)):
+        n = N.bit_length()
+        wrong = verify_mult_mod_windowed(n, 7, N, c_mul, lam, coset_bits=m)
+        dev = mult_mod_windowed(n, 7, N, c_mul, lam=lam, coset_bits=m).metadata["coset_deviation"]
+        assert wrong / (2 * N * N) <= dev, (N, m, wrong)
+        print(f"mult_mod_windowed coset N = {N:4d} m = {m}: {wrong / (2 * N * N):.4f} <= {dev:.4f}")
+    for N, base, n_exp, m in ((21, 2, 6, 8), (221, 5, 8, 12)):
+        for fc in (False, True):
+            wrong = verify_expmod(N, base, n_exp, fc, coset_bits=m)
+            dev = expmod(N, base, n_exp, coset_bits=m).metadata["coset_deviation"]
+            assert wrong / (1 << n_exp) <= dev, (N, m, fc, wrong)
+        print(f"expmod coset N = {N:3d} m = {m:2d}: {wrong / (1 << n_exp):.4f} <= {dev:.4f}")
+    for N, base, n_exp, c_exp, c_mul, lam, m in ((21, 2, 6, 2, 2, 1, 8), (451, 2, 10, 4, 3, 2, 12)):
+        wrong = verify_expmod_windowed(N, base, n_exp, c_exp, c_mul, lam, coset_bits=m)
+        dev = expmod_windowed(N, base, n_exp, c_exp, c_mul, lam=lam, coset_bits=m).metadata["coset_deviation"]
+        assert wrong / (1 << n_exp) <= dev, (N, m, wrong)
+        print(f"expmod_windowed coset N = {N:3d} m = {m:2d}: {wrong / (1 << n_exp):.4f} <= {dev:.4f}")
+
+    ### ripple-carry (adder_plain, mbu=False): mesma conferência, sem QFT
+    for N, c_mul, lam, m in ((29, 3, 1, 0), (221, 3, 2, 0), (29, 3, 1, 6)):
+        n = N.bit_length()
+        wrong = verify_mult_mod_windowed(n, 7, N, c_mul, lam, coset_bits=m, arith="ripple")
+        dev = mult_mod_windowed(n, 7, N, c_mul, lam=lam, coset_bits=m, arith="ripple").metadata.get("coset_deviation", 0)
+        assert wrong / (2 * N * N) <= dev, (N, m, wrong)
+        print(f"mult_mod_windowed ripple N = {N:4d} m = {m}: {wrong / (2 * N * N):.4f} <= {dev:.4f}")
+    for N, base, n_exp, c_exp, c_mul, lam, m in ((21, 2, 6, 2, 2, 1, 0), (451, 2, 10, 4, 3, 2, 0), (21, 2, 6, 2, 2, 1, 8)):
+        wrong = verify_expmod_windowed(N, base, n_exp, c_exp, c_mul, lam, coset_bits=m, arith="ripple")
+        dev = expmod_windowed(N, base, n_exp, c_exp, c_mul, lam=lam, coset_bits=m, arith="ripple").metadata.get("coset_deviation", 0)
+        assert wrong / (1 << n_exp) <= dev, (N, m, wrong)
+        print(f"expmod_windowed ripple N = {N:3d} m = {m}: {wrong / (1 << n_exp):.4f} <= {dev:.4f}")
@@ -0,0 +1,100 @@
+# gate_cache.py
+#
+# Cache LRU (global no processo) das portas montadas pelos builders aritméticos.
+#
+#   ctrl_mult_mod chama adder_mod uma vez por bit do operando e expmod monta
+#   dois ctrl_mult_mod por bit do expoente, então os mesmos sub-circuitos
+#   (draper_adder, adder_mod, QFT, ...) são reconstruídos muitas vezes.
+#   Aqui cada definição é montada uma única vez e o MESMO objeto de porta
+#   é reaproveitado em todos os append (sem deepcopy).
+#
+#   As chaves são tuplas do tipo
+#       ("adder_mod", n_bits, a, N, controlado, control_number, inverse)
+#
+#   OBS: as portas devolvidas são compartilhadas, não devem ser modificadas
+#        (label, definition, ...) por quem as recebe.
+
+from collections import OrderedDict, namedtuple
+from threading import Lock
+from qiskit.circuit import Gate, Instruction
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+class GateCache:
+    """Cache LRU limitado de portas (Gate / Instruction) indexado por tuplas.
+
+    Parametros:
+    maxsize : int
+        Número máximo de definições guardadas. A menos usada recentemente é
+        descartada quando o limite é atingido.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key, builder):
+        """Retorna a porta guardada em key, montando com builder() se ainda não existir."""
+        with self._lock:
+            if key in self._data:
+                self.hits += 1
+                self._data.move_to_end(key)
+                return self._data[key]
+            self.misses += 1
+
+        ### monta fora do lock (builders chamam o cache recursivamente)
+        gate = builder()
+
+        with self._lock:
+            ### outra thread pode ter montado a mesma chave enquanto isso
+            gate = self._data.setdefault(key, gate)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return gate
+
+    def info(self):
+        """Retorna CacheInfo(hits, misses, maxsize, currsize)."""
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self._data))
+
+    def clear(self):
+        """Esvazia o cache e zera os contadores."""
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def resize(self, maxsize):
+        """Altera o tamanho máximo, descartando as entradas mais antigas se preciso."""
+        with self._lock:
+            self.maxsize = maxsize
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+GATE_CACHE = GateCache()
+
+
+def cached_gate(key, builder):
+    """Atalho para GATE_CACHE.get(key, builder)."""
+    return GATE_CACHE.get(key, builder)
+
+
+def cache_info():
+    """Contadores de hit/miss do cache global."""
+    return GATE_CACHE.info()
+
+
+def cache_clear():
+    """Esvazia o cache global."""
+    GATE_CACHE.clear()
+
+
+def is_custom(op):
+    """Porta montada pelos builders (to_gate/to_instruction/inverse), não uma classe da biblioteca do qiskit."""
+    return type(op) in (Gate, Instruction) and op.definition is not None
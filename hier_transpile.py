@@ -0,0 +1,284 @@
+# hier_transpile.py
+#
+# Transpile hierárquico: cada definição distinta (c_adder_mod, c_adapt_drap_adder,
+# QFT, mult_mod, lookups...) é transpilada UMA vez e o resultado é reaproveitado
+# em todas as instâncias.
+#
+#   transpile(expmod(...), backend) desce e ressintetiza cada instância de
+#   adder_mod / draper / QFT, mas com o gate_cache elas são os mesmos objetos
+#   Gate (umas poucas dezenas de definições). Aqui:
+#
+#     - portas que o alvo já tem (nome em basis_gates) ficam como estão;
+#     - portas da biblioteca do qiskit fora da base (ccx, mcphase, ...) e "folhas"
+#       (definições só com portas da biblioteca, ex.: draper_adder, QFT) passam por
+#       transpile(basis_gates, optimization_level) uma vez, em memo;
+#     - blocos compostos (adder_mod, ctrl_mult_mod, ...) só costuram os
+#       pedaços já transpilados dos filhos, somando as fases globais;
+#     - control flow (if_else do mbu, ...) fica como está, com os corpos
+#       costurados do mesmo jeito (como no transpile, mesmo fora de basis_gates).
+#
+#   As fases são somadas como (constante, {Parameter: coeficiente}): nos templates
+#   cada fase é uma ParameterExpression longa e somar duas delas direto leva segundos.
+#
+#   O tempo passa a depender do nº de blocos distintos, não de instâncias.
+#   Sem otimização entre blocos vizinhos (cada folha é otimizada sozinha).
+#   Se o backend tem coupling map, o circuito costurado ainda passa por um
+#   transpile(optimization_level=0) global só para layout/roteamento.
+#
+#       tqc = hierarchical_transpile(expmod(77, 2, 7), AerSimulator())
+#
+#   HierarchicalTranspiler guarda o memo entre chamadas (varredura de bases etc).
+
+from qiskit import QuantumCircuit, transpile
+from qiskit.circuit import CircuitInstruction, ControlFlowOp, ControlledGate, ParameterExpression
+from qiskit.circuit.library import get_standard_gate_name_mapping
+from gate_cache import is_custom
+
+_STANDARD = set(get_standard_gate_name_mapping())
+
+
+class HierarchicalTranspiler:
+    """Transpile com memo por definição.
+
+    Parametros:
+    backend : Backend
+        Alvo (a base vem de backend.target). Opcional se basis_gates for dado.
+    basis_gates : lista de str
+        Base explícita (tem prioridade sobre a do backend).
+    optimization_level : int
+        Nível do transpile de cada folha (default 2, o mesmo do transpile).
+    """
+
+    def __init__(self, backend=None, basis_gates=None, optimization_level=2):
+        self.backend = backend
+        if basis_gates is not None:
+            self.basis = set(basis_gates)
+            self._leaf_kw = dict(basis_gates=list(basis_gates))
+        elif backend is None:
+            raise ValueError("informe backend ou basis_gates")
+        else:
+            self.basis = set(backend.target.operation_names)
+            if backend.target.build_coupling_map() is None:
+                self._leaf_kw = dict(target=backend.target)
+            else:
+                ### folhas sem layout: só a parte padrão da base, o roteamento fica para o final
+                self._leaf_kw = dict(basis_gates=[g for g in self.basis if g in _STANDARD or g in ("measure", "reset")])
+        self.optimization_level = optimization_level
+        self._memo = {}
+        self._ids = {}            ### conteúdo de bloco --> inteiro
+        self._by_id = {}          ### id(porta) --> chave (com a porta guardada em _keep)
+        self._keep = []
+        self.blocks = 0           ### folhas transpiladas
+        self.instances = 0        ### instâncias costuradas a partir do memo
+
+    def _key(self, op):
+        """Chave estrutural: portas da biblioteca por classe/parâmetros, blocos pelo conteúdo.
+
+        Assim QFT e IQFT_dg, ou o draper_adder_dg de dois inverse() diferentes, caem
+        na mesma entrada. O conteúdo de cada bloco vira um inteiro (self._ids).
+        """
+        if not is_custom(op):
+            ctrl = (op.num_ctrl_qubits, op.ctrl_state) if isinstance(op, ControlledGate) else None
+            return ("lib", type(op).__name__, op.name, op.num_qubits, tuple(self._param(p, op) for p in op.params), ctrl)
+        cached = self._by_id.get(id(op))
+        if cached is not None:
+            return cached
+        defn = op.definition
+        body = tuple((self._key(inst.operation),
+                      tuple(defn.find_bit(q).index for q in inst.qubits),
+                      tuple(defn.find_bit(c).index for c in inst.clbits)) for inst in defn.data)
+        key = ("blk", self._ids.setdefault((op.num_qubits, op.num_clbits, self._param(defn.global_phase, op), body),
+                                           len(self._ids)))
+        self._by_id[id(op)] = key
+        self._keep.append(op)
+        return key
+
+    def _param(self, p, op):
+        """Parâmetro na chave: número como float, Parameter(Expression) como está, o resto por id (op guardada)."""
+        try:
+            return float(p)
+        except (TypeError, ValueError):
+            pass
+        try:
+            hash(p)
+            return p
+        except TypeError:
+            self._keep.append(op)
+            return ("id", id(p))
+
+    def _lower(self, op):
+        """op na base, como (fase global, [(operation, índices dos qubits, índices dos clbits)]) (memo)."""
+        key = self._key(op)
+        self.instances += 1
+        if key in self._memo:
+            return self._memo[key]
+
+        defn = op.definition
+        if all(_native(inst.operation, self.basis) for inst in defn.data):
+            ### já está na base
+            low = _indexed(defn)
+        elif all(not is_custom(inst.operation) for inst in defn.data):
+            ### folha: só portas da biblioteca --> um transpile
+            low = _indexed(transpile(defn, optimization_level=self.optimization_level, **self._leaf_kw))
+            self.blocks += 1
+        else:
+            ### composto: costura os filhos
+            phases, ops = [_phase_terms(defn.global_phase)], []
+            for inst in defn.data:
+                qs = tuple(defn.find_bit(q).index for q in inst.qubits)
+                cs = tuple(defn.find_bit(c).index for c in inst.clbits)
+                sub_phase, sub_ops = self._expand(inst.operation)
+                phases.append(sub_phase)
+                ops += [(o, tuple(qs[i] for i in q), tuple(cs[i] for i in c)) for o, q, c in sub_ops]
+            low = (_phase_sum(phases), ops)
+        self._memo[key] = low
+        return low
+
+    def _expand(self, op):
+        """op como (fase, [(operation, índices dos qubits, índices dos clbits)]) em índices locais."""
+        local = (tuple(range(op.num_qubits)), tuple(range(op.num_clbits)))
+        if isinstance(op, ControlFlowOp):
+            return (0.0, {}, ()), [(op.replace_blocks([self._stitch(b) for b in op.blocks]), *local)]
+        if _native(op, self.basis) or op.definition is None:
+            return (0.0, {}, ()), [(op, *local)]
+        return self._lower(op)
+
+    def _stitch(self, qc):
+        """qc com cada instrução trocada pela versão costurada (mesmos bits, registradores e metadata)."""
+        out = QuantumCircuit(*qc.qregs, *qc.cregs, name=qc.name, metadata=dict(qc.metadata or {}))
+        for q in qc.qubits:
+            if not qc.find_bit(q).registers:
+                out.add_bits([q])
+        for c in qc.clbits:
+            if not qc.find_bit(c).registers:
+                out.add_bits([c])
+        qubits, clbits = out.qubits, out.clbits
+        phases = [_phase_terms(qc.global_phase)]
+        for inst in qc.data:
+            qs = [qubits[qc.find_bit(q).index] for q in inst.qubits]
+            cs = [clbits[qc.find_bit(c).index] for c in inst.clbits]
+            phase, ops = self._expand(inst.operation)
+            phases.append(phase)
+            for o, q, c in ops:
+                out._append(CircuitInstruction(o, [qs[i] for i in q], [cs[i] for i in c]))
+        out.global_phase = _phase_expr(_phase_sum(phases))
+        return out
+
+    def run(self, qc):
+        """Transpila qc (mesmos registradores e metadata)."""
+        out = self._stitch(qc)
+        if self.backend is not None and self.backend.target.build_coupling_map() is not None:
+            out = transpile(out, self.backend, optimization_level=0)
+        return out
+
+
+def _indexed(qc):
+    return _phase_terms(qc.global_phase), [(inst.operation, tuple(qc.find_bit(q).index for q in inst.qubits),
+                                            tuple(qc.find_bit(c).index for c in inst.clbits)) for inst in qc.data]
+
+
+def _phase_terms(phase):
+    """Fase global como (constante, {Parameter: coeficiente}, termos não lineares)."""
+    if not isinstance(phase, ParameterExpression) or not phase.parameters:
+        return float(phase), {}, ()
+    params = list(phase.parameters)
+    coeffs = {p: phase.gradient(p) for p in params}
+    if any(isinstance(g, ParameterExpression) and g.parameters for g in coeffs.values()):
+        return 0.0, {}, (phase,)
+    const = float(phase.bind({p: 0 for p in params}))
+    return const, {p: float(g) for p, g in coeffs.items() if float(g) != 0}, ()
+
+
+def _phase_sum(phases):
+    const, coeffs, rest = 0.0, {}, ()
+    for c, cs, r in phases:
+        const += c
+        for p, g in cs.items():
+            coeffs[p] = coeffs.get(p, 0.0) + g
+        rest += r
+    return const, {p: g for p, g in coeffs.items() if g != 0}, rest
+
+
+def _phase_expr(phase):
+    """(constante, coeficientes, resto) --> float ou ParameterExpression, somando termo a termo."""
+    expr, coeffs, rest = phase
+    for p, g in coeffs.items():
+        expr = expr + g * p
+    for r in rest:
+        expr = expr + r
+    return expr
+
+
+def _native(op, basis):
+    return op.name in basis and not is_custom(op) and not isinstance(op, ControlFlowOp)
+
+
+def hierarchical_transpile(qc, backend=None, basis_gates=None, optimization_level=2):
+    """Atalho para HierarchicalTranspiler(backend, basis_gates, optimization_level).run(qc)."""
+    return HierarchicalTranspiler(backend, basis_gates, optimization_level).run(qc)
+
+
+if __name__ == "__main__":
+    from time import perf_counter
+    from qiskit.quantum_info import Operator
+    from qiskit_aer import AerSimulator
+    from ctrl_mult_mod import ctrl_mult_mod
+    from expmod import expmod
+    from mult_mod_windowed import mult_mod_windowed
+    from gate_cache import cache_clear
+
+    backend = AerSimulator()
+
+    ### mesmo unitário que o transpile normal (casos pequenos, também numa base só com cx/u)
+    for qc in (ctrl_mult_mod(3, 5, 7), mult_mod_windowed(2, 2, 3, 2), expmod(7, 3, 1)):
+        for kw in (dict(backend=backend), dict(basis_gates=["cx", "u", "x", "h", "p"])):
+            tqc = hierarchical_transpile(qc, **kw)
+            assert set(tqc.count_ops()) <= set(kw.get("basis_gates") or backend.target.operation_names)
+            assert Operator(tqc).equiv(Operator(qc)), (qc.name, kw)
+    print("hierarchical_transpile == circuito original (Operator)")
+
+    ### template com parâmetros: transpila antes do bind, mesmo unitário depois
+    from templates import ctrl_mult_mod_template, ctrl_mult_mod_values, bind
+    tpl = ctrl_mult_mod_template(3)
+    tqc = hierarchical_transpile(tpl, basis_gates=["cx", "u"])
+    assert tqc.parameters == tpl.parameters
+    values = ctrl_mult_mod_values(3, 5, 7)
+    assert Operator(bind(tqc, values)).equiv(Operator(bind(tpl, values)))
+    print(f"template parametrizado ({len(tpl.parameters)} parâmetros): ok")
+
+    ### mbu: corpos dos if_else também na base (com ou sem if_else em basis_gates, como no transpile)
+    def ops_in(qc):
+        names = set(qc.count_ops())
+        for inst in qc.data:
+            if isinstance(inst.operation, ControlFlowOp):
+                names |= set().union(*(ops_in(b) for b in inst.operation.blocks))
+        return names
+    for qc in (ctrl_mult_mod(3, 5, 7, factor_controls=True, mbu=True), mult_mod_windowed(3, 5, 7, 2, mbu=True)):
+        for basis in (["cx", "u", "measure", "reset", "if_else"], ["cx", "u", "measure", "reset"]):
+            assert ops_in(hierarchical_transpile(qc, basis_gates=basis)) <= set(basis) | {"if_else"}, (qc.name, basis)
+    print("if_else do mbu com o corpo na base: ok")
+
+    ### bits soltos (sem registrador), qubits e clbits
+    from qiskit.circuit import Qubit, Clbit
+    from draperqftadder_adapt import qft_gate
+    qc = QuantumCircuit([Qubit(), Qubit()], [Clbit(), Clbit()])
+    qc.append(qft_gate(2), [0, 1])
+    qc.measure([0, 1], [0, 1])
+    tqc = hierarchical_transpile(qc, basis_gates=["cx", "u", "measure"])
+    assert tqc.num_clbits == 2 and [tqc.find_bit(c).index for c in tqc.data[-1].clbits] == [1]
+    print("bits soltos (qubits e clbits): ok")
+
+    ### expmod(77, 2, 7): transpile normal vs hierárquico
+    for basis in (None, ["cx", "u"]):
+        kw = dict(basis_gates=basis) if basis else dict(backend=backend)
+        cache_clear()
+        qc = expmod(77, 2, 7)
+        t0 = perf_counter()
+        ref = transpile(qc, **kw)
+        t_ref = perf_counter() - t0
+        ht = HierarchicalTranspiler(**kw)
+        t0 = perf_counter()
+        tqc = ht.run(qc)
+        t_h = perf_counter() - t0
+        print(f"expmod(77, 2, 7) base {basis or 'aer'}: transpile {t_ref:.1f} s ({ref.size()} portas) | "
+              f"hierárquico {t_h:.1f} s ({tqc.size()} portas, {ht.blocks} folhas transpiladas para {ht.instances} instâncias)")
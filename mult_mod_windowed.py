@@ -1,63 +1,244 @@
 # mult_mod_windowed.py
 #
-# b  -->  (a * b)   (mod N)     -  "a", "N" clássicos
+# acc  -->  acc + c * (a * b)   (mod N)     -  "a", "N" clássicos
 # Usa windowed-additions, janela c_mul bits do fator b.
+#   por janela: lookup de (k * a * 2^lo mod N) num workspace "look",
+#   soma modular registrador-registrador na base de Fourier (adder_mod_qq) e unlookup.
+#   arith="ripple": a mesma soma em ripple-carry (adder_plain.adder_mod_qq_ripple, só Toffolis).
+#   O controle c entra como bit mais significativo do endereço do lookup
+#   (metade da tabela com c = 0 é toda 0 --> soma 0).
 #
-from math import ceil
-from qiskit import QuantumCircuit, QuantumRegister
-from adder_plain import adder_n
-from qrom import qrom
+from math import ceil, log2
+from qiskit import QuantumCircuit, QuantumRegister, ClassicalRegister
+from adder_plain import adder_qq_ripple, adder_qq_ripple_gate, adder_mod_qq_ripple, adder_mod_qq_ripple_gate
+from qrom import lookup_gate, lookup_ancillas, unlookup, unlookup_ancillas
+from draperqftadder_adapt import qft_gate, qft_error, adder_mod_qq_gate, adder_mod_qq_error, approx_metadata
+from draperqftadder_adapt import draper_adder_qq_gate, draper_adder_qq_error
+from coset import coset_metadata
+from gate_cache import cached_gate
 
 
 
-# função mult_mod_windowed cria um circuito que multiplica um numero quântico b por uma constante a, com módulo N, usando aritmética janelada (windowed arithmetic).
+# função mult_mod_windowed cria um circuito que multiplica um numero quântico b por uma constante a, com módulo N,
+# e soma no acumulador acc, usando aritmética janelada (windowed arithmetic).
 
 # Parâmetros:
 #n_bits: número de qubits que representam o número b (o fator quântico).
 #a: o valor clássico fixo que queremos multiplicar
 #N: o módulo clássico da operação (trabalhamos mod N)
 #c_mul: tamanho da janela de bits usada dentro da multiplicação 
+#min_angle: rotações menores que isso são descartadas nas QFTs e nos adders (modo aproximado),
+#           cota do erro em qc.metadata["approx_error"]
+#lam: nº de cópias do lookup. 1 = qrom (unary iteration); > 1 = QROAM (select-swap),
+#     ~ 2L/lam + (lam-1)*n_bits Toffolis por lookup (cswap = 1; o unlookup paga o mesmo),
+#     (lam-1)*n_bits ancillas a mais
+#mbu: se True o unlookup é feito por medição (qrom.unlookup, ~2√L Toffolis em vez de
+#     repetir o lookup): o workspace "look" é medido na base X e o circuito ganha o
+#     registrador clássico "m".
+#     Tem medição/if_test: usar com compose (não vira Instruction, sem versão _gate)
+#coset_bits: m > 0 --> b e acc em coset (ver coset.py), n_bits + m qubits cada; a soma de cada
+#     janela vira um draper_adder_qq comum mod 2^(n+m) (sem comparação, sem "help").
+#     Desvio <= nº de janelas * 2^-m em qc.metadata["coset_deviation"].
+#arith: aritmética das somas
+#     "fourier" - acc na base de Fourier, adder_mod_qq / draper_adder_qq (0 Toffolis, ~n²/2 rotações por soma)
+#     "ripple"  - acc na base computacional, adder_mod_qq_ripple / adder_qq_ripple (sem rotações,
+#                 ~5n Toffolis por soma modular, n em coset) com um registrador "carry" de len(acc) - 1
+#                 qubits; com mbu os ANDs dos carries também são desfeitos por medição
+#     Fourier quando o gargalo são os Toffolis (T), ripple quando são as rotações (síntese).
+#optimize: se True passa o circuito pelos passes do fourier_opt.py (abre os blocos, junta os
+#     draper_adder vizinhos e cancela QFT·IQFT vizinhas), relatório em qc.metadata["fourier_opt"]
 #
+# Entradas válidas: acc < N (e N < 2^n_bits); b qualquer.  Em coset: b, acc = x + jN.
 #
 
-def mult_mod_windowed(n_bits, a, N, c_mul=4):
-    ctrl   = QuantumRegister(1,        "c")      ## Cria um registrador quântico de 1 qubit, chamado "c", que é usado para controle global do circuito
-                                                 ##  se desejar versão controlada
+def mult_mod_windowed(n_bits, a, N, c_mul=4, min_angle=0.0, lam=1, mbu=False, coset_bits=0, arith="fourier",
+                      optimize=False):
+    ## controle c de 1 qubit = lookup com fatores [0, a]  (c = 0 soma 0)
+    qc = mult_mod_windowed_lookup(n_bits, [0, a], N, c_mul, min_angle, lam, mbu, coset_bits, arith, optimize)
+    qc.name = f"mulW{c_mul}"
+    return qc
+
+
+# mult_mod_windowed_lookup: acc --> acc + factors[c] * b  (mod N)
+#   o fator é escolhido pelo registrador quântico "c" (⌈log2 len(factors)⌉ qubits),
+#   que entra no endereço do lookup junto com a janela de b (janela conjunta, Gidney & Ekerå):
+#       endereço = janela de b (bits baixos) + c (bits altos)
+#       tabela   = (factors[c] * k * 2^lo) mod N
+#   Mesmo custo de somas que o mult_mod_windowed, só as tabelas crescem (len(factors) x).
+#   Entradas válidas: c < len(factors), acc < N.
+#   (expmod_windowed usa com factors = k^e para a janela e do expoente)
+
+def mult_mod_windowed_lookup(n_bits, factors, N, c_mul=4, min_angle=0.0, lam=1, mbu=False, coset_bits=0, arith="fourier",
+                             optimize=False):
+    if arith not in ("fourier", "ripple"):
+        raise ValueError(f"arith deve ser 'fourier' ou 'ripple', não {arith!r}")
+    ripple = arith == "ripple"
+    n_c    = ceil(log2(len(factors))) if len(factors) > 1 else 0
+    ctrl   = QuantumRegister(n_c,      "c")      ## Cria um registrador quântico chamado "c" que escolhe o fator
+                                                 ##  (1 qubit = versão controlada do mult_mod_windowed)
                                                  
-    reg_b  = QuantumRegister(n_bits,   "b")      ## fator quântico
+    reg_b  = QuantumRegister(n_bits + coset_bits, "b")  ## fator quântico
                                                  ## Um registrador de n_bits qubits chamado "b" que guarda o número b que será multiplicado
                                                  ## Esse é o registrador de entrada principal.   
 
 
-    acc    = QuantumRegister(n_bits+1, "acc")    ## Um registrador de n_bits + 1 qubits chamado "acc" onde o resultado da multiplicação vai se acumulando.
-    anc    = QuantumRegister(2,        "anc")    ## Um registrador de 2 qubits chamado "anc", QROM ancillas
+    acc    = QuantumRegister(n_bits + max(coset_bits, 1), "acc")  ## Um registrador de n_bits + 1 qubits chamado "acc" onde o resultado da multiplicação vai se acumulando.
+                                                 ## (n_bits + m em coset)
+    L_max  = len(factors) << min(c_mul, len(reg_b))  ## endereço = janela + c
+    n_anc  = lookup_ancillas(L_max, n_bits, lam)
+    if mbu:
+        n_anc = max(n_anc, unlookup_ancillas(L_max, n_bits, lam))
+    anc    = QuantumRegister(n_anc, "anc")    ## ancillas do lookup (ver qrom.lookup_ancillas)
+    look   = QuantumRegister(n_bits, "look")  ## workspace: valor da tabela da janela
+    reg_help = QuantumRegister(0 if coset_bits else 1, "help")  ## ancilla da comparação do adder_mod_qq
+    carry  = QuantumRegister(len(acc) - 1 if ripple else 0, "carry")  ## carries do ripple-carry
     
     ## aqui criamos o circuito com os registradores
-    qc = QuantumCircuit(ctrl, reg_b, acc, anc, name=f"mulW{c_mul}")
+    qc = QuantumCircuit(ctrl, reg_b, acc, anc, look, reg_help, carry, name=f"mulW{c_mul}x{len(factors)}")
+
+    ### unlookup por medição: resultado da medida do look (e das cópias do qroam)
+    if mbu:
+        m = ClassicalRegister(n_bits * max(1, min(lam, 1 << ceil(log2(L_max)))), "m")
+        qc.add_register(m)
 
     ### QFT acc
-    from qiskit.circuit.library import QFT
-    qc.append(QFT(n_bits+1, do_swaps=False), acc)
+    if not ripple:
+        qc.append(qft_gate(len(acc), min_angle=min_angle), acc)
 
-    windows = ceil(n_bits / c_mul)
+    ## coset: soma comum mod 2^(n+m)
+    if ripple and mbu:
+        add = adder_qq_ripple(n_bits, len(acc), mbu=True) if coset_bits else adder_mod_qq_ripple(n_bits, N, mbu=True)
+    elif ripple:
+        add = adder_qq_ripple_gate(n_bits, len(acc)) if coset_bits else adder_mod_qq_ripple_gate(n_bits, N)
+    elif coset_bits:
+        add = draper_adder_qq_gate(n_bits, min_angle=min_angle, n_out=len(acc))
+    else:
+        add = adder_mod_qq_gate(n_bits, N, min_angle=min_angle)
+    windows = ceil(len(reg_b) / c_mul)
     for w in range(windows):
         lo   = w * c_mul
-        hi   = min((w+1)*c_mul, n_bits)
+        hi   = min((w+1)*c_mul, len(reg_b))
         size = 1 << (hi-lo)
-        addr = [reg_b[q] for q in range(lo, hi)]
+        addr = [reg_b[q] for q in range(lo, hi)] + ctrl[:]
 
-        ### tabela  (k * a * 2^lo) mod N
-        tbl = [ (k * a * (1<<lo)) % N for k in range(size) ]
+        ### tabela  (f * k * 2^lo) mod N, bloco de "size" entradas por fator f
+        tbl = [ (f * k * (1<<lo)) % N for f in factors for k in range(size) ]
 
-        ### LOOKUP  (⊕) valor --> acc
-        lookup = qrom(tbl, n_bits+1)
-        qc.append(lookup,        addr + acc[:] + anc[:])
+        ### LOOKUP  (⊕) valor --> look
+        anc_w = anc[:lookup_ancillas(len(tbl), n_bits, lam)]
+        qc.append(lookup_gate(tbl, n_bits, lam),               addr + look[:] + anc_w)
 
-        ### ADD  (acc += lookup) 
+        ### ADD  (acc += look mod N, acc na base de Fourier; mod 2^(n+m) em coset)
+        if ripple and mbu:
+            qc.compose(add, look[:] + acc[:] + reg_help[:] + carry[:], m[:1], inplace=True)
+        else:
+            qc.append(add, look[:] + acc[:] + reg_help[:] + carry[:])
 
         ### UNLOOKUP (clean ancillas)
-        qc.append(lookup.inverse(), addr + acc[:] + anc[:])
+        if mbu:
+            un = unlookup(tbl, n_bits, lam)
+            qc.compose(un, addr + look[:] + anc[:unlookup_ancillas(len(tbl), n_bits, lam)], m[:un.num_clbits], inplace=True)
+        else:
+            qc.append(lookup_gate(tbl, n_bits, lam, inverse=True), addr + look[:] + anc_w)
 
     ### IQFT
-    qc.append(QFT(n_bits+1, do_swaps=False).inverse(), acc)
+    if not ripple:
+        qc.append(qft_gate(len(acc), inverse=True, min_angle=min_angle), acc)
+
+    qc.metadata = coset_metadata(approx_metadata(mult_mod_windowed_error(n_bits, N, c_mul, min_angle, coset_bits, arith)),
+                                 windows, coset_bits)
+    if optimize:
+        from fourier_opt import optimize_fourier   ### só aqui: fourier_opt puxa fourier_sim e o qiskit.transpiler
+        qc = optimize_fourier(qc)
     return qc
+
+
+## versão em cache (mesmo objeto para os mesmos argumentos), ver gate_cache.py
+def mult_mod_windowed_gate(n_bits, a, N, c_mul=4, inverse=False, min_angle=0.0, lam=1, coset_bits=0, arith="fourier"):
+    key = ("mult_mod_windowed", n_bits, a, N, c_mul, inverse, min_angle, lam, coset_bits, arith)
+    if inverse:
+        return cached_gate(key, lambda: mult_mod_windowed_gate(n_bits, a, N, c_mul, min_angle=min_angle, lam=lam,
+                                                               coset_bits=coset_bits, arith=arith).inverse())
+    return cached_gate(key, lambda: mult_mod_windowed(n_bits, a, N, c_mul, min_angle, lam, coset_bits=coset_bits,
+                                                      arith=arith).to_instruction())
+
+
+def mult_mod_windowed_lookup_gate(n_bits, factors, N, c_mul=4, inverse=False, min_angle=0.0, lam=1, coset_bits=0,
+                                  arith="fourier"):
+    factors = tuple(factors)
+    key = ("mult_mod_windowed_lookup", n_bits, factors, N, c_mul, inverse, min_angle, lam, coset_bits, arith)
+    if inverse:
+        return cached_gate(key, lambda: mult_mod_windowed_lookup_gate(n_bits, factors, N, c_mul, min_angle=min_angle, lam=lam,
+                                                                      coset_bits=coset_bits, arith=arith).inverse())
+    return cached_gate(key, lambda: mult_mod_windowed_lookup(n_bits, factors, N, c_mul, min_angle, lam,
+                                                             coset_bits=coset_bits, arith=arith).to_instruction())
+
+
+## cota do erro do modo aproximado: QFT/IQFT do acumulador + um adder_mod_qq por janela
+##  (coset: um draper_adder_qq de n + m alvos por janela; o desvio do coset fica à parte)
+##  (ripple: sem rotações, erro 0)
+def mult_mod_windowed_error(n_bits, N, c_mul=4, min_angle=0.0, coset_bits=0, arith="fourier"):
+    if arith == "ripple":
+        return 0.0
+    if coset_bits:
+        w = n_bits + coset_bits
+        return 2 * qft_error(w, min_angle) + ceil(w / c_mul) * draper_adder_qq_error(n_bits, min_angle, w)
+    return 2 * qft_error(n_bits+1, min_angle) + ceil(n_bits / c_mul) * adder_mod_qq_error(n_bits, N, min_angle)
+
+
+if __name__ == "__main__":
+    from qiskit import transpile
+    from fourier_sim import verify_mult_mod_windowed
+    from ctrl_mult_mod import ctrl_mult_mod
+    from resources import estimate_mult_mod_windowed, estimate_ctrl_mult_mod
+
+    ### todos os (c, b, acc) --> acc + c*a*b mod N  (simulador na base de Fourier)
+    for n_bits, a, N, c_mul, lam in ((3, 5, 7, 2, 1), (4, 7, 13, 2, 1), (5, 12, 29, 3, 1), (6, 40, 59, 3, 2)):
+        wrong = verify_mult_mod_windowed(n_bits, a, N, c_mul, lam)
+        assert wrong == 0, (n_bits, a, N, c_mul, lam, wrong)
+        print(f"n = {n_bits}  N = {N:3d}  c_mul = {c_mul}  lam = {lam}: todas as {(2 * N) << n_bits} entradas ok")
+        wrong = verify_mult_mod_windowed(n_bits, a, N, c_mul, lam, arith="ripple")
+        assert wrong == 0, (n_bits, a, N, c_mul, lam, "ripple", wrong)
+
+    ### mbu (unlookup medido), também com qroam: acc certo e workspace / ancillas de volta a 0
+    from qiskit_aer import AerSimulator
+    backend = AerSimulator()
+    for n_bits, a, N, c_mul, lam, b, acc0 in ((3, 5, 7, 2, 1, 6, 3), (3, 5, 7, 2, 2, 6, 3)):
+        mul = mult_mod_windowed(n_bits, a, N, c_mul, lam=lam, mbu=True)
+        c_, b_, acc_ = mul.qregs[:3]
+        res = ClassicalRegister(mul.num_qubits - len(c_) - len(b_), "res")
+        qc = QuantumCircuit(*mul.qregs, *mul.cregs, res)
+        qc.x(c_[0])
+        for q in range(n_bits):
+            if (b >> q) & 1:
+                qc.x(b_[q])
+            if (acc0 >> q) & 1:
+                qc.x(acc_[q])
+        qc.compose(mul, qc.qubits, qc.clbits[:mul.num_clbits], inplace=True)
+        qc.measure([q for q in qc.qubits if q not in c_[:] + b_[:]], res)
+        counts = backend.run(transpile(qc, backend), shots=16).result().get_counts()
+        want = (acc0 + a * b) % N
+        assert all(int(k.split()[0], 2) == want for k in counts), (n_bits, lam, counts)
+        print(f"n = {n_bits}  N = {N:3d}  c_mul = {c_mul}  lam = {lam}  mbu: acc = {want}, ancillas limpas")
+
+    ### mesma operação que o ctrl_mult_mod (acc += c*a*b mod N): contagens e transpile em cx/u
+    for n_bits, a, N, c_mul in ((4, 7, 13, 2), (6, 40, 59, 3), (8, 100, 251, 4)):
+        for name, est, qc in (("ctrl_mult_mod       ", estimate_ctrl_mult_mod(n_bits, a, N),
+                               ctrl_mult_mod(n_bits, a, N)),
+                              (f"mult_mod_windowed c={c_mul}", estimate_mult_mod_windowed(n_bits, a, N, c_mul),
+                               mult_mod_windowed(n_bits, a, N, c_mul)),
+                              ("  idem, ripple       ", estimate_mult_mod_windowed(n_bits, a, N, c_mul, arith="ripple"),
+                               mult_mod_windowed(n_bits, a, N, c_mul, arith="ripple"))):
+            tqc = transpile(qc, basis_gates=["cx", "u"], optimization_level=1)
+            print(f"n = {n_bits}  {name}: {est.qubits:3d} qubits  {est.toffoli:5d} Toffolis  "
+                  f"{est.rotations:6d} rotações | cx/u: {tqc.count_ops().get('cx', 0):6d} cx  profundidade {tqc.depth():6d}")
+
+    ### tamanho grande, só pelo modelo
+    N = (1 << 1023) + 1155
+    ref = estimate_ctrl_mult_mod(1024, 3, N, exact=False)
+    for c_mul in (4, 6, 8):
+        r = estimate_mult_mod_windowed(1024, 3, N, c_mul, exact=False)
+        rr = estimate_mult_mod_windowed(1024, 3, N, c_mul, exact=False, arith="ripple")
+        print(f"n = 1024  c_mul = {c_mul}: rotações {r.rotations / ref.rotations:.2f}x, "
+              f"Toffolis {r.toffoli} (ctrl_mult_mod {ref.toffoli}), qubits {r.qubits} ({ref.qubits}) | "
+              f"ripple: 0 rotações, {rr.toffoli} Toffolis, {rr.qubits} qubits")
@@ -1,27 +1,53 @@
 # qrom.py 
-# XOR-lookup T[a] - versão 4L-4 Toffolis, 2 ancillas, saída em |out⟩
+# XOR-lookup T[a], saída em |out⟩
+#   mode="unary" - unary iteration (Babbush et al.), árvore de ANDs reaproveitados, 2L-4 Toffolis
+#   mode="mcx"   - versão antiga, 3 mcx sobre todo o endereço por entrada (mantida para comparação)
+# qroam: select-swap com lam cópias, ~2L/lam + (lam-1)*w Toffolis (cswap = 1); out precisa entrar
+#   em |0⟩ e as cópias ficam sujas até o inverso (ou o unlookup com o mesmo lam)
+# unlookup: desfaz o lookup medindo a saída na base X + correção de fase (~2√L Toffolis)
 # address  -->  bits mais SIGNIFICATIVOS primeiro (endianness little-endian)
 
-from qiskit import QuantumCircuit, QuantumRegister
+from qiskit import QuantumCircuit, QuantumRegister, ClassicalRegister
+from qiskit.circuit.classical import expr
+from qiskit.circuit.library import XGate, CXGate, CCXGate, CSwapGate
 from math import ceil, log2
+from gate_cache import cached_gate
 
-def qrom(table, w_bits):
+
+def qrom_ancillas(L, mode="unary"):
+    """Nº de ancillas que qrom(table, w_bits, mode) usa para uma tabela de L entradas."""
+    if mode == "mcx":
+        return 2
+    nA = ceil(log2(L)) if L > 1 else 0
+    return max(nA - 1, 0)
+
+
+def qrom(table, w_bits, mode="unary"):
     """
     XOR (⊕) do valor table[a] num registrador-alvo com w_bits qubits.
     table: lista de inteiros    0 ≤ t < 2**w_bits
     w_bits: tam do registrador alvo
+    mode: "unary" (default) ou "mcx" (versão antiga)
     Regs na chamada .append():
-        addr (⌈log2 L⌉ qubits) | out (w_bits) | anc (2 qubits)
+        addr (⌈log2 L⌉ qubits) | out (w_bits) | anc (qrom_ancillas(L, mode) qubits)
+    Endereços >= L (tabela incompleta) não têm saída definida no modo "unary".
     """
     L  = len(table)
-    nA = ceil(log2(L))               #### bits de endereço
+    nA = ceil(log2(L)) if L > 1 else 0   #### bits de endereço
     addr = QuantumRegister(nA,  "addr")
     out  = QuantumRegister(w_bits, "out")
-    anc  = QuantumRegister(2,   "anc")   #### a0, a1 resetados)
+    anc  = QuantumRegister(qrom_ancillas(L, mode), "anc")   #### resetados no final
 
     qc = QuantumCircuit(addr, out, anc, name=f"QROM{L}")
 
-    ### unary-iteration à la Babbush (4L-4 Toffolis)
+    if mode == "unary":
+        _emit(qc, qrom_ops(table, addr[:], out[:], anc[:]))
+        return qc
+    if mode != "mcx":
+        raise ValueError(f"mode desconhecido: {mode!r}")
+
+    ### versão antiga: 3 mcx sobre todo o endereço por entrada, 3L(2⌈log2 L⌉-3) Toffolis
+    ### (a unary iteration à la Babbush, com 2L-4, é o modo "unary" acima)
 
     ### optei por gerar um circuito mais compacto e direto em vez de gastar tempo (e complicar o código) pra 
     ##  fazer a versão ultrareduzida que seria relevante só pra L muito grande (tipo 2^5, 2^10 ou mais).
@@ -55,3 +81,378 @@ def qrom(table, w_bits):
         qc.barrier()
 
     return qc
+
+
+def qrom_ops(table, addr, out, anc, inverse=False):
+    """
+    Portas de qrom(table, w_bits) (modo "unary") como (operation, qubits, clbits), geradas uma
+    a uma sobre os qubits dados (objetos Qubit ou índices). Memória O(log L), não O(L w).
+    inverse=True gera as do inverso (a mesma árvore de trás para frente: x/cx/ccx são auto-inversas).
+    """
+    ### do bit mais significativo para o menos significativo
+    yield from _unary_iteration(None, addr[::-1], anc, 0, len(table),
+                                lambda j, ctrl: _write_entry(ctrl, out, table[j], inverse), inverse)
+
+
+def _emit(qc, ops):
+    """Acrescenta a qc as portas (operation, qubits, clbits) de um gerador, na ordem em que saem."""
+    for op, qs, cs in ops:
+        qc._append(op, qs, cs)
+
+
+def _unary_iteration(ctrl, bits, ancs, lo, L, leaf, reverse=False):
+    """
+    Percorre a sub-árvore de endereços [lo, lo + 2^len(bits)) ∩ [0, L), gerando as portas.
+    ctrl  : qubit que vale 1 sse o prefixo do endereço já visto bate (None na raiz)
+    bits  : bits de endereço restantes, MSB primeiro
+    ancs  : uma ancilla por nível, guarda AND(ctrl, bit) e é reaproveitada
+            entre os dois filhos (ctrl∧¬bit --CX--> ctrl∧bit)
+    leaf(j, ctrl) devolve as portas da folha, com ctrl = |addr == j⟩
+    reverse: mesma árvore de trás para frente (folhas da direita para a esquerda)
+    """
+    if not bits:
+        yield from leaf(lo, ctrl)
+        return
+
+    half = 1 << (len(bits) - 1)
+    bit = bits[0]
+
+    ### sub-árvore da direita vazia: para endereços válidos esse bit é 0
+    if lo + half >= L:
+        yield from _unary_iteration(ctrl, bits[1:], ancs, lo, L, leaf, reverse)
+        return
+
+    ### raiz: o próprio bit (ou seu complemento) já é o controle dos filhos
+    if ctrl is None:
+        left = lambda: _unary_iteration(bit, bits[1:], ancs, lo, L, leaf, reverse)
+        right = lambda: _unary_iteration(bit, bits[1:], ancs, lo + half, L, leaf, reverse)
+        steps = [(XGate(), (bit,)), left, (XGate(), (bit,)), right]
+    else:
+        anc = ancs[0]
+        left = lambda: _unary_iteration(anc, bits[1:], ancs[1:], lo, L, leaf, reverse)
+        right = lambda: _unary_iteration(anc, bits[1:], ancs[1:], lo + half, L, leaf, reverse)
+        steps = [(XGate(), (bit,)), (CCXGate(), (ctrl, bit, anc)), (XGate(), (bit,)),   ### anc = ctrl ∧ ¬bit
+                 left,
+                 (CXGate(), (ctrl, anc)),                                             ### anc = ctrl ∧ bit
+                 right,
+                 (CCXGate(), (ctrl, bit, anc))]                                       ### anc = 0
+    for step in (reversed(steps) if reverse else steps):
+        if callable(step):
+            yield from step()
+        else:
+            yield step[0], step[1], ()
+
+
+def _write_entry(ctrl, out, val, reverse=False):
+    """Portas do XOR de val em out, controlado por ctrl (ctrl None: sem controle)."""
+    for b in (reversed(range(len(out))) if reverse else range(len(out))):
+        if (val >> b) & 1:
+            if ctrl is None:
+                yield XGate(), (out[b],), ()
+            else:
+                yield CXGate(), (ctrl, out[b]), ()
+
+
+def qrom_gate(table, w_bits, inverse=False, mode="unary"):
+    """
+    Versão em cache de qrom (mesmo objeto para a mesma tabela).
+    No modo "mcx" devolve Instruction (o circuito tem barriers, então não vira Gate).
+    """
+    table = tuple(table)
+    key = ("qrom", table, w_bits, inverse, mode)
+    if inverse:
+        return cached_gate(key, lambda: qrom_gate(table, w_bits, mode=mode).inverse())
+    if mode == "mcx":
+        return cached_gate(key, lambda: qrom(table, w_bits, mode).to_instruction())
+    return cached_gate(key, lambda: qrom(table, w_bits, mode).to_gate())
+
+
+def qroam(table, w_bits, lam):
+    """
+    SELECT-SWAP (QROAM): escreve table[a] em out, com lam cópias paralelas (out é a cópia 0).
+    table: lista de inteiros    0 ≤ t < 2**w_bits
+    w_bits: tam do registrador alvo
+    lam: nº de cópias (potência de 2). Troca qubits por Toffolis:
+         2*⌈L/lam⌉ - 4 Toffolis no SELECT + (lam-1)*w_bits cswaps, com (lam-1)*w_bits qubits extras.
+         lam = 1 é o qrom normal.
+    Regs na chamada .append():
+        addr (⌈log2 L⌉ qubits) | out (w_bits) | anc (lookup_ancillas(L, w_bits, lam) qubits)
+
+    1) SELECT (unary iteration) nos bits altos h do endereço escreve o bloco
+       table[h*lam : (h+1)*lam] nas lam cópias (out + "copy")
+    2) rede de cswaps controlada pelos bits baixos leva a cópia l para out
+
+    out e as cópias precisam entrar em |0⟩ (não é XOR) e as cópias saem com o resto do bloco:
+    quem limpa é o inverso (lookup_gate(..., inverse=True)) ou unlookup(table, w_bits, lam).
+    """
+    L  = len(table)
+    nA = ceil(log2(L)) if L > 1 else 0
+    lam = min(lam, 1 << nA)
+    k  = lam.bit_length() - 1                ### bits baixos (escolhem a cópia)
+    if lam != 1 << k:
+        raise ValueError("lam precisa ser potência de 2")
+    n_blocks = ceil(L / lam)
+
+    addr   = QuantumRegister(nA, "addr")
+    out    = QuantumRegister(w_bits, "out")
+    copies = QuantumRegister((lam - 1) * w_bits, "copy")    ### antes de anc: o unlookup usa as mesmas
+    anc    = QuantumRegister(qrom_ancillas(n_blocks), "anc")
+
+    qc = QuantumCircuit(addr, out, copies, anc, name=f"QROAM{L}_{lam}")
+    _emit(qc, qroam_ops(table, addr[:], out[:], copies[:], anc[:], lam))
+    return qc
+
+
+def qroam_ops(table, addr, out, copies, anc, lam, inverse=False):
+    """Portas de qroam(table, w_bits, lam) uma a uma, como qrom_ops (inverse: as do inverso)."""
+    lam = min(lam, 1 << len(addr))
+    k = lam.bit_length() - 1
+    word = _words(out, copies, lam)
+    ### 1) SELECT sobre os bits altos
+    select = lambda: _unary_iteration(None, addr[k:][::-1], anc, 0, ceil(len(table) / lam),
+                                      lambda h, ctrl: _write_entry_block(ctrl, word, table, h, lam, inverse), inverse)
+    ### 2) cópia l --> out
+    route = lambda: _route(addr[:k], word, inverse)
+    for step in ((route, select) if inverse else (select, route)):
+        yield from step()
+
+
+def _words(out, copies, lam):
+    """As lam palavras do qroam: out é a 0, as outras vêm de copies."""
+    w_bits = len(out)
+    return [out[:]] + [copies[(l - 1) * w_bits:l * w_bits] for l in range(1, lam)]
+
+
+def _route(low, word, reverse=False):
+    """
+    Portas da rede de cswaps que leva word[l] para word[0], l = bits low (little-endian):
+    bit i troca word[t] <-> word[t + 2^i] para t < 2^i.  (lam - 1) * w_bits cswaps.
+    reverse: a rede inversa (mesmos cswaps na ordem contrária).
+    """
+    w_bits = len(word[0])
+    swaps = ((i, t, b) for i in reversed(range(len(low))) for t in range(1 << i) for b in range(w_bits))
+    if reverse:
+        swaps = ((i, t, b) for i in range(len(low)) for t in reversed(range(1 << i)) for b in reversed(range(w_bits)))
+    for i, t, b in swaps:
+        yield CSwapGate(), (low[i], word[t][b], word[t + (1 << i)][b]), ()
+
+
+def _write_entry_block(ctrl, word, table, h, lam, reverse=False):
+    """Portas do XOR do bloco table[h*lam : (h+1)*lam] nas cópias word[0..lam-1]."""
+    for l in (reversed(range(lam)) if reverse else range(lam)):
+        if h * lam + l < len(table):
+            yield from _write_entry(ctrl, word[l], table[h * lam + l], reverse)
+
+
+def lookup_ancillas(L, w_bits, lam=1):
+    """Nº de ancillas do lookup de L entradas: qrom (lam = 1) ou qroam (lam cópias, out é uma delas)."""
+    if lam <= 1:
+        return qrom_ancillas(L)
+    nA = ceil(log2(L)) if L > 1 else 0
+    lam = min(lam, 1 << nA)
+    return (lam - 1) * w_bits + qrom_ancillas(ceil(L / lam))
+
+
+def lookup_gate(table, w_bits, lam=1, inverse=False):
+    """Lookup em cache: qrom_gate (lam = 1) ou QROAM com lam cópias."""
+    if lam <= 1:
+        return qrom_gate(table, w_bits, inverse)
+    table = tuple(table)
+    key = ("qroam", table, w_bits, lam, inverse)
+    if inverse:
+        return cached_gate(key, lambda: lookup_gate(table, w_bits, lam).inverse())
+    return cached_gate(key, lambda: qroam(table, w_bits, lam).to_gate())
+
+
+def unlookup_ancillas(L, w_bits=0, lam=1):
+    """
+    Nº de ancillas de unlookup(table, w_bits, lam) para L entradas (iteração + registrador one-hot;
+    com lam > 1 as cópias do qroam vêm antes, nas mesmas posições do lookup_ancillas).
+    """
+    nA = ceil(log2(L)) if L > 1 else 0
+    if lam > 1:
+        lam = min(lam, 1 << nA)
+        return (lam - 1) * w_bits + unlookup_ancillas(ceil(L / lam))
+    K  = 1 << (nA // 2)
+    return qrom_ancillas(ceil(L / K)) + K
+
+
+def unlookup(table, w_bits, lam=1):
+    """
+    Desfaz qrom(table, w_bits) por medição (measurement-based uncomputation):
+        1) mede out na base X (resultado m) e reseta out
+           --> sobra a fase (-1)^(m·table[a]) no endereço
+        2) corrige a fase com um lookup de fase de ~√L:
+           - bits baixos do endereço (k = nA//2) viram um registrador one-hot de K = 2^k qubits
+           - unary iteration nos bits altos; no bloco h aplica CZ(ctrl, onehot[l])
+             condicionado classicamente em paridade(m & table[h*K + l])
+    Custo ~ 2(L/K + K) Toffolis, contra ~2L do qrom inverso.
+    lam > 1: desfaz qroam(table, w_bits, lam). Desfaz a rede de cswaps (as lam cópias voltam a
+    guardar o bloco do SELECT) e faz o unlookup acima da tabela de blocos, de lam*w_bits
+    bits, nos bits altos do endereço: ~ 2√(L/lam) + (lam-1)*w_bits Toffolis.
+
+    Regs na chamada .compose():
+        addr (⌈log2 L⌉) | out (w_bits) | anc (unlookup_ancillas(L, w_bits, lam)) | clbits m (num_clbits)
+        (m: w_bits, ou lam*w_bits com lam > 1)
+    OBS: tem medição e if_test, então não vira Gate/Instruction: usar compose, não append.
+    """
+    L  = len(table)
+    nA = ceil(log2(L)) if L > 1 else 0
+    lam = min(lam, 1 << nA)
+    if lam > 1:
+        return _unlookup_qroam(table, w_bits, lam)
+
+    k  = nA // 2
+    K  = 1 << k
+    n_blocks = ceil(L / K)
+
+    addr   = QuantumRegister(nA, "addr")
+    out    = QuantumRegister(w_bits, "out")
+    anc    = QuantumRegister(qrom_ancillas(n_blocks), "anc")
+    onehot = QuantumRegister(K, "onehot")
+    m      = ClassicalRegister(w_bits, "m")
+
+    qc = QuantumCircuit(addr, out, anc, onehot, m, name=f"unQROM{L}")
+
+    ### 1) medida na base X
+    qc.h(out)
+    qc.measure(out, m)
+    qc.reset(out)
+
+    if nA == 0:        ### uma entrada só: a fase é global
+        return qc
+
+    ### 2) one-hot dos bits baixos: |l⟩ --> onehot[l] = 1
+    prep = QuantumCircuit(addr, out, anc, onehot, m)
+    prep.x(onehot[0])
+    for i in range(k):
+        for t in range(1 << i):
+            prep.cswap(addr[i], onehot[t], onehot[t + (1 << i)])
+    qc.compose(prep, inplace=True)
+
+    ### a folha escreve os if_test direto em qc (devolve nenhuma porta): _emit acrescenta as
+    ### portas da iteração conforme saem do gerador, então a ordem é a da árvore
+    def fix_block(h, ctrl):
+        for l in range(K):
+            j = h * K + l
+            if j >= L or table[j] == 0:
+                continue
+            with qc.if_test(_parity([m[b] for b in range(w_bits) if (table[j] >> b) & 1])):
+                if ctrl is None:
+                    qc.z(onehot[l])
+                else:
+                    qc.cz(ctrl, onehot[l])
+        return ()
+
+    _emit(qc, _unary_iteration(None, addr[k:][::-1], anc[:], 0, n_blocks, fix_block))
+
+    qc.compose(prep.inverse(), inplace=True)
+    return qc
+
+
+def _unlookup_qroam(table, w_bits, lam):
+    """unlookup(table, w_bits, lam) com lam > 1 (regs como em qroam, mais os clbits m)."""
+    L  = len(table)
+    nA = ceil(log2(L)) if L > 1 else 0
+    k  = lam.bit_length() - 1
+    n_blocks = ceil(L / lam)
+    blocks = [sum(table[j] << (l * w_bits) for l, j in enumerate(range(h * lam, min((h + 1) * lam, L))))
+              for h in range(n_blocks)]
+
+    addr   = QuantumRegister(nA, "addr")
+    out    = QuantumRegister(w_bits, "out")
+    copies = QuantumRegister((lam - 1) * w_bits, "copy")
+    anc    = QuantumRegister(unlookup_ancillas(n_blocks), "anc")
+    m      = ClassicalRegister(lam * w_bits, "m")
+
+    qc = QuantumCircuit(addr, out, copies, anc, m, name=f"unQROAM{L}_{lam}")
+    word = _words(out, copies, lam)
+    _emit(qc, _route(addr[:k], word, reverse=True))
+    qc.compose(unlookup(blocks, lam * w_bits), addr[k:] + [q for wd in word for q in wd] + anc[:], m[:], inplace=True)
+    return qc
+
+
+def _parity(clbits):
+    """Expressão clássica com o XOR dos clbits."""
+    cond = expr.lift(clbits[0])
+    for c in clbits[1:]:
+        cond = expr.bit_xor(cond, c)
+    return cond
+
+
+def toffoli_count(qc):
+    """
+    Nº de Toffolis equivalentes do circuito (um nível, sem decompor):
+    ccx = cswap = 1, mcx com k controles = 2k - 3 (escada com ancillas limpas).
+    """
+    total = 0
+    for inst in qc.data:
+        k = inst.operation.num_qubits - 1
+        if inst.operation.name in ("ccx", "mcx") and k >= 2:
+            total += 2 * k - 3
+        elif inst.operation.name == "cswap":
+            total += 1
+    return total
+
+
+if __name__ == "__main__":
+    ### regressão de contagem: unary iteration vs versão antiga (mcx), L até 2^10
+    for nA in range(1, 11):
+        L = 1 << nA
+        table = [(7 * j + 3) % L for j in range(L)]
+        t_unary = toffoli_count(qrom(table, nA))
+        t_mcx   = toffoli_count(qrom(table, nA, mode="mcx"))
+        assert t_unary == max(2 * L - 4, 0), (L, t_unary)
+        assert t_unary <= t_mcx, (L, t_unary, t_mcx)
+        print(f"L = {L:5d}   unary: {t_unary:6d}   mcx: {t_mcx:7d}")
+
+    ### qroam: todos os endereços (simulador reversível), out = table[addr], addr e anc intactos,
+    ### e qroam + inverso devolve tudo a 0. Toffolis (cswap = 1) = SELECT + rede de cswaps
+    import numpy as np
+    from reversible_sim import run_reversible
+
+    for L, w, lam in ((16, 5, 4), (13, 5, 2), (64, 8, 16), (100, 6, 8), (1024, 8, 8), (1024, 10, 32)):
+        table = [(5 * j * j + 3) % (1 << w) for j in range(L)]
+        qc = qroam(table, w, lam)
+        res = run_reversible(qc, {"addr": np.arange(L)})
+        assert np.array_equal(res["out"], np.array(table, dtype=np.uint64)), (L, w, lam)
+        assert np.array_equal(res["addr"], np.arange(L)) and not res["anc"].any(), (L, w, lam)
+        res = run_reversible(qc.compose(qc.inverse()), {"addr": np.arange(L)})
+        assert not (res["out"].any() or res["copy"].any() or res["anc"].any()), (L, w, lam)
+        t_roam, t_rom = toffoli_count(qc), toffoli_count(qrom(table, w))
+        assert t_roam == max(2 * ceil(L / lam) - 4, 0) + (lam - 1) * w, (L, w, lam, t_roam)
+        assert qc.num_qubits - qrom(table, w).num_qubits == lookup_ancillas(L, w, lam) - qrom_ancillas(L)
+        print(f"qroam L = {L:4d} w = {w:2d} lam = {lam:2d}: todos os endereços ok, "
+              f"{t_roam:5d} Toffolis (qrom {t_rom:5d}), +{(lam - 1) * w} qubits")
+    assert toffoli_count(qroam(table, 10, 32)) < toffoli_count(qrom(table, 10)) / 4
+
+    ### unlookup por medição vs inverso unitário: endereço em |+⟩, lookup, unlookup e
+    ### medida do endereço na base X --> deve sair sempre 0 (fases corrigidas, out limpo)
+    from qiskit import transpile
+    from qiskit_aer import AerSimulator
+
+    backend = AerSimulator()
+    for L, w, lam in ((4, 3, 1), (8, 4, 1), (16, 5, 1), (32, 5, 1), (8, 3, 2), (16, 3, 4), (13, 2, 4)):
+        table = [(5 * j * j + 3) % (1 << w) for j in range(L)]
+        nA    = ceil(log2(L))
+        for measured in (False, True):
+            un    = unlookup(table, w, lam)
+            n_anc = max(lookup_ancillas(L, w, lam), unlookup_ancillas(L, w, lam))
+            addr  = QuantumRegister(nA, "addr")
+            out   = QuantumRegister(w, "out")
+            anc   = QuantumRegister(n_anc, "anc")
+            m     = ClassicalRegister(un.num_clbits, "m")
+            res   = ClassicalRegister(nA + w + n_anc, "res")
+            qc = QuantumCircuit(addr, out, anc, m, res)
+            qc.h(addr)
+            qc.append(lookup_gate(table, w, lam), addr[:] + out[:] + anc[:lookup_ancillas(L, w, lam)])
+            if measured:
+                qc.compose(un, addr[:] + out[:] + anc[:unlookup_ancillas(L, w, lam)], m[:], inplace=True)
+            else:
+                qc.append(lookup_gate(table, w, lam, inverse=True), addr[:] + out[:] + anc[:lookup_ancillas(L, w, lam)])
+            qc.h(addr)
+            qc.measure(addr[:] + out[:] + anc[:], res)
+            counts = backend.run(transpile(qc, backend), shots=256).result().get_counts()
+            zeros = sum(c for key, c in counts.items() if int(key.split()[0], 2) == 0)
+            assert zeros == 256, (L, lam, measured, counts)
+            print(f"L = {L:3d} lam = {lam}  unlookup {'medido  ' if measured else 'unitário'}: P(0) = {zeros / 256:.3f}")
@@ -0,0 +1,534 @@
+# resources.py
+#
+# Estimativa analítica de recursos (sem montar circuitos) para
+#   draper_adder, adder_mod, adder_mod_qq, ctrl_mult_mod, expmod, qrom/qroam,
+#   mult_mod_windowed e expmod_windowed (também em coset, coset_bits > 0), e os somadores
+#   ripple-carry do adder_plain.py (arith="ripple" nas versões janeladas).
+#
+#   Cada função estimate_* repete os laços do builder correspondente, mas só soma
+#   contadores, então roda em milissegundos mesmo para N de 1024-2048 bits.
+#
+#   Convenção das contagens (igual a count_circuit, que mede um circuito montado
+#   descendo nas definições até as portas básicas):
+#       toffoli   : ccx = 1, cswap = 1, mcx com k controles = 2k - 3
+#       t_count   : 7 * toffoli (as rotações não entram, precisam de síntese;
+#                   synthesized_t_count soma T_PER_ROTATION por rotação)
+#       cnot      : cx (qualquer ctrl_state)
+#       rotations : p, cp e mcphase (ângulos arbitrários)
+#       depth_bound : cota superior da profundidade, soma das profundidades dos
+#                   blocos em sequência (os blocos não são sobrepostos como no
+#                   depth() do qiskit). count_circuit/count_stream devolvem
+#                   CircuitCounts, cujo campo depth é a profundidade exata.
+#
+#   exact:
+#       True  - conta as portas que dependem dos valores clássicos (fases nulas
+#               que o draper_adder omite, bits 1 das tabelas do QROM). Bate com
+#               count_circuit, mas custa O(n) por multiplicação.
+#       False - fórmula fechada: todos os ângulos das constantes do multiplicador
+#               ≠ 0 (cota superior das rotações) e n_bits/2 bits 1 por entrada das
+#               tabelas (média). Para N grande.
+#       None  - (default) exato até 64 bits.
+
+from collections import Counter, namedtuple
+from math import ceil, log2
+from draperqftadder_adapt import rotation_cutoff, qft_approximation_degree
+
+Resources = namedtuple("Resources", ["qubits", "toffoli", "t_count", "cnot", "rotations", "depth_bound"])
+CircuitCounts = namedtuple("CircuitCounts", ["qubits", "toffoli", "t_count", "cnot", "rotations", "depth"])
+
+EXACT_MAX_BITS = 64
+
+T_PER_ROTATION = 100      ### síntese Clifford+T de uma rotação, ~3 log2(1/eps) com eps ~ 1e-10 (Ross-Selinger)
+
+
+def synthesized_t_count(r, t_per_rotation=T_PER_ROTATION):
+    """T-count com as rotações sintetizadas: r.t_count + t_per_rotation * r.rotations."""
+    return r.t_count + t_per_rotation * r.rotations
+
+
+def to_resources(qubits, cost):
+    """Counter de custos (toffoli, cnot, rotations, depth) --> Resources (t_count = 7 * toffoli)."""
+    tof = int(round(cost["toffoli"]))
+    return Resources(qubits, tof, 7 * tof, int(round(cost["cnot"])),
+                     int(round(cost["rotations"])), int(round(cost["depth"])))
+
+
+def _times(cost, k):
+    return Counter({key: v * k for key, v in cost.items()})
+
+
+def _is_exact(exact, n_bits):
+    return n_bits <= EXACT_MAX_BITS if exact is None else exact
+
+
+def mcx_toffoli(k):
+    """Toffolis de um X com k controles (k = 1 é CNOT)."""
+    return 0 if k < 2 else 2 * k - 3
+
+
+### ---------------------------------------------------------------- Draper / QFT
+
+def _n_rotations(a, n_bits, min_angle=0.0):
+    """
+    Nº de fases ≠ 0 do draper_adder (merge_angles=True) de a em n_bits:
+    alvo t recebe os bits j de a com t - k_max <= j <= t.
+    """
+    a_bits = a % (1 << n_bits)
+    k_max = rotation_cutoff(min_angle)
+    if a_bits == 0 or (k_max is not None and k_max < 0):
+        return 0
+    if k_max is None or k_max >= n_bits:
+        return n_bits + 1 - ((a_bits & -a_bits).bit_length() - 1)
+    ### "espalha" cada bit 1 por k_max posições à esquerda (dobrando o deslocamento)
+    spread, width = a_bits, 1
+    while width < k_max + 1:
+        step = min(width, k_max + 1 - width)
+        spread |= spread << step
+        width += step
+    return (spread & ((1 << (n_bits + 1)) - 1)).bit_count()
+
+
+def _draper_cost(n_rot, controlado):
+    """draper_adder (ou o inverso) com n_rot fases: paralelas sem controle, em série com controle."""
+    depth = n_rot if controlado else min(n_rot, 1)
+    return Counter(rotations=n_rot, depth=depth)
+
+
+def _qft_cost(m, min_angle=0.0):
+    """QFT(m, do_swaps=False) do qft_gate: m H e as cp de distância <= m-1-degree."""
+    degree = qft_approximation_degree(m, min_angle)
+    d_max = m - 1 - degree
+    n_cp = sum(m - d for d in range(1, d_max + 1))
+    return Counter(rotations=n_cp, depth=2 * m - 1 if d_max >= 1 else 1)
+
+
+def _qq_adder_cost(n_bits, min_angle=0.0, n_out=None):
+    """draper_adder_qq: cp(a_j, b_{j+d}) para d <= k_max, uma camada por diagonal d."""
+    n_out = n_bits + 1 if n_out is None else n_out
+    k_max = rotation_cutoff(min_angle)
+    d_max = n_out - 1 if k_max is None else min(n_out - 1, k_max)
+    if d_max < 0:
+        return Counter()
+    n_cp = sum(min(n_bits, n_out - d) for d in range(d_max + 1))
+    return Counter(rotations=n_cp, depth=d_max + 1)
+
+
+def estimate_draper_adder(n_bits, a, controlado=False, control_number=1, min_angle=0.0):
+    """Recursos do draper_adder (merge_angles=True)."""
+    qubits = n_bits + 1 + (control_number if controlado else 0)
+    return to_resources(qubits, _draper_cost(_n_rotations(a, n_bits, min_angle), controlado))
+
+
+### ---------------------------------------------------------------- ripple-carry (adder_plain)
+
+def _ripple_cost(addend, mbu=False):
+    """
+    adder_plain._ripple com a parcela addend (por bit: 0, 1 ou "q" = qubit).
+    depth = nº de portas (X em lista contam uma a uma).
+    """
+    un = Counter(depth=3) if mbu else Counter(toffoli=1)          ### AND desfeito: H, medida, if_test | ccx
+    cost = Counter()
+    have_c = False
+    for i, t in enumerate(addend):
+        step = None
+        if i < len(addend) - 1:
+            if not have_c and t == 0:
+                step = None
+            elif not have_c:
+                step = "copy" if t == 1 else "and"
+            else:
+                step = {0: "and", 1: "or"}.get(t, "maj")
+            ### ida + volta do carry c_{i+1}
+            if step == "copy":
+                cost += Counter(cnot=2)
+            elif step == "and":
+                cost += Counter(toffoli=1) + un
+            elif step == "or":
+                cost += Counter(toffoli=1, x=10) + un
+            elif step == "maj":
+                cost += Counter(toffoli=1, cnot=10) + un
+        ### soma do bit i
+        cost += Counter(cnot=int(have_c) + (t == "q"), x=int(t == 1))
+        have_c = have_c or (step is not None)
+    cost["depth"] += cost["toffoli"] + cost["cnot"] + cost.pop("x", 0)
+    return cost
+
+
+def _adder_mod_qq_ripple_cost(n_bits, N, mbu=False):
+    """adder_mod_qq_ripple: 3 somas de a, - N, + N controlado, 4 camadas de X e 2 cx."""
+    a_bits = ["q"] * n_bits + [0]
+    N_bits = [(N >> i) & 1 for i in range(n_bits + 1)]
+    return (_times(_ripple_cost(a_bits, mbu), 3) + _ripple_cost(N_bits, mbu)
+            + _ripple_cost(["q" if x else 0 for x in N_bits], mbu) + Counter(cnot=2, depth=6))
+
+
+def estimate_adder_n(n_bits, const, controlado=False, mbu=False):
+    """Recursos do adder_n (ripple-carry de uma constante)."""
+    bits = [("q" if controlado else 1) if (const >> i) & 1 else 0 for i in range(n_bits)]
+    return to_resources(n_bits + max(n_bits - 1, 0) + bool(controlado), _ripple_cost(bits, mbu))
+
+
+def estimate_adder_mod_qq_ripple(n_bits, N, mbu=False):
+    """Recursos do adder_mod_qq_ripple."""
+    return to_resources(3 * n_bits + 2, _adder_mod_qq_ripple_cost(n_bits, N, mbu))
+
+
+### ---------------------------------------------------------------- coset
+
+def _coset_init_cost(n_bits, N, coset_bits, value, min_angle):
+    """coset_init: camada de H, m somas controladas de (N-1)/2 (com QFT/IQFT) e + value."""
+    cost = Counter(depth=1)
+    for i in range(coset_bits):
+        L = n_bits + coset_bits - i - 1
+        cost += _times(_qft_cost(L, min_angle), 2) + _draper_cost(_n_rotations((N - 1) // 2, L - 1, min_angle), True)
+    if value % N:
+        w = n_bits + coset_bits
+        cost += _times(_qft_cost(w, min_angle), 2) + _draper_cost(_n_rotations(value % N, w - 1, min_angle), False)
+    return cost
+
+
+### ---------------------------------------------------------------- adder_mod / ctrl_mult_mod
+
+def _adder_mod_cost(n_bits, r_a, r_N, controlado, control_number, min_angle):
+    """adder_mod com r_a / r_N fases nos adders de a / N (mesma sequência do builder)."""
+    qft = _qft_cost(n_bits + 1, min_angle)
+    if controlado:
+        cost = (_times(_draper_cost(r_a, True), 3) + _times(_draper_cost(r_N, True), 2)
+                + _times(qft, 4))
+        cost += Counter(cnot=1, depth=1)                          ### cx(cout, anc)
+        cost += Counter(toffoli=mcx_toffoli(control_number + 1), depth=3)   ### x, (m)cx, x
+        return cost
+    ### sem controle: o adder de N volta controlado pela anc
+    cost = (_times(_draper_cost(r_a, False), 3) + _draper_cost(r_N, False) + _draper_cost(r_N, True)
+            + _times(qft, 4))
+    return cost + Counter(cnot=2, depth=2)
+
+
+def estimate_adder_mod(n_bits, a, N, controlado=False, control_number=1, min_angle=0.0):
+    """Recursos do adder_mod (sem as QFTs de fora, que ficam com quem chama)."""
+    qubits = n_bits + 2 + (control_number if controlado else 0)
+    cost = _adder_mod_cost(n_bits, _n_rotations(a, n_bits, min_angle), _n_rotations(N, n_bits, min_angle),
+                           controlado, control_number, min_angle)
+    return to_resources(qubits, cost)
+
+
+def _adder_mod_qq_cost(n_bits, r_N, min_angle):
+    """adder_mod_qq: 3 draper_adder_qq, adder de N (um sem controle, um controlado pela anc), 4 QFT/IQFT."""
+    return (_times(_qq_adder_cost(n_bits, min_angle), 3) + _draper_cost(r_N, False) + _draper_cost(r_N, True)
+            + _times(_qft_cost(n_bits + 1, min_angle), 4) + Counter(cnot=2, depth=2))
+
+
+def estimate_adder_mod_qq(n_bits, N, min_angle=0.0):
+    """Recursos do adder_mod_qq (sem as QFTs de fora)."""
+    return to_resources(2 * n_bits + 2, _adder_mod_qq_cost(n_bits, _n_rotations(N, n_bits, min_angle), min_angle))
+
+
+def _ctrl_mult_mod_cost(n_bits, a, N, min_angle, exact, factor_controls=False, mbu=False, coset_bits=0):
+    r_N = _n_rotations(N, n_bits, min_angle)
+    cn = 1 if factor_controls else 2
+    if factor_controls:
+        ### ccx no "and" + (ccx | H, medida, if_test) para desfazer
+        and_cost = Counter(toffoli=1, depth=1) + (Counter(depth=3) if mbu else Counter(toffoli=1, depth=1))
+    else:
+        and_cost = Counter()
+    if coset_bits:
+        ### n + m draper_adder comuns de n + m qubits (constantes < N)
+        w = n_bits + coset_bits
+        if exact:
+            consts = [((1 << i) * a) % N for i in range(w)]
+        else:
+            consts = [(1 << n_bits) - 1] * w                      ### todos os ângulos ≠ 0
+        cost = Counter()
+        for a_i in consts:
+            cost += _draper_cost(_n_rotations(a_i, w - 1, min_angle), True) + and_cost
+        return cost + _times(_qft_cost(w, min_angle), 2)
+    if exact:
+        cost = Counter()
+        a_i = a % N
+        for i in range(n_bits):
+            cost += _adder_mod_cost(n_bits, _n_rotations(a_i, n_bits, min_angle), r_N, True, cn, min_angle) + and_cost
+            a_i = (2 * a_i) % N
+    else:
+        cost = _times(_adder_mod_cost(n_bits, n_bits + 1, r_N, True, cn, min_angle) + and_cost, n_bits)
+    return cost + _times(_qft_cost(n_bits + 1, min_angle), 2)
+
+
+def estimate_ctrl_mult_mod(n_bits, a, N, min_angle=0.0, exact=None, factor_controls=False, mbu=False, coset_bits=0):
+    """Recursos do ctrl_mult_mod: QFT + n adder_mod duplamente controlados + IQFT
+    (com factor_controls: n adder_mod com 1 controle + o AND num qubit extra;
+    com coset_bits = m: n + m draper_adder comuns de n + m qubits, sem help)."""
+    if mbu and not factor_controls:
+        raise ValueError("estimate_ctrl_mult_mod: mbu=True precisa de factor_controls=True")
+    qubits = 2 * n_bits + 3 if not coset_bits else 1 + 2 * (n_bits + coset_bits)
+    return to_resources(qubits + bool(factor_controls),
+                         _ctrl_mult_mod_cost(n_bits, a, N, min_angle, _is_exact(exact, n_bits), factor_controls, mbu,
+                                             coset_bits))
+
+
+def estimate_expmod(N, base, bits_expoente, min_angle=0.0, exact=None, factor_controls=False, coset_bits=0):
+    """Recursos do expmod: por bit do expoente 2 ctrl_mult_mod e n_bits cswap
+    (coset_bits = m: n + m cswap e os 2 coset_init do início)."""
+    n_bits = int(log2(N)) + 1
+    exact = _is_exact(exact, n_bits)
+    w = n_bits + coset_bits
+    swaps = Counter(toffoli=w, depth=w)                           ### mesmo controle: em série
+    cost = Counter()
+    if coset_bits:
+        cost += _coset_init_cost(n_bits, N, coset_bits, 1, min_angle) + _coset_init_cost(n_bits, N, coset_bits, 0, min_angle)
+    if exact:
+        a_i = base % N
+        for i in range(bits_expoente):
+            cost += _ctrl_mult_mod_cost(n_bits, a_i, N, min_angle, True, factor_controls, coset_bits=coset_bits)
+            cost += _ctrl_mult_mod_cost(n_bits, pow(a_i, -1, N), N, min_angle, True, factor_controls,
+                                        coset_bits=coset_bits)
+            cost += swaps
+            a_i = a_i * a_i % N
+    else:
+        cost += _times(_times(_ctrl_mult_mod_cost(n_bits, 1, N, min_angle, False, factor_controls,
+                                                  coset_bits=coset_bits), 2) + swaps,
+                       bits_expoente)
+    return to_resources(bits_expoente + 2 * w + (0 if coset_bits else 2) + bool(factor_controls), cost)
+
+
+### ---------------------------------------------------------------- QROM / QROAM
+
+def _iteration_cost(h, lo, L, ctrl):
+    """
+    Portas da unary iteration (qrom._unary_iteration) sem as folhas, em O(h):
+    só o caminho da borda L é percorrido, sub-árvores cheias vão por fórmula.
+    """
+    if h == 0:
+        return Counter()
+    half = 1 << (h - 1)
+    if lo + half >= L:
+        return _iteration_cost(h - 1, lo, L, ctrl)
+    if not ctrl:
+        return (Counter(x=2) + _iteration_cost(h - 1, lo, L, True)
+                + _iteration_cost(h - 1, lo + half, L, True))
+    if lo + 2 * half <= L:
+        nodes = (1 << h) - 1                                      ### nós internos da sub-árvore cheia
+        return Counter(toffoli=2 * nodes, cnot=nodes, x=2 * nodes)
+    return (Counter(toffoli=2, cnot=1, x=2) + _iteration_cost(h - 1, lo, L, True)
+            + _iteration_cost(h - 1, lo + half, L, True))
+
+
+def _select_cost(n_blocks, n_addr, ones):
+    """unary iteration sobre n_blocks folhas que escrevem 'ones' bits 1 no total."""
+    cost = _iteration_cost(n_addr, 0, n_blocks, False)
+    cost += Counter(cnot=ones) if n_blocks > 1 else Counter(x=ones)
+    return cost
+
+
+def _lookup_cost(L, w_bits, lam, ones):
+    """qrom (lam = 1) ou qroam de L entradas com 'ones' bits 1 no total. depth = nº de portas."""
+    nA = ceil(log2(L)) if L > 1 else 0
+    if lam <= 1:
+        cost = _select_cost(L, nA, ones)
+    else:
+        lam = min(lam, 1 << nA)
+        k = lam.bit_length() - 1
+        n_blocks = ceil(L / lam)
+        select = _select_cost(n_blocks, nA - k, ones)
+        cost = select + Counter(toffoli=(lam - 1) * w_bits)       ### rede de cswaps até a cópia 0 (= out)
+    cost["depth"] = cost["toffoli"] + cost["cnot"] + cost.pop("x", 0)
+    return cost
+
+
+def estimate_qrom(table, w_bits, lam=1):
+    """
+    Recursos do lookup (qrom unary, ou qroam com lam cópias).
+    table: lista de valores, ou só o nº de entradas L (bits 1 estimados em w_bits/2 por entrada).
+    """
+    from qrom import lookup_ancillas
+
+    if isinstance(table, int):
+        L, ones = table, (table - 1) * w_bits / 2
+    else:
+        L, ones = len(table), sum(int(v).bit_count() for v in table)
+    nA = ceil(log2(L)) if L > 1 else 0
+    return to_resources(nA + w_bits + lookup_ancillas(L, w_bits, lam), _lookup_cost(L, w_bits, lam, ones))
+
+
+### ---------------------------------------------------------------- versões janeladas
+
+def _mult_mod_windowed_cost(n_bits, factors, N, c_mul, min_angle, lam, exact, coset_bits=0, arith="fourier"):
+    """
+    mult_mod_windowed_lookup com esses fatores (mult_mod_windowed: [0, a]).
+    factors: lista de fatores, ou só o nº de fatores (todos ≠ 0, bits 1 estimados).
+    coset_bits = m: b com n + m bits e soma draper_adder_qq comum no acc de n + m qubits.
+    arith = "ripple": sem QFT, somas adder_mod_qq_ripple / adder_qq_ripple (mbu=False).
+    """
+    n_f = factors if isinstance(factors, int) else len(factors)
+    b_len, acc_len = n_bits + coset_bits, n_bits + max(coset_bits, 1)
+    if arith == "ripple":
+        cost = Counter()
+        if coset_bits:
+            add = _ripple_cost(["q"] * n_bits + [0] * coset_bits)
+        else:
+            add = _adder_mod_qq_ripple_cost(n_bits, N)
+    else:
+        cost = _times(_qft_cost(acc_len, min_angle), 2)
+        if coset_bits:
+            add = _qq_adder_cost(n_bits, min_angle, acc_len)
+        else:
+            add = _adder_mod_qq_cost(n_bits, _n_rotations(N, n_bits, min_angle), min_angle)
+    for w in range(ceil(b_len / c_mul)):
+        lo   = w * c_mul
+        hi   = min((w + 1) * c_mul, b_len)
+        size = 1 << (hi - lo)
+        if exact and not isinstance(factors, int):
+            ones = sum(((f * k * (1 << lo)) % N).bit_count() for f in factors for k in range(size))
+        else:
+            nonzero = n_f if isinstance(factors, int) else sum(1 for f in factors if f % N)
+            ones = nonzero * (size - 1) * n_bits / 2
+        ### endereço = janela + c, lookup + soma + unlookup
+        cost += _times(_lookup_cost(n_f * size, n_bits, lam, ones), 2) + add
+    return cost
+
+
+def _mult_mod_windowed_qubits(n_bits, n_factors, c_mul, lam, coset_bits=0, arith="fourier"):
+    from qrom import lookup_ancillas
+    ### c + b + acc + anc + look + help + carry  (coset: b e acc com n + m, sem help; carry só no ripple)
+    n_c = ceil(log2(n_factors)) if n_factors > 1 else 0
+    b_len, acc_len = n_bits + coset_bits, n_bits + max(coset_bits, 1)
+    return (n_c + b_len + acc_len + lookup_ancillas(n_factors << min(c_mul, b_len), n_bits, lam)
+            + n_bits + (0 if coset_bits else 1) + (acc_len - 1 if arith == "ripple" else 0))
+
+
+def estimate_mult_mod_windowed(n_bits, a, N, c_mul=4, min_angle=0.0, lam=1, exact=None, coset_bits=0, arith="fourier"):
+    """Recursos do mult_mod_windowed (mbu=False)."""
+    cost = _mult_mod_windowed_cost(n_bits, [0, a], N, c_mul, min_angle, lam, _is_exact(exact, n_bits), coset_bits, arith)
+    return to_resources(_mult_mod_windowed_qubits(n_bits, 2, c_mul, lam, coset_bits, arith), cost)
+
+
+def estimate_mult_mod_windowed_lookup(n_bits, factors, N, c_mul=4, min_angle=0.0, lam=1, exact=None, coset_bits=0,
+                                      arith="fourier"):
+    """Recursos do mult_mod_windowed_lookup (factors: lista ou nº de fatores)."""
+    n_f = factors if isinstance(factors, int) else len(factors)
+    cost = _mult_mod_windowed_cost(n_bits, factors, N, c_mul, min_angle, lam, _is_exact(exact, n_bits), coset_bits, arith)
+    return to_resources(_mult_mod_windowed_qubits(n_bits, n_f, c_mul, lam, coset_bits, arith), cost)
+
+
+def estimate_expmod_windowed(N, base, n_exp, c_exp=3, c_mul=3, min_angle=0.0, lam=1, exact=None, coset_bits=0,
+                             arith="fourier"):
+    """Recursos do expmod_windowed: por janela do expoente, 2 multiplicações com lookup conjunto."""
+    n_bits = int(log2(N)) + 1
+    exact = _is_exact(exact, n_bits)
+    ### e + acc(n+1) + tmp(n+1) + anc + look + help  (= e + mult da maior janela, com acc/tmp no lugar de b/acc)
+    ### coset: acc/tmp com n + m (= b), sem help
+    qubits = (n_exp + _mult_mod_windowed_qubits(n_bits, 1 << min(c_exp, n_exp), c_mul, lam, coset_bits, arith)
+              - min(c_exp, n_exp) + (0 if coset_bits else 1))
+
+    if coset_bits:
+        cost = _coset_init_cost(n_bits, N, coset_bits, 1, min_angle) + _coset_init_cost(n_bits, N, coset_bits, 0, min_angle)
+    else:
+        cost = Counter(depth=1)                                   ### x no 1 inicial
+    windows = [min((w + 1) * c_exp, n_exp) - w * c_exp for w in range(ceil(n_exp / c_exp))]
+    if not exact:
+        ### todas as multiplicações custam igual: uma conta por largura de janela
+        for width in set(windows):
+            mult = _mult_mod_windowed_cost(n_bits, 1 << width, N, c_mul, min_angle, lam, False, coset_bits, arith)
+            cost += _times(mult, 2 * windows.count(width))
+        return to_resources(qubits, cost)
+
+    k_pow = base % N
+    for width in windows:
+        factors = [pow(k_pow, j, N) for j in range(1 << width)]
+        cost += _mult_mod_windowed_cost(n_bits, factors, N, c_mul, min_angle, lam, True, coset_bits, arith)
+        cost += _mult_mod_windowed_cost(n_bits, [(-pow(f, -1, N)) % N for f in factors], N, c_mul, min_angle,
+                                        lam, True, coset_bits, arith)
+        k_pow = pow(k_pow, 1 << width, N)
+    return to_resources(qubits, cost)
+
+
+### ---------------------------------------------------------------- medida de circuitos montados
+
+def count_circuit(qc):
+    """CircuitCounts de um circuito montado, na mesma convenção das estimativas (depth exata)."""
+    from streaming import circuit_stream, count_stream
+
+    return count_stream(circuit_stream(qc))
+
+
+if __name__ == "__main__":
+    from time import perf_counter
+    from draperqftadder_adapt import draper_adder, adder_mod, adder_mod_qq
+    from ctrl_mult_mod import ctrl_mult_mod
+    from expmod import expmod
+    from qrom import qrom, qroam
+    from mult_mod_windowed import mult_mod_windowed
+    from expmod_windowed import expmod_windowed
+    from adder_plain import adder_n, adder_mod_qq_ripple
+
+    def check(name, est, real):
+        ok = est[:5] == real[:5] and est.depth_bound >= real.depth
+        print(f"{name:38s} est {tuple(est)}  real {tuple(real)}  {'ok' if ok else 'ERRO'}")
+        assert ok, (name, est, real)
+
+    ### contagens exatas contra circuitos montados (casos pequenos)
+    for n, a, N, ma in ((4, 7, 13, 0.0), (5, 12, 21, 0.0), (6, 40, 55, 0.1)):
+        check(f"draper_adder n={n} a={a}", estimate_draper_adder(n, a, True, 2, ma),
+              count_circuit(draper_adder(n, a, True, control_number=2, min_angle=ma)))
+        for cn in (1, 2):
+            check(f"adder_mod n={n} a={a} N={N} c={cn}", estimate_adder_mod(n, a, N, True, cn, ma),
+                  count_circuit(adder_mod(n, a, N, True, cn, min_angle=ma)))
+        check(f"adder_mod n={n} a={a} N={N} sem ctrl", estimate_adder_mod(n, a, N, min_angle=ma),
+              count_circuit(adder_mod(n, a, N, min_angle=ma)))
+        check(f"adder_mod_qq n={n} N={N}", estimate_adder_mod_qq(n, N, ma), count_circuit(adder_mod_qq(n, N, ma)))
+        check(f"ctrl_mult_mod n={n} a={a} N={N}", estimate_ctrl_mult_mod(n, a, N, ma),
+              count_circuit(ctrl_mult_mod(n, a, N, ma)))
+        for mbu in (False, True):
+            check(f"ctrl_mult_mod n={n} a={a} N={N} and{' mbu' if mbu else ''}",
+                  estimate_ctrl_mult_mod(n, a, N, ma, factor_controls=True, mbu=mbu),
+                  count_circuit(ctrl_mult_mod(n, a, N, ma, factor_controls=True, mbu=mbu)))
+    for N, base, x in ((15, 7, 3), (21, 2, 4)):
+        check(f"expmod N={N} base={base} x={x}", estimate_expmod(N, base, x), count_circuit(expmod(N, base, x)))
+        check(f"expmod N={N} base={base} x={x} and", estimate_expmod(N, base, x, factor_controls=True),
+              count_circuit(expmod(N, base, x, factor_controls=True)))
+    for L, w, lam in ((5, 4, 1), (8, 6, 1), (13, 5, 1), (16, 5, 4), (11, 3, 2)):
+        table = [(7 * j * j + 3) % (1 << w) for j in range(L)]
+        qc = qrom(table, w) if lam == 1 else qroam(table, w, lam)
+        check(f"qrom L={L} w={w} lam={lam}", estimate_qrom(table, w, lam), count_circuit(qc))
+    for n, a, N, c, lam in ((4, 7, 13, 2, 1), (5, 12, 21, 3, 1), (5, 12, 21, 2, 2)):
+        check(f"mult_mod_windowed n={n} c={c} lam={lam}", estimate_mult_mod_windowed(n, a, N, c, lam=lam),
+              count_circuit(mult_mod_windowed(n, a, N, c, lam=lam)))
+    for N, base, ne, ce, cm in ((15, 2, 4, 2, 2), (21, 5, 5, 3, 2), (35, 3, 5, 2, 3)):
+        check(f"expmod_windowed N={N} ce={ce} cm={cm}", estimate_expmod_windowed(N, base, ne, ce, cm),
+              count_circuit(expmod_windowed(N, base, ne, ce, cm)))
+
+    ### representação em coset
+    for n, a, N, m, ma in ((4, 7, 13, 3, 0.0), (6, 40, 55, 4, 0.1)):
+        for fc in (False, True):
+            check(f"ctrl_mult_mod n={n} N={N} coset m={m}{' and' if fc else ''}",
+                  estimate_ctrl_mult_mod(n, a, N, ma, factor_controls=fc, coset_bits=m),
+                  count_circuit(ctrl_mult_mod(n, a, N, ma, factor_controls=fc, coset_bits=m)))
+        check(f"mult_mod_windowed n={n} N={N} coset m={m}", estimate_mult_mod_windowed(n, a, N, 3, ma, coset_bits=m),
+              count_circuit(mult_mod_windowed(n, a, N, 3, ma, coset_bits=m)))
+    check("expmod N=15 coset m=3", estimate_expmod(15, 7, 3, coset_bits=3), count_circuit(expmod(15, 7, 3, coset_bits=3)))
+    check("expmod_windowed N=21 coset m=3", estimate_expmod_windowed(21, 5, 5, 3, 2, coset_bits=3),
+          count_circuit(expmod_windowed(21, 5, 5, 3, 2, coset_bits=3)))
+
+    ### ripple-carry (adder_plain.py)
+    for n, c, N in ((5, 21, 29), (6, 45, 55), (8, 200, 251)):
+        for mbu in (False, True):
+            tag = " mbu" if mbu else ""
+            for ctrl in (False, True):
+                check(f"adder_n n={n} c={c}{' ctrl' if ctrl else ''}{tag}", estimate_adder_n(n, c, ctrl, mbu),
+                      count_circuit(adder_n(n, c, ctrl, mbu)))
+            check(f"adder_mod_qq_ripple n={n} N={N}{tag}", estimate_adder_mod_qq_ripple(n, N, mbu),
+                  count_circuit(adder_mod_qq_ripple(n, N, mbu)))
+    for n, a, N, c, m in ((4, 7, 13, 2, 0), (5, 12, 21, 3, 0), (4, 7, 13, 3, 3)):
+        check(f"mult_mod_windowed n={n} c={c} m={m} ripple",
+              estimate_mult_mod_windowed(n, a, N, c, coset_bits=m, arith="ripple"),
+              count_circuit(mult_mod_windowed(n, a, N, c, coset_bits=m, arith="ripple")))
+    for m in (0, 3):
+        check(f"expmod_windowed N=21 m={m} ripple", estimate_expmod_windowed(21, 5, 5, 3, 2, coset_bits=m, arith="ripple"),
+              count_circuit(expmod_windowed(21, 5, 5, 3, 2, coset_bits=m, arith="ripple")))
+
+    ### tamanho RSA (fórmula fechada)
+    N = (1 << 2047) + 1234567
+    for name, f in (("expmod", lambda: estimate_expmod(N, 3, 4096)),
+                    ("expmod_windowed", lambda: estimate_expmod_windowed(N, 3, 4096, 5, 5))):
+        t0 = perf_counter()
+        r = f()
+        print(f"{name:16s} N 2048 bits: {r}  {1e3 * (perf_counter() - t0):.1f} ms")
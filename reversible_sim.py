@@ -0,0 +1,200 @@
+# reversible_sim.py
+#
+# Simulador clássico (bit a bit) de circuitos reversíveis, vetorizado em NumPy.
+#
+#   adder_n, adder_mod_qq_ripple, qrom, qroam... só têm X / CX / CCX / MCX / SWAP / CSWAP, ou seja,
+#   são permutações da base computacional. Então não precisamos de statevector:
+#   basta empurrar cada estado da base pelo circuito.
+#
+#   Os estados são guardados "bit-sliced": o qubit q é uma linha de palavras
+#   uint64 e o bit j da palavra w é o valor do qubit q na entrada 64*w + j.
+#   Cada porta vira 1-3 operações lógicas sobre linhas inteiras, então 2^20
+#   entradas passam pelo circuito de uma vez (~16k palavras por qubit).
+#
+#   Uso:
+#       out = run_reversible(qrom(table, w), {"addr": np.arange(L)})
+#       out["out"]   --> table[addr]     (registradores sem entrada começam em 0)
+
+import numpy as np
+from itertools import product
+from qiskit.circuit import ControlledGate
+
+_SKIP = ("barrier", "id", "delay")
+
+
+def _flatten(qc, qubits=None, ops=None):
+    """
+    Desce nas definições até sobrar só X / X controlado / SWAP / SWAP controlado.
+    Retorna a lista de (tipo, controles, ctrl_state, alvos) com índices globais.
+    """
+    if qubits is None:
+        qubits = list(range(qc.num_qubits))
+    if ops is None:
+        ops = []
+    for inst in qc.data:
+        op = inst.operation
+        qs = [qubits[qc.find_bit(q).index] for q in inst.qubits]
+        if op.name in _SKIP:
+            continue
+        if inst.clbits or op.name in ("measure", "reset"):
+            raise ValueError(f"operação não reversível/clássica: {op.name}")
+        if op.name == "x":
+            ops.append(("x", (), 0, qs))
+        elif op.name == "swap":
+            ops.append(("swap", (), 0, qs))
+        elif isinstance(op, ControlledGate) and op.base_gate.name in ("x", "swap"):
+            k = op.num_ctrl_qubits
+            ops.append((op.base_gate.name, qs[:k], op.ctrl_state, qs[k:]))
+        elif op.definition is not None:
+            _flatten(op.definition, qs, ops)
+        else:
+            raise ValueError(f"porta não clássica: {op.name}")
+    return ops
+
+
+def pack(values, width, words):
+    """
+    Inteiros (batch,) --> linhas bit-sliced (width, words) uint64.
+    Entradas além de len(values) ficam 0 (padding).
+    """
+    vals = np.zeros(words * 64, dtype=np.uint64)
+    vals[:len(values)] = values
+    rows = np.empty((width, words), dtype=np.uint64)
+    for i in range(width):
+        bits = ((vals >> np.uint64(i)) & np.uint64(1)).astype(np.uint8)
+        rows[i] = np.packbits(bits, bitorder="little").view("<u8")
+    return rows
+
+
+def unpack(rows, batch):
+    """
+    Linhas bit-sliced (width, words) --> inteiros (batch,) uint64.
+    Acima de 64 bits retorna array de int do Python (dtype=object).
+    """
+    if len(rows) > 64:
+        vals = np.zeros(batch, dtype=object)
+        for i in range(0, len(rows), 64):
+            vals += unpack(rows[i:i + 64], batch).astype(object) << i
+        return vals
+    vals = np.zeros(batch, dtype=np.uint64)
+    for i, row in enumerate(rows):
+        bits = np.unpackbits(row.astype("<u8").view(np.uint8), bitorder="little")[:batch]
+        vals |= bits.astype(np.uint64) << np.uint64(i)
+    return vals
+
+
+def run_reversible(qc, inputs, batch=None):
+    """
+    Executa o circuito reversível qc sobre um lote de estados da base.
+
+    Parametros:
+    qc : QuantumCircuit
+        Só X, CX, CCX, MCX (qualquer ctrl_state), SWAP, CSWAP, ou portas cujas
+        definições se reduzem a elas. Qualquer outra porta gera ValueError.
+    inputs : dict
+        nome do registrador --> inteiro ou array de inteiros (little-endian,
+        como o Qiskit). Registradores ausentes começam em 0. Escalares são
+        repetidos para todo o lote.
+    batch : int, opcional
+        Tamanho do lote (default: maior array em inputs).
+
+    Retorna:
+    dict nome do registrador --> array (batch,) uint64 com o valor final
+    (dtype=object para registradores com mais de 64 qubits).
+    """
+    regs = {r.name: r for r in qc.qregs}
+    for name in inputs:
+        if name not in regs:
+            raise KeyError(f"registrador desconhecido: {name}")
+    if batch is None:
+        batch = max([np.size(v) for v in inputs.values()] + [1])
+    words = (batch + 63) // 64
+
+    ### estado inicial
+    state = np.zeros((qc.num_qubits, words), dtype=np.uint64)
+    for name, v in inputs.items():
+        if regs[name].size > 64:
+            raise ValueError(f"entrada em {name}: registradores de até 64 qubits")
+        v = np.broadcast_to(np.asarray(v, dtype=np.uint64), (batch,))
+        idx = [qc.find_bit(q).index for q in regs[name]]
+        state[idx] = pack(v, len(idx), words)
+
+    ### portas
+    for kind, ctrls, ctrl_state, tgts in _flatten(qc):
+        if ctrls:
+            mask = np.full(words, ~np.uint64(0))
+            for j, c in enumerate(ctrls):
+                mask &= state[c] if (ctrl_state >> j) & 1 else ~state[c]
+        if kind == "x":
+            if ctrls:
+                state[tgts[0]] ^= mask
+            else:
+                state[tgts[0]] = ~state[tgts[0]]
+        else:
+            a, b = tgts
+            diff = state[a] ^ state[b]
+            if ctrls:
+                diff &= mask
+            state[a] ^= diff
+            state[b] ^= diff
+
+    return {name: unpack(state[[qc.find_bit(q).index for q in r]], batch)
+            for name, r in regs.items()}
+
+
+def all_inputs(**ranges):
+    """
+    Produto cartesiano das entradas, no formato de run_reversible:
+        all_inputs(b=range(16), cin=range(2)) --> {"b": array(32), "cin": array(32)}
+    """
+    names = list(ranges)
+    grid = np.array(list(product(*[list(ranges[n]) for n in names])), dtype=np.uint64)
+    return {n: grid[:, i] for i, n in enumerate(names)}
+
+
+if __name__ == "__main__":
+    from time import perf_counter
+    from qrom import qrom, qroam
+    from adder_plain import adder_n, adder_qq_ripple, adder_mod_qq_ripple
+
+    rng = np.random.default_rng(1)
+
+    ### qrom / qroam: todas as entradas (addr, out inicial), out ⊕= table[addr], ancillas limpas
+    ### (qroam: out entra em 0 e as cópias ficam sujas até o inverso)
+    for nA, w in ((3, 4), (5, 7), (8, 12), (10, 20)):
+        L = 1 << nA
+        table = rng.integers(0, 1 << w, L)
+        for name, qc in (("qrom", qrom(table, w)), ("qroam", qroam(table, w, 4))):
+            out0 = rng.integers(0, 1 << w, 1 << 10) if name == "qrom" else [0]
+            inp = all_inputs(addr=range(L), out=out0)
+            t0 = perf_counter()
+            res = run_reversible(qc, inp)
+            dt = perf_counter() - t0
+            assert np.array_equal(res["out"], inp["out"] ^ table[inp["addr"]].astype(np.uint64)), (name, L)
+            assert not res["anc"].any() and np.array_equal(res["addr"], inp["addr"])
+            print(f"{name:5s} L = {L:5d} w = {w:2d}  {qc.num_qubits:3d} qubits  "
+                  f"{len(inp['addr']):8d} entradas  ok  {dt * 1e3:8.1f} ms")
+
+    ### adder_n / adder_qq_ripple / adder_mod_qq_ripple: tabelas-verdade completas
+    ### (carry, cout e anc devem voltar a 0)
+    for n in (1, 3, 4, 6, 8):
+        for const in sorted({0, 1, 3 % (1 << n), (1 << n) - 1, int(rng.integers(0, 1 << n))}):
+            for ctrl in (False, True):
+                inp = all_inputs(c=range(2), b=range(1 << n)) if ctrl else all_inputs(b=range(1 << n))
+                res = run_reversible(adder_n(n, const, ctrl), inp)
+                add = inp["c"].astype(np.int64) * const if ctrl else const
+                want = (inp["b"].astype(np.int64) + add) % (1 << n)
+                assert np.array_equal(res["b"].astype(np.int64), want) and not res["carry"].any(), (n, const, ctrl)
+        print(f"adder_n n = {n}: const 0, 1, 3, 2^n - 1 e uma aleatória, com e sem controle: ok")
+    for n, n_out in ((3, 4), (4, 4), (5, 9), (8, 9)):
+        inp = all_inputs(a=range(1 << n), b=range(1 << n_out))
+        res = run_reversible(adder_qq_ripple(n, n_out), inp)
+        assert np.array_equal(res["b"], (inp["a"] + inp["b"]) % (1 << n_out)) and not res["carry"].any(), (n, n_out)
+        print(f"adder_qq_ripple n = {n} n_out = {n_out}: {len(inp['a'])} entradas ok")
+    for N in (5, 13, 29, 221, 1021):
+        n = N.bit_length()
+        inp = all_inputs(a=range(N), b=range(N))
+        res = run_reversible(adder_mod_qq_ripple(n, N), inp)
+        assert np.array_equal(res["b"], (inp["a"] + inp["b"]) % N), N
+        assert not (res["cout"].any() or res["anc"].any() or res["carry"].any()), N
+        print(f"adder_mod_qq_ripple N = {N:4d}: {len(inp['a']):7d} entradas ok")
@@ -0,0 +1,342 @@
+# shor_emulation.py
+#
+# Modo de emulação da busca de ordem (Shor): em vez de simular expmod + IQFT, sorteia as
+# medidas do registrador "resultado" direto da distribuição exata, que só depende da
+# ordem r de base mod N (calculada classicamente, multiplicative_order).
+#
+#   Q = 2^x_bits. O estado (1/√Q) Σ_x |x⟩|base^x mod N⟩, IQFT no x e medida dão
+#       P(y) = [ (Q mod r) F(M + 1, u) + (r - Q mod r) F(M, u) ] / Q²
+#       u = r y mod Q,  M = Q // r,  F(m, u) = sin²(π m u/Q) / sin²(π u/Q)  (m² em u = 0)
+#   (o resíduo s = x mod r tem M + 1 ou M termos). Sorteio vetorizado em NumPy, sem
+#   vetor de 2^x_bits entradas:
+#       1) m = M + 1 com prob. (Q mod r)(M + 1)/Q, senão m = M
+#       2) u é múltiplo de g = gcd(r, Q): v = u/g em (-L/2, L/2], L = Q/g, com peso
+#          sin²(π m v/L) / sin²(π v/L), por rejeição com o envelope min(m², L²/4v²)
+#          (miolo uniforme + cauda ~1/v², aceitação ~1/2)
+#       3) y = v c⁻¹ mod L + j L, c = r/g (ímpar), j uniforme em [0, g)
+#   N de 40+ bits (x_bits = 2n > 64, y como int do python) em milissegundos.
+#
+#   EmulatedSampler tem a interface do SamplerV2 usada nos notebooks:
+#       job = EmulatedSampler().run([(N, base, x_bits)], shots=8192)
+#       counts = job.result()[0].data.resultado.get_int_counts()
+#   order_finding_distribution(r, x_bits) dá o vetor P(y) inteiro (x_bits pequeno),
+#   usado para conferir contra os circuitos (python shor_emulation.py).
+
+from collections import Counter
+from math import gcd, lcm, pi
+import numpy as np
+from qiskit.primitives.containers import BitArray, DataBin, SamplerPubResult, PrimitiveResult
+
+_MR_BASES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37)     ### determinístico até 3.3e24
+
+
+def _is_prime(n):
+    if n < 2:
+        return False
+    for p in _MR_BASES:
+        if n % p == 0:
+            return n == p
+    d, s = n - 1, 0
+    while d % 2 == 0:
+        d, s = d // 2, s + 1
+    for a in _MR_BASES:
+        x = pow(a, d, n)
+        if x in (1, n - 1):
+            continue
+        for _ in range(s - 1):
+            x = x * x % n
+            if x == n - 1:
+                break
+        else:
+            return False
+    return True
+
+
+def _pollard_brent(n, seed=1):
+    """Um fator não trivial de n (composto, ímpar)."""
+    c = seed
+    while True:
+        y, m, g, r, q = 2, 128, 1, 1, 1
+        f = lambda v: (v * v + c) % n
+        while g == 1:
+            x = y
+            for _ in range(r):
+                y = f(y)
+            k = 0
+            while k < r and g == 1:
+                ys = y
+                for _ in range(min(m, r - k)):
+                    y = f(y)
+                    q = q * abs(x - y) % n
+                g = gcd(q, n)
+                k += m
+            r *= 2
+        if g == n:
+            g = 1
+            while g == 1:
+                ys = f(ys)
+                g = gcd(abs(x - ys), n)
+        if g != n:
+            return g
+        c += 1
+
+
+def factorize(n):
+    """{primo: expoente} de n (divisão por primos pequenos + Pollard rho)."""
+    factors = Counter()
+    for p in range(2, 1000):
+        while n % p == 0:
+            factors[p] += 1
+            n //= p
+    stack = [n] if n > 1 else []
+    while stack:
+        m = stack.pop()
+        if _is_prime(m):
+            factors[m] += 1
+        else:
+            d = _pollard_brent(m)
+            stack += [d, m // d]
+    return dict(factors)
+
+
+def carmichael(N):
+    """λ(N): menor expoente com a^λ ≡ 1 (mod N) para todo a coprimo de N."""
+    lam = 1
+    for p, k in factorize(N).items():
+        if p == 2:
+            lam = lcm(lam, 1 if k == 1 else 2 if k == 2 else 1 << (k - 2))
+        else:
+            lam = lcm(lam, (p - 1) * p ** (k - 1))
+    return lam
+
+
+def multiplicative_order(base, N):
+    """Ordem r de base mod N (menor r > 0 com base^r ≡ 1), a partir de λ(N)."""
+    if gcd(base, N) != 1:
+        raise ValueError(f"base {base} não é coprima de N = {N}")
+    r = carmichael(N)
+    for p in factorize(r):
+        while r % p == 0 and pow(base, r // p, N) == 1:
+            r //= p
+    return r
+
+
+def order_finding_distribution(r, x_bits):
+    """Vetor P(y), y < 2^x_bits, da busca de ordem com ordem r (x_bits pequeno)."""
+    Q = 1 << x_bits
+    M, rem = divmod(Q, r)
+    u = (r * np.arange(Q, dtype=object)) % Q
+    a = u.astype(float) / float(Q)
+    den = np.sin(pi * a) ** 2
+    zero = u == 0
+    den[zero] = 1.0
+
+    def F(m):
+        return np.where(zero, float(m * m), np.sin(pi * m * a) ** 2 / den)
+
+    return (rem * F(M + 1) + (r - rem) * F(M)) / float(Q) ** 2
+
+
+def _uniform_int(rng, n, size):
+    """size inteiros uniformes em [0, n) (int64, ou int do python se n >= 2^62)."""
+    n = np.broadcast_to(np.asarray(n, dtype=object), (size,))
+    if all(v < (1 << 62) for v in n):
+        return rng.integers(0, n.astype(np.int64), size)
+    bits = max(int(v).bit_length() for v in n) + 30
+    out = np.zeros(size, dtype=object)
+    for i in range(0, bits, 30):
+        out += rng.integers(0, 1 << 30, size).astype(object) << i
+    return out % n                                  ### viés < 2^-30
+
+
+def sample_order_finding(N, base, x_bits, shots, seed=None, r=None):
+    """
+    Sorteia shots medidas y do registrador de expoente (x_bits qubits) da busca de ordem
+    de base mod N, com a distribuição exata (ver cabeçalho).
+
+    Parametros:
+    N, base : int
+        Módulo e base (coprimos).
+    x_bits : int
+        Qubits do expoente (Q = 2^x_bits).
+    shots : int
+        Nº de medidas.
+    seed : int ou np.random.Generator
+        Semente.
+    r : int
+        Ordem já conhecida (default: multiplicative_order(base, N)).
+
+    Retorna:
+    np.ndarray de y (int64 se x_bits <= 62, senão object com int do python)
+    """
+    rng = np.random.default_rng(seed)
+    r = multiplicative_order(base, N) if r is None else r
+    Q = 1 << x_bits
+    g = gcd(r, Q)
+    L, c = Q // g, r // g
+    M, rem = divmod(Q, r)
+
+    v = np.zeros(shots, dtype=object)
+    if L > 1 and c > 1:
+        ### 1) nº de termos do resíduo
+        m = np.full(shots, M, dtype=object)
+        m[rng.random(shots) < rem * (M + 1) / Q] += 1
+        ### 2) v por rejeição, só nos shots ainda pendentes
+        todo = np.arange(shots)
+        while todo.size:
+            mt = m[todo]
+            v0 = np.array([min(L // (2 * int(x)), L // 2) if x else L // 2 for x in mt], dtype=object)
+            full = v0 == L // 2                              ### miolo = domínio inteiro
+            n_mid = np.where(full, np.array(L, dtype=object), 2 * v0 + 1)
+            mid_mass = n_mid.astype(float) * (mt.astype(float) ** 2)
+            tail_mass = np.where(full, 0.0, float(L) ** 2 / (2 * np.maximum(v0, 1).astype(float)))
+            mid = rng.random(todo.size) * (mid_mass + tail_mass) < mid_mass
+
+            cand = np.empty(todo.size, dtype=object)
+            k = np.zeros(todo.size, dtype=object)
+            if mid.any():
+                low = np.where(full[mid], np.array(1 - L // 2, dtype=object), -v0[mid])
+                cand[mid] = low + _uniform_int(rng, n_mid[mid], int(mid.sum()))
+            if (~mid).any():
+                ### cauda: X ~ v0/U (densidade ∝ 1/x² em [v0, ∞)), |v| = ceil(X)
+                X = v0[~mid].astype(float) / (1.0 - rng.random(int((~mid).sum())))
+                kk = np.array([int(x) for x in np.floor(X)], dtype=object) + 1
+                big = X >= 2.0**52                           ### bits baixos perdidos no float
+                if big.any():
+                    kk[big] += _uniform_int(rng, [int(s) for s in np.spacing(X[big])], int(big.sum()))
+                k[~mid] = kk
+                sign = np.where(rng.random(int((~mid).sum())) < 0.5, -1, 1).astype(object)
+                cand[~mid] = kk * sign
+
+            ### aceita com prob. peso / envelope (cauda fora de (-L/2, L/2] é rejeitada)
+            inside = np.array([-(L // 2) < int(x) <= L // 2 for x in cand])
+            a0 = cand.astype(float) / float(L)
+            a1 = ((mt * cand) % L).astype(float) / float(L)
+            s0 = np.sin(pi * a0) ** 2
+            w = np.where(cand == 0, mt.astype(float) ** 2, np.sin(pi * a1) ** 2 / np.where(s0 > 0, s0, 1.0))
+            kf = np.maximum(k.astype(float), 2.0)
+            env = np.where(mid, mt.astype(float) ** 2, float(L) ** 2 / 4 * (1 / (kf - 1) - 1 / kf))
+            ok = inside & (rng.random(todo.size) * env < w)
+            v[todo[ok]] = cand[ok]
+            todo = todo[~ok]
+
+    ### 3) y com r y ≡ g v (mod Q)
+    y = (v * pow(c, -1, L)) % L if L > 1 else v
+    y = y + _uniform_int(rng, g, shots).astype(object) * L if g > 1 else y
+    return y.astype(np.int64) if x_bits <= 62 else y
+
+
+def emulate_order_finding(N, base, x_bits, shots=1024, seed=None, r=None):
+    """Histograma {y: contagem} como get_int_counts() do registrador "resultado"."""
+    return dict(Counter(int(y) for y in sample_order_finding(N, base, x_bits, shots, seed, r)))
+
+
+class _EmulatedJob:
+    def __init__(self, result):
+        self._result = result
+
+    def result(self):
+        return self._result
+
+    def status(self):
+        return "DONE"
+
+
+class EmulatedSampler:
+    """Sampler com a interface do SamplerV2 para a busca de ordem emulada.
+
+    Cada pub é (N, base, x_bits) ou (N, base, x_bits, shots); o resultado tem o
+    registrador "resultado" (BitArray de x_bits bits), como nos notebooks.
+    """
+
+    def __init__(self, default_shots=1024, seed=None):
+        self.default_shots = default_shots
+        self._rng = np.random.default_rng(seed)
+
+    def run(self, pubs, *, shots=None):
+        results = []
+        for pub in pubs:
+            N, base, x_bits, *rest = pub
+            n_shots = rest[0] if rest else shots if shots is not None else self.default_shots
+            r = multiplicative_order(base, N)
+            y = sample_order_finding(N, base, x_bits, n_shots, self._rng, r)
+            bits = BitArray.from_samples([int(v) for v in y], num_bits=x_bits)
+            results.append(SamplerPubResult(DataBin(resultado=bits),
+                                            metadata={"shots": n_shots, "order": r, "emulated": True}))
+        return _EmulatedJob(PrimitiveResult(results, metadata={"version": 2}))
+
+
+if __name__ == "__main__":
+    from time import perf_counter
+    from fractions import Fraction
+    from qiskit import QuantumCircuit, ClassicalRegister, transpile
+    from qiskit.circuit.library import QFTGate
+    from qiskit_aer import AerSimulator
+    from qiskit_aer.primitives import SamplerV2 as Sampler
+    from expmod import expmod
+
+    backend = AerSimulator()
+
+    ### circuito do power_mod_QFT_normal.ipynb (expmod + IQFT): probabilidades exatas do
+    ### registrador x (save_probabilities) == order_finding_distribution
+    for N, base, x_bits in ((15, 7, 4), (15, 2, 5), (21, 2, 5), (21, 5, 6)):
+        core = expmod(N, base, x_bits)
+        qc = QuantumCircuit(*core.qregs)
+        qc.h(core.qregs[0])
+        qc.x(core.qregs[1][0])
+        qc.compose(core, inplace=True)
+        qc.append(QFTGate(x_bits).inverse(), core.qregs[0])
+        qc.save_probabilities(core.qregs[0])
+        probs = backend.run(transpile(qc, backend)).result().data()["probabilities"]
+        r = multiplicative_order(base, N)
+        diff = np.max(np.abs(np.asarray(probs) - order_finding_distribution(r, x_bits)))
+        assert diff < 1e-6, (N, base, x_bits, diff)
+        print(f"N = {N} base = {base} x_bits = {x_bits} (r = {r}): |P_circuito - P_exata| <= {diff:.1e}")
+
+    ### amostras: emulador vs Sampler do Aer no mesmo circuito (distância de variação total)
+    N, base, x_bits, shots = 21, 2, 6, 8192
+    core = expmod(N, base, x_bits)
+    res = ClassicalRegister(x_bits, "resultado")
+    qc = QuantumCircuit(*core.qregs, res)
+    qc.h(core.qregs[0])
+    qc.x(core.qregs[1][0])
+    qc.compose(core, inplace=True)
+    qc.append(QFTGate(x_bits).inverse(), core.qregs[0])
+    qc.measure(core.qregs[0], res)
+    t0 = perf_counter()
+    real = Sampler().run([transpile(qc, backend)], shots=shots).result()[0].data.resultado.get_int_counts()
+    t_real = perf_counter() - t0
+    t0 = perf_counter()
+    emu = EmulatedSampler(seed=1).run([(N, base, x_bits)], shots=shots).result()[0].data.resultado.get_int_counts()
+    t_emu = perf_counter() - t0
+    exact = order_finding_distribution(multiplicative_order(base, N), x_bits)
+    tv_real = 0.5 * sum(abs(real.get(y, 0) / shots - exact[y]) for y in range(1 << x_bits))
+    tv_emu = 0.5 * sum(abs(emu.get(y, 0) / shots - exact[y]) for y in range(1 << x_bits))
+    print(f"N = {N} x_bits = {x_bits}, {shots} shots: TV(Aer, exata) = {tv_real:.3f} em {t_real:.1f} s, "
+          f"TV(emulador, exata) = {tv_emu:.3f} em {1e3 * t_emu:.1f} ms")
+    assert tv_emu < 0.05
+
+    ### sorteio por rejeição == distribuição exata (x_bits médio, muitos shots)
+    for N, base, x_bits in ((55, 2, 12), (221, 3, 14), (1_048_573 * 3, 2, 10)):
+        r = multiplicative_order(base, N)
+        exact = order_finding_distribution(r, x_bits)
+        y = sample_order_finding(N, base, x_bits, 200_000, seed=2, r=r)
+        tv = 0.5 * np.abs(np.bincount(y, minlength=1 << x_bits) / y.size - exact).sum()
+        noise = np.sqrt(2 / pi) * 0.5 * np.sqrt(exact * (1 - exact) / y.size).sum()   ### E[TV] só de amostragem
+        print(f"N = {N} x_bits = {x_bits} (r = {r}): TV(emulador, exata) = {tv:.4f} (ruído de 200000 shots ~ {noise:.4f})")
+        assert tv < 1.2 * noise + 1e-3
+
+    ### N de 40+ bits, x_bits = 2n: sorteio + frações contínuas
+    for p, q in ((1_048_573, 1_048_571), (2_147_483_647, 2_147_483_629)):
+        N = p * q
+        n = N.bit_length()
+        for base in (2, 3):
+            t0 = perf_counter()
+            r = multiplicative_order(base, N)
+            counts = emulate_order_finding(N, base, 2 * n, shots=1000, seed=3, r=r)
+            t_s = perf_counter() - t0
+            dens = [Fraction(y, 1 << (2 * n)).limit_denominator(N).denominator for y in counts]
+            hits = sum(c for y, c in counts.items()
+                       if pow(base, Fraction(y, 1 << (2 * n)).limit_denominator(N).denominator, N) == 1)
+            print(f"N {n} bits base = {base}: r = {r}, 1000 shots em {1e3 * t_s:.1f} ms, "
+                  f"denominador = r em {hits / 10:.0f}% dos shots, lcm = r: {lcm(*dens[:20]) % r == 0}")
@@ -0,0 +1,167 @@
+# shor_semiclassical.py
+#
+# Busca de ordem (Shor) com um único qubit de controle reciclado
+# (IQFT semi-clássica, Griffiths & Niu 1996), tirado do power_mod_1_bit_QFT.ipynb.
+#
+#   Em vez de x_bits qubits de expoente + IQFT, o mesmo qubit x é usado x_bits
+#   vezes: H, ctrl_mult_mod por A^(2^i), correções de fase condicionadas nos bits
+#   já medidos, H, medida e reset. Do maior i para o menor, então o primeiro bit
+#   medido é o menos significativo de y.
+#
+#   Qubits: 2n + 3 (contra x_bits + 2n + 2 do expmod com registrador completo).
+#   Saída igual à do notebook: registrador clássico "resultado", lido com
+#       job.result()[0].data.resultado.get_int_counts()   --> {y: contagem}
+#   com y/2^x_bits ≈ k/r.
+
+from math import log2, pi
+from qiskit import QuantumCircuit, QuantumRegister, ClassicalRegister
+from ctrl_mult_mod import ctrl_mult_mod_gate, ctrl_mult_mod_error
+from draperqftadder_adapt import approx_metadata
+
+
+def semi_classical_QFT_inv(qc, q_reg, c_reg):
+    """ Aplica a IQFT semi clássica
+
+    qc : QuantumCircuit
+        Circuito quântico para aplicar a IQFT
+    q_reg : QuantumRegister
+        Registrador quântico para a qft ser aplicada
+    c_reg : ClassicalRegister
+        Registrador clássico para a medição dos qubits
+    """
+    n = len(q_reg)
+    for i in range(n-1, -1, -1):
+        _phase_corrections(qc, q_reg[i], c_reg, n, i)
+        qc.h(q_reg[i])
+        qc.measure(q_reg[i], c_reg[n-1-i])
+
+
+def semi_classical_QFT_inv_1_bit(qc, q_reg, c_reg, n):
+    """ Aplica a IQFT semi clássica em um qubit (medido n vezes)
+
+    qc : QuantumCircuit
+        Circuito quântico para aplicar a IQFT
+    q_reg : QuantumRegister
+        Registrador quântico para a qft ser aplicada (será aplicada no 1o bit)
+    c_reg : ClassicalRegister
+        Registrador clássico para a medição dos qubits
+    n : int
+        Número de bits na IQFT original
+    """
+    for i in range(n-1, -1, -1):
+        _phase_corrections(qc, q_reg[0], c_reg, n, i)
+        qc.h(q_reg[0])
+        qc.measure(q_reg[0], c_reg[n-1-i])
+
+
+def _phase_corrections(qc, qubit, c_reg, n, i):
+    """Fases -pi/2^(j-i) condicionadas nos bits j > i já medidos (c_reg[n-1-j])."""
+    for j in range(n-1, i, -1):
+        with qc.if_test((c_reg[n-1-j], 1)):
+            qc.p(-pi/(2**(j-i)), qubit)
+
+
+def order_finding(N, A, x_bits=None, min_angle=0.0):
+    """Circuito de busca de ordem de A mod N com um qubit de controle reciclado.
+
+    Parametros:
+    N : int
+        Módulo (N = p*q).
+    A : int
+        Base do expoente, coprima de N.
+    x_bits : int
+        Nº de bits medidos (tamanho da amostra 2**x_bits). Default 2*n_bits.
+    min_angle : float
+        Repassado aos ctrl_mult_mod (modo aproximado); cota do erro em qc.metadata.
+
+    Retorna:
+    QuantumCircuit
+        2*n_bits + 3 qubits: x (1) | b (n_bits) | 0 (n_bits) | cout (1) | help (1)
+        e o registrador clássico "resultado" (x_bits bits, o primeiro medido é o bit 0).
+    """
+    n_bits = int(log2(N)) + 1
+    if x_bits is None:
+        x_bits = 2 * n_bits
+
+    reg_x = QuantumRegister(1, "x")
+    reg_b = QuantumRegister(n_bits, "b")
+    reg_0 = QuantumRegister(n_bits, "0")
+    reg_cout = QuantumRegister(1, "cout")
+    reg_help = QuantumRegister(1, "help")
+    reg_result = ClassicalRegister(x_bits, "resultado")
+
+    qc = QuantumCircuit(reg_x, reg_b, reg_0, reg_cout, reg_help, reg_result, name="order_finding")
+
+    qc.x(reg_b[0])          # b = 1
+
+    error = 0.0
+    for i in range(x_bits-1, -1, -1):
+        a_i = pow(A, 2**i, N)
+        a_inv = pow(a_i, -1, N)
+
+        qc.h(reg_x[0])
+        qc.append(ctrl_mult_mod_gate(n_bits, a_i, N, min_angle=min_angle),
+                  reg_x[:] + reg_b[:] + reg_0[:] + reg_cout[:] + reg_help[:])
+        qc.append(ctrl_mult_mod_gate(n_bits, a_inv, N, inverse=True, min_angle=min_angle),
+                  reg_x[:] + reg_0[:] + reg_b[:] + reg_cout[:] + reg_help[:])
+        for j in range(n_bits):
+            qc.cswap(reg_x[0], reg_b[j], reg_0[j])
+        error += ctrl_mult_mod_error(n_bits, a_i, N, min_angle) + ctrl_mult_mod_error(n_bits, a_inv, N, min_angle)
+
+        _phase_corrections(qc, reg_x[0], reg_result, x_bits, i)
+        qc.h(reg_x[0])
+        qc.measure(reg_x[0], reg_result[x_bits-1-i])
+        qc.reset(reg_x[0])
+
+    qc.metadata = approx_metadata(error)
+    return qc
+
+
+def run_order_finding(N, A, x_bits=None, shots=1024, backend=None, min_angle=0.0):
+    """Monta, transpila e amostra order_finding no backend; devolve get_int_counts() do "resultado".
+
+    O Sampler roda no próprio backend (método, ruído e opções do AerSimulator dado;
+    BackendSamplerV2 para backends que não são do Aer).
+    """
+    from qiskit import transpile
+    from qiskit.primitives import BackendSamplerV2
+    from qiskit_aer import AerSimulator
+    from qiskit_aer.primitives import SamplerV2 as Sampler
+
+    if backend is None:
+        backend = AerSimulator()
+    if isinstance(backend, AerSimulator):
+        sampler = Sampler.from_backend(backend)
+    else:
+        sampler = BackendSamplerV2(backend=backend)
+    qc = transpile(order_finding(N, A, x_bits, min_angle), backend=backend)
+    job = sampler.run([qc], shots=shots)
+    return job.result()[0].data.resultado.get_int_counts()
+
+
+if __name__ == "__main__":
+    from fractions import Fraction
+
+    ### picos em y/2^t ≈ k/r: conta a fração dos shots a menos de 1/2^(t+1) de algum k/r
+    for N, A, r in ((15, 7, 4), (21, 2, 6)):
+        t = 2 * (int(log2(N)) + 1)
+        counts = run_order_finding(N, A, shots=64)
+        near = sum(c for y, c in counts.items()
+                   if any(abs(y / 2**t - k / r) <= 1 / 2**(t + 1) for k in range(r + 1)))
+        found = {Fraction(y, 2**t).limit_denominator(N).denominator for y in counts}
+        print(f"N = {N} A = {A} (r = {r}): {order_finding(N, A).num_qubits} qubits, "
+              f"{near / 64:.0%} dos shots em k/r, denominadores {sorted(found)}")
+        assert r in found
+
+    ### o Sampler usa o backend dado: com ruído de depolarização total toda medida é uniforme
+    from qiskit_aer import AerSimulator
+    from qiskit_aer.noise import NoiseModel, depolarizing_error
+    from qiskit.providers.fake_provider import GenericBackendV2
+    noise = NoiseModel()
+    noise.add_all_qubit_quantum_error(depolarizing_error(1.0, 1), ["h"])
+    counts = run_order_finding(15, 7, shots=256, backend=AerSimulator(noise_model=noise))
+    assert len(counts) > 4, counts           ### sem ruído só saem os 4 picos k/4
+    print(f"N = 15 com ruído no h: {len(counts)} valores de y distintos")
+    backend = GenericBackendV2(num_qubits=12, control_flow=True, seed=1)
+    counts = run_order_finding(15, 7, shots=64, backend=backend)
+    print(f"N = 15 em GenericBackendV2 ({backend.num_qubits} qubits, BackendSamplerV2): {sum(counts.values())} shots")
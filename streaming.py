@@ -0,0 +1,472 @@
+# streaming.py
+#
+# Versões em gerador de expmod / expmod_windowed: devolvem as portas básicas
+# (as mesmas em que resources.count_circuit desce: h, x, z, p, cp, mcphase, cx, ccx,
+# mcx, cswap, measure, reset) uma por vez, sem montar o QuantumCircuit.
+#
+#   Os geradores repetem os laços dos builders (como resources.py) até o nível das
+#   portas: QFT/IQFT viram h/cp direto da fórmula e os draper_adder viram fases
+#   (draper_angles), então a memória é O(nº de qubits) para qualquer N, em vez do
+#   circuito inteiro (e das definições no cache de portas).
+#
+#   Um Stream é (name, qregs, cregs, ops), com ops um iterável de
+#       (operation, (índices dos qubits), (índices dos clbits))
+#   que só pode ser consumido uma vez:
+#
+#       write_qasm3(expmod_stream(N, base, x), "expmod.qasm")     # OpenQASM 3, linha a linha
+#       write_qpy(expmod_stream(N, base, x), "expmod.qpy")        # QPY em blocos de chunk_size portas
+#       count_stream(expmod_stream(N, base, x))                   # CircuitCounts, memória constante
+#
+#   circuit_stream(qc) faz o mesmo para um circuito já montado (descendo nas
+#   definições sob demanda) e read_qpy(path) devolve os blocos gravados por write_qpy.
+
+import io
+import struct
+from collections import Counter, namedtuple
+from math import ceil, log2, pi, ldexp
+from qiskit import QuantumCircuit, QuantumRegister, ClassicalRegister, qpy
+from qiskit.circuit import ControlledGate
+from qiskit.circuit.library import HGate, XGate, CXGate, CCXGate, CSwapGate, PhaseGate
+from draperqftadder_adapt import draper_angles, qft_approximation_degree, rotation_cutoff
+from qrom import qrom_ops, qroam_ops, lookup_ancillas
+
+Stream = namedtuple("Stream", ["name", "qregs", "cregs", "ops"])
+
+_BASIC = ("x", "h", "z", "p", "measure", "reset")
+_CTRL_BASE = ("x", "p", "swap", "z")
+
+
+def iter_flat(qc, qubits=None, clbits=None):
+    """Desce nas definições de qc (sob demanda) até as portas básicas; gera (operation, qubits, clbits)."""
+    if qubits is None:
+        qubits = tuple(range(qc.num_qubits))
+    if clbits is None:
+        clbits = tuple(range(qc.num_clbits))
+    for inst in qc.data:
+        op = inst.operation
+        if op.name == "barrier":
+            continue
+        qs = tuple(qubits[qc.find_bit(q).index] for q in inst.qubits)
+        cs = tuple(clbits[qc.find_bit(c).index] for c in inst.clbits)
+        if (isinstance(op, ControlledGate) and op.base_gate.name in _CTRL_BASE) \
+                or op.name in _BASIC or op.definition is None:
+            yield op, qs, cs
+        else:
+            yield from iter_flat(op.definition, qs, cs)
+
+
+def circuit_stream(qc):
+    """Stream de um circuito já montado."""
+    return Stream(qc.name, qc.qregs, qc.cregs, iter_flat(qc))
+
+
+def _num_bits(regs):
+    return sum(len(r) for r in regs)
+
+
+def _layout(regs):
+    """Índice global do primeiro qubit de cada registrador."""
+    start, out = 0, {}
+    for r in regs:
+        out[r.name] = start
+        start += len(r)
+    return out
+
+
+##  QFT(m, do_swaps=False) / IQFT do qft_gate, direto da fórmula
+def _qft_ops(qs, inverse=False, min_angle=0.0):
+    m = len(qs)
+    d_max = m - 1 - qft_approximation_degree(m, min_angle)      ### maior distância j - k mantida
+    if not inverse:
+        for j in reversed(range(m)):
+            yield HGate(), (qs[j],), ()
+            for k in range(j - 1, max(j - d_max, 0) - 1, -1):
+                yield PhaseGate(ldexp(pi, -(j - k))).control(1), (qs[j], qs[k]), ()
+    else:
+        for j in range(m):
+            for k in range(max(j - d_max, 0), j):
+                yield PhaseGate(-ldexp(pi, -(j - k))).control(1), (qs[j], qs[k]), ()
+            yield HGate(), (qs[j],), ()
+
+
+##  draper_adder (merge_angles) de a: uma fase (controlada) por alvo
+def _draper_ops(n_bits, a, ctrl, targets, inverse=False, min_angle=0.0):
+    angles = draper_angles(n_bits, a, min_angle=min_angle)
+    for t in (reversed(range(n_bits + 1)) if inverse else range(n_bits + 1)):
+        if angles[t] != 0:
+            gate = PhaseGate(-angles[t] if inverse else angles[t])
+            if ctrl:
+                gate = gate.control(len(ctrl))
+            yield gate, tuple(ctrl) + (targets[t],), ()
+
+
+##  draper_adder_qq: cp(a_j, alvo j + d) por diagonal d
+def _draper_qq_ops(n_bits, a, targets, inverse=False, min_angle=0.0):
+    k_max = rotation_cutoff(min_angle)
+    d_max = n_bits if k_max is None else min(n_bits, k_max)
+    pairs = [(d, j) for d in range(d_max + 1) for j in range(min(n_bits, n_bits + 1 - d))]
+    for d, j in (reversed(pairs) if inverse else pairs):
+        yield PhaseGate(-ldexp(pi, -d) if inverse else ldexp(pi, -d)).control(1), (a[j], targets[j + d]), ()
+
+
+##  adder_mod_qq (a quântico, b + cout na base de Fourier)
+def _adder_mod_qq_ops(n_bits, N, a, b, anc, min_angle=0.0):
+    cout = b[-1]
+    yield from _draper_qq_ops(n_bits, a, b, False, min_angle)
+    yield from _draper_ops(n_bits, N, (), b, True, min_angle)
+    yield from _qft_ops(b, True, min_angle)
+    yield CXGate(), (cout, anc), ()
+    yield from _qft_ops(b, False, min_angle)
+    yield from _draper_ops(n_bits, N, (anc,), b, False, min_angle)
+    yield from _draper_qq_ops(n_bits, a, b, True, min_angle)
+    yield from _qft_ops(b, True, min_angle)
+    yield CXGate(ctrl_state=0), (cout, anc), ()
+    yield from _qft_ops(b, False, min_angle)
+    yield from _draper_qq_ops(n_bits, a, b, False, min_angle)
+
+
+##  adder_mod controlado (controlado=True, control_number = len(ctrl))
+def _adder_mod_ops(n_bits, a, N, ctrl, b, anc, inverse=False, min_angle=0.0):
+    ### b = reg_b + cout (n_bits + 1 qubits)
+    ctrl, cout = tuple(ctrl), b[-1]
+    blocks = [("add", a, ctrl, False), ("add", N, ctrl, True), ("qft", True),
+              ("gate", CXGate(), (cout, anc)), ("qft", False),
+              ("add", N, (anc,), False), ("add", a, ctrl, True), ("qft", True),
+              ("gate", XGate(), (cout,)), ("gate", XGate().control(len(ctrl) + 1), ctrl + (cout, anc)),
+              ("gate", XGate(), (cout,)), ("qft", False), ("add", a, ctrl, False)]
+    for kind, *args in (reversed(blocks) if inverse else blocks):
+        if kind == "add":
+            x, c, inv = args
+            yield from _draper_ops(n_bits, x, c, b, inv != inverse, min_angle)
+        elif kind == "qft":
+            yield from _qft_ops(b, args[0] != inverse, min_angle)
+        else:
+            gate, qs = args
+            yield (gate.inverse() if inverse else gate), qs, ()
+
+
+def _ctrl_mult_mod_ops(n_bits, a, N, c, b, zero, help_q, inverse=False, min_angle=0.0, and_q=None):
+    ### zero = reg_0 (n_bits + 1 qubits); a inversa também começa pela QFT
+    ### and_q: qubit do AND(c, b_i) (factor_controls), adder com 1 controle entre dois ccx
+    yield from _qft_ops(zero, False, min_angle)
+    for i in (reversed(range(n_bits)) if inverse else range(n_bits)):
+        if and_q is None:
+            yield from _adder_mod_ops(n_bits, ((2**i) * a) % N, N, (c, b[i]), zero, help_q, inverse, min_angle)
+            continue
+        yield CCXGate(), (c, b[i], and_q), ()
+        yield from _adder_mod_ops(n_bits, ((2**i) * a) % N, N, (and_q,), zero, help_q, inverse, min_angle)
+        yield CCXGate(), (c, b[i], and_q), ()
+    yield from _qft_ops(zero, True, min_angle)
+
+
+def expmod_stream(N, base, bits_expoente, min_angle=0.0, factor_controls=False):
+    """Stream de expmod(N, base, bits_expoente, min_angle, factor_controls) (mesmos registradores e portas)."""
+    n_bits = int(log2(N)) + 1
+    qregs = [QuantumRegister(bits_expoente, "x"), QuantumRegister(n_bits, "b"),
+             QuantumRegister(n_bits, "0"), QuantumRegister(1, "cout"), QuantumRegister(1, "help")]
+    if factor_controls:
+        qregs.append(QuantumRegister(1, "and"))
+    pos = _layout(qregs)
+    and_q = pos.get("and")
+    reg_b = tuple(range(pos["b"], pos["b"] + n_bits))
+    reg_0 = tuple(range(pos["0"], pos["0"] + n_bits))
+    cout, help_q = pos["cout"], pos["help"]
+
+    def ops():
+        for i in range(bits_expoente):
+            a_i = pow(base, 2**i, N)
+            x_i = pos["x"] + i
+            yield from _ctrl_mult_mod_ops(n_bits, a_i, N, x_i, reg_b, reg_0 + (cout,), help_q, False, min_angle,
+                                          and_q)
+            yield from _ctrl_mult_mod_ops(n_bits, pow(a_i, -1, N), N, x_i, reg_0, reg_b + (cout,), help_q,
+                                          True, min_angle, and_q)
+            for j in range(n_bits):
+                yield CSwapGate(), (x_i, reg_0[j], reg_b[j]), ()
+
+    return Stream("expmod", qregs, [], ops())
+
+
+def _lookup_ops(table, w_bits, lam, qs, inverse=False):
+    ### qs = addr | out | anc (com lam > 1: addr | out | cópias | anc), como lookup_gate
+    nA = ceil(log2(len(table))) if len(table) > 1 else 0
+    addr, out = qs[:nA], qs[nA:nA + w_bits]
+    if lam <= 1:
+        yield from qrom_ops(table, addr, out, qs[nA + w_bits:], inverse)
+        return
+    n_copies = (min(lam, 1 << nA) - 1) * w_bits
+    yield from qroam_ops(table, addr, out, qs[nA + w_bits:nA + w_bits + n_copies], qs[nA + w_bits + n_copies:], lam,
+                         inverse)
+
+
+def _mult_mod_windowed_ops(n_bits, factors, N, c_mul, qs, min_angle=0.0, lam=1):
+    ### mult_mod_windowed_lookup: qs = c (⌈log2 len(factors)⌉) | b (n_bits) | acc (n_bits + 1) | anc | look | help
+    n_c = ceil(log2(len(factors))) if len(factors) > 1 else 0
+    c = qs[:n_c]
+    reg_b = qs[n_c:n_c + n_bits]
+    acc = qs[n_c + n_bits:n_c + 2 * n_bits + 1]
+    anc = qs[n_c + 2 * n_bits + 1:-n_bits - 1]
+    look, help_q = qs[-n_bits - 1:-1], qs[-1]
+    yield from _qft_ops(acc, False, min_angle)
+    for w in range(ceil(n_bits / c_mul)):
+        lo = w * c_mul
+        hi = min((w + 1) * c_mul, n_bits)
+        size = 1 << (hi - lo)
+        tbl = [(f * k * (1 << lo)) % N for f in factors for k in range(size)]
+        wires = reg_b[lo:hi] + c + look + anc[:lookup_ancillas(len(tbl), n_bits, lam)]
+        yield from _lookup_ops(tbl, n_bits, lam, wires)
+        yield from _adder_mod_qq_ops(n_bits, N, look, acc, help_q, min_angle)
+        yield from _lookup_ops(tbl, n_bits, lam, wires, inverse=True)
+    yield from _qft_ops(acc, True, min_angle)
+
+
+def expmod_windowed_stream(N, base, n_exp, c_exp=3, c_mul=3, min_angle=0.0, lam=1):
+    """Stream de expmod_windowed(N, base, n_exp, c_exp, c_mul, min_angle, lam) (janelas inteiras)."""
+    n_bits = int(log2(N)) + 1
+    w_exp = ceil(n_exp / c_exp)
+    qregs = [QuantumRegister(n_exp, "e"), QuantumRegister(n_bits + 1, "acc"),
+             QuantumRegister(n_bits + 1, "tmp"),
+             QuantumRegister(lookup_ancillas(1 << (min(c_exp, n_exp) + min(c_mul, n_bits)), n_bits, lam), "anc"),
+             QuantumRegister(n_bits, "look"), QuantumRegister(1, "help")]
+    pos = _layout(qregs)
+    acc = tuple(range(pos["acc"], pos["acc"] + n_bits + 1))
+    tmp = tuple(range(pos["tmp"], pos["tmp"] + n_bits + 1))
+    anc = tuple(range(pos["anc"], pos["anc"] + len(qregs[3])))
+    look = tuple(range(pos["look"], pos["look"] + n_bits))
+
+    def ops():
+        cur, other = (acc, tmp) if w_exp % 2 == 0 else (tmp, acc)
+        yield XGate(), (cur[0],), ()
+        for w in range(w_exp):
+            lo = w * c_exp
+            hi = min((w + 1) * c_exp, n_exp)
+            k_pow = pow(base, 1 << lo, N)
+            addr = tuple(pos["e"] + q for q in range(lo, hi))
+            factors = [pow(k_pow, j, N) for j in range(1 << (hi - lo))]
+            minus_inv = [(-pow(f, -1, N)) % N for f in factors]
+            work = anc[:lookup_ancillas(len(factors) << min(c_mul, n_bits), n_bits, lam)] + look + (pos["help"],)
+            yield from _mult_mod_windowed_ops(n_bits, factors, N, c_mul, addr + cur[:-1] + other + work, min_angle, lam)
+            yield from _mult_mod_windowed_ops(n_bits, minus_inv, N, c_mul, addr + other[:-1] + cur + work,
+                                              min_angle, lam)
+            cur, other = other, cur
+
+    return Stream("expmodW", qregs, [], ops())
+
+
+##  escrita
+
+_STD_CTRL = {("x", 1): "cx", ("x", 2): "ccx", ("p", 1): "cp", ("z", 1): "cz", ("swap", 1): "cswap"}
+
+
+def _qasm_angle(x):
+    return repr(float(x))
+
+
+def _qasm_line(op, qs, cs):
+    q = ", ".join(f"q[{i}]" for i in qs)
+    if op.name == "measure":
+        return f"c[{cs[0]}] = measure q[{qs[0]}];\n"
+    if op.name == "reset":
+        return f"reset {q};\n"
+    if isinstance(op, ControlledGate):
+        base = op.base_gate
+        params = f"({_qasm_angle(base.params[0])})" if base.params else ""
+        k = op.num_ctrl_qubits
+        if op.ctrl_state == (1 << k) - 1 and (base.name, k) in _STD_CTRL:
+            return f"{_STD_CTRL[base.name, k]}{params} {q};\n"
+        ### senão um modificador ctrl / negctrl por grupo de controles iguais (ctrl_state little-endian)
+        mods = []
+        states = [(op.ctrl_state >> i) & 1 for i in range(k)]
+        i = 0
+        while i < k:
+            j = i
+            while j < k and states[j] == states[i]:
+                j += 1
+            word = "ctrl" if states[i] else "negctrl"
+            mods.append(word if j - i == 1 else f"{word}({j - i})")
+            i = j
+        return " @ ".join(mods) + f" @ {base.name}{params} {q};\n"
+    if op.name in ("x", "h", "z"):
+        return f"{op.name} {q};\n"
+    if op.name == "p":
+        return f"p({_qasm_angle(op.params[0])}) {q};\n"
+    raise ValueError(f"porta sem tradução para OpenQASM 3: {op.name}")
+
+
+def write_qasm3(stream, path):
+    """Grava o stream em OpenQASM 3, uma porta por linha.
+
+    Portas do stdgates.inc (h, x, p, cx, ccx, cp, cswap, ...) e, para mcx/mcphase e
+    controles em 0, os modificadores ctrl(k) @ / negctrl @.
+
+    Um único registrador q (e c para as medidas); os registradores originais ficam em comentário.
+    Retorna o nº de portas escritas.
+    """
+    n_q, n_c = _num_bits(stream.qregs), _num_bits(stream.cregs)
+    count = 0
+    with open(path, "w") as f:
+        f.write(f"OPENQASM 3.0;\ninclude \"stdgates.inc\";\n// {stream.name}\n")
+        for reg, start in _layout(stream.qregs).items():
+            f.write(f"// {reg} = q[{start}:{start + len(_reg(stream.qregs, reg)) - 1}]\n")
+        f.write(f"qubit[{n_q}] q;\n")
+        if n_c:
+            f.write(f"bit[{n_c}] c;\n")
+        for op, qs, cs in stream.ops:
+            f.write(_qasm_line(op, qs, cs))
+            count += 1
+    return count
+
+
+def _reg(regs, name):
+    return next(r for r in regs if r.name == name)
+
+
+def _chunk(stream):
+    return QuantumCircuit(*[QuantumRegister(len(r), r.name) for r in stream.qregs],
+                          *[ClassicalRegister(len(r), r.name) for r in stream.cregs], name=stream.name)
+
+
+def write_qpy(stream, path, chunk_size=100_000):
+    """Grava o stream como uma sequência de circuitos QPY (chunk_size portas cada) no mesmo arquivo.
+
+    Cada bloco é um QPY completo precedido do seu tamanho (8 bytes, big-endian).
+    Só um bloco fica na memória. Ler de volta com read_qpy(path). Retorna o nº de blocos.
+    """
+    def dump(qc):
+        buf = io.BytesIO()
+        qpy.dump(qc, buf)
+        f.write(struct.pack(">Q", buf.tell()))
+        f.write(buf.getvalue())
+
+    n_chunks = 0
+    with open(path, "wb") as f:
+        qc = _chunk(stream)
+        for op, qs, cs in stream.ops:
+            qc._append(op, [qc.qubits[i] for i in qs], [qc.clbits[i] for i in cs])
+            if len(qc.data) >= chunk_size:
+                dump(qc)
+                n_chunks += 1
+                qc = _chunk(stream)
+        if qc.data or not n_chunks:
+            dump(qc)
+            n_chunks += 1
+    return n_chunks
+
+
+def read_qpy(path):
+    """Gera os circuitos (blocos) gravados por write_qpy, na ordem."""
+    with open(path, "rb") as f:
+        while header := f.read(8):
+            (size,) = struct.unpack(">Q", header)
+            yield from qpy.load(io.BytesIO(f.read(size)))
+
+
+##  contagem
+
+def count_stream(stream):
+    """CircuitCounts do stream (convenção de resources.count_circuit), com memória O(qubits + clbits).
+
+    A profundidade é a do circuito achatado (camada mais alta por fio).
+    """
+    from resources import CircuitCounts, mcx_toffoli, to_resources
+
+    n_q = _num_bits(stream.qregs)
+    level = [0] * (n_q + _num_bits(stream.cregs))
+    cost = Counter()
+    for op, qs, cs in stream.ops:
+        if isinstance(op, ControlledGate) and op.base_gate.name == "x":
+            k = op.num_ctrl_qubits
+            cost["toffoli" if k >= 2 else "cnot"] += mcx_toffoli(k) if k >= 2 else 1
+        elif isinstance(op, ControlledGate) and op.base_gate.name == "swap":
+            cost["toffoli"] += 1
+        elif op.name == "p" or (isinstance(op, ControlledGate) and op.base_gate.name == "p"):
+            cost["rotations"] += 1
+        wires = qs + tuple(n_q + c for c in cs)
+        d = max(level[w] for w in wires) + 1
+        for w in wires:
+            level[w] = d
+    cost["depth"] = max(level, default=0)
+    return CircuitCounts(*to_resources(n_q, cost))
+
+
+def to_circuit(stream):
+    """Monta o stream num QuantumCircuit plano (só para casos pequenos / conferência)."""
+    qc = _chunk(stream)
+    for op, qs, cs in stream.ops:
+        qc._append(op, [qc.qubits[i] for i in qs], [qc.clbits[i] for i in cs])
+    return qc
+
+
+if __name__ == "__main__":
+    import os
+    import tempfile
+    from itertools import islice
+    from time import perf_counter
+    from qiskit import qasm3
+    from qiskit.quantum_info import Operator
+    from expmod import expmod
+    from expmod_windowed import expmod_windowed
+    from draperqftadder_adapt import adder_mod
+    from resources import count_circuit, estimate_expmod
+    from benchmark import native_peak
+
+    def same(s, qc):
+        key = lambda op, qs, cs: (op.name, [float(p) for p in op.params], qs, cs)
+        return [key(*o) for o in s.ops] == [key(*o) for o in iter_flat(qc)]
+
+    ### mesmas portas (nome, parâmetros, qubits) que os builders, achatados
+    for N, base, x, ma in ((15, 7, 3, 0.0), (21, 2, 2, 0.0), (55, 3, 2, 0.2)):
+        assert same(expmod_stream(N, base, x, ma), expmod(N, base, x, ma)), (N, base, x, ma)
+        assert count_stream(expmod_stream(N, base, x, ma)) == count_circuit(expmod(N, base, x, ma))
+        assert same(expmod_stream(N, base, x, ma, True), expmod(N, base, x, ma, True)), (N, base, x, ma)
+    for N, base, n_exp, ce, cm, lam in ((15, 7, 4, 2, 2, 1), (21, 2, 3, 2, 3, 1), (13, 6, 3, 3, 2, 2)):
+        assert same(expmod_windowed_stream(N, base, n_exp, ce, cm, lam=lam),
+                    expmod_windowed(N, base, n_exp, ce, cm, lam=lam)), (N, base, n_exp, ce, cm, lam)
+    print("streams == builders achatados (expmod, expmod_windowed)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ### QPY em blocos: ida e volta
+        path = os.path.join(tmp, "expmod.qpy")
+        n_chunks = write_qpy(expmod_stream(15, 7, 2), path, chunk_size=500)
+        back = QuantumCircuit(*expmod_stream(15, 7, 2).qregs)
+        for chunk in read_qpy(path):
+            back.compose(chunk, inplace=True)
+        assert same(expmod_stream(15, 7, 2), back)
+        print(f"QPY: {n_chunks} blocos, mesmas portas de expmod(15, 7, 2)")
+
+        ### OpenQASM 3: o importador do qiskit não lê modificadores, confere com um adder_mod com 1 controle
+        path = os.path.join(tmp, "adder.qasm")
+        qc = adder_mod(3, 5, 7, controlado=True)
+        write_qasm3(circuit_stream(qc), path)
+        assert Operator(qasm3.load_experimental(path)).equiv(Operator(qc))
+        print("OpenQASM 3: adder_mod(3, 5, 7, controlado=True) lido de volta com o mesmo Operator")
+
+        ### N grande: memória constante (expmod de 64 bits montado teria ~10^5 portas por multiplicação no cache).
+        ### Memória pelo RSS (benchmark.native_peak): o CircuitData do qiskit 2 fica em Rust, fora do tracemalloc
+        N = (1 << 63) + 29
+        res = {}
+
+        def write_and_count():
+            t0 = perf_counter()
+            res["n_ops"] = write_qasm3(expmod_stream(N, 5, 1, min_angle=1e-3), os.path.join(tmp, "big.qasm"))
+            res["t_write"] = perf_counter() - t0
+            res["r"] = count_stream(expmod_stream(N, 5, 1, min_angle=1e-3))
+
+        peak = native_peak(write_and_count)
+        r, est = res["r"], estimate_expmod(N, 5, 1, min_angle=1e-3)
+        assert r[:5] == est[:5] and r.depth <= est.depth_bound, (r, est)
+        assert peak < 20, peak
+        size = os.path.getsize(os.path.join(tmp, "big.qasm")) / 2**20
+        print(f"expmod 64 bits, 1 bit de expoente: {res['n_ops']} portas, {size:.0f} MB de QASM em "
+              f"{res['t_write']:.1f} s, RSS +{peak:.1f} MB; contagem == estimate_expmod")
+
+    ### expmod_windowed 2048 bits, c_exp = c_mul = 5: lookups de 1024 entradas x 2048 bits (densas).
+    ### As primeiras 1.2M portas cobrem uma QFT truncada e o primeiro lookup inteiro; montar o
+    ### qrom como circuito custaria ~100 MB de RSS só nele
+    N = (1 << 2047) + 1155
+    s = expmod_windowed_stream(N, pow(3, 1 << 1500, N), 10, 5, 5, min_angle=1e-3)
+    head = Stream(s.name, s.qregs, s.cregs, islice(s.ops, 1_200_000))
+    t0 = perf_counter()
+    peak = native_peak(lambda: res.update(r=count_stream(head)))
+    assert res["r"].toffoli >= 2 * 1024 - 4 and peak < 20, (res["r"], peak)
+    print(f"expmod_windowed 2048 bits, lookups de 1024 x 2048 bits: 1.2M portas em {perf_counter() - t0:.1f} s, "
+          f"RSS +{peak:.1f} MB")
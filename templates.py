@@ -0,0 +1,218 @@
+# templates.py
+#
+# Templates parametrizados de adder_mod / ctrl_mult_mod / expmod.
+#
+#   Com merge_angles o draper_adder só tem uma fase por alvo, e no modo template
+#   (draper_adder(angles=...)) ele emite todas as n_bits + 1 fases, inclusive as
+#   nulas. Então a estrutura do circuito só depende de n_bits: as constantes
+#   (a, N, base) entram como valores de Parameter.
+#
+#   Monta (e transpila) uma vez por (n_bits, control_number, ...), depois é só
+#   bind(template, valores), sem reconstruir nem transpilar de novo:
+#
+#       tpl = transpiled_template("ctrl_mult_mod", AerSimulator(), n_bits=7)
+#       for a in bases:
+#           qc = bind(tpl, ctrl_mult_mod_values(7, a, 77))
+#
+#   Os parâmetros são ParameterVectors:
+#       adder_mod     : "a" (n+1), "N" (n+1)
+#       ctrl_mult_mod : "a" (n*(n+1), bloco i = a*2^i mod N), "N" (n+1)
+#       expmod        : "a" / "ainv" (x*n*(n+1), multiplicador de cada bit), "N" (n+1)
+#   e os valores são dicionários nome --> lista (ver *_values).
+#
+#   A cota de erro do modo aproximado depende das constantes, então os templates não
+#   têm approx_error; *_values traz em "metadata" a cota dos valores (a, N) e o bind
+#   a copia para o circuito ligado.
+
+from math import log2
+from qiskit import QuantumCircuit, QuantumRegister, transpile
+from qiskit.circuit import ParameterVector
+from draperqftadder_adapt import adder_mod, qft_gate, draper_angles, adder_mod_error, approx_metadata
+from ctrl_mult_mod import ctrl_mult_mod_error
+from gate_cache import GateCache
+from disk_cache import target_id
+
+TEMPLATE_CACHE = GateCache(maxsize=64)
+
+
+def adder_mod_template(n_bits, controlado=True, control_number=1, min_angle=0.0):
+    """adder_mod com os ângulos de a e N como ParameterVectors "a" e "N" (n_bits + 1 cada)."""
+    def build():
+        a = ParameterVector("a", n_bits + 1)
+        N = ParameterVector("N", n_bits + 1)
+        qc = adder_mod(n_bits, 0, 0, controlado, control_number, min_angle=min_angle,
+                       a_angles=a, N_angles=N)
+        qc.metadata = {}        ### a cota do adder_mod(0, 0) não vale para os valores ligados
+        return qc
+    return TEMPLATE_CACHE.get(("adder_mod", n_bits, controlado, control_number, min_angle), build)
+
+
+def adder_mod_values(n_bits, a, N, min_angle=0.0):
+    return {"a": draper_angles(n_bits, a, min_angle=min_angle),
+            "N": draper_angles(n_bits, N, min_angle=min_angle),
+            "metadata": approx_metadata(adder_mod_error(n_bits, a, N, min_angle))}
+
+
+def ctrl_mult_mod_template(n_bits, min_angle=0.0):
+    """ctrl_mult_mod com os adder_mod (control_number=2) em modo template. Mesmos registradores."""
+    def build():
+        a = ParameterVector("a", n_bits * (n_bits + 1))
+        N = ParameterVector("N", n_bits + 1)
+
+        reg_control = QuantumRegister(1, "c")
+        reg_b = QuantumRegister(n_bits, "b")
+        reg_0 = QuantumRegister(n_bits + 1, "0")
+        reg_help = QuantumRegister(1, "help")
+        qc = QuantumCircuit(reg_control, reg_b, reg_0, reg_help, name="mult_mod")
+
+        qc.append(qft_gate(n_bits + 1, min_angle=min_angle), reg_0)
+        for i in range(n_bits):
+            block = adder_mod(n_bits, 0, 0, True, 2, min_angle=min_angle,
+                              a_angles=a[i * (n_bits + 1):(i + 1) * (n_bits + 1)], N_angles=N)
+            qc.append(block.to_gate(), reg_control[:] + reg_b[i:i+1] + reg_0[:] + reg_help[:])
+        qc.append(qft_gate(n_bits + 1, inverse=True, min_angle=min_angle), reg_0)
+        return qc
+    return TEMPLATE_CACHE.get(("ctrl_mult_mod", n_bits, min_angle), build)
+
+
+def ctrl_mult_mod_values(n_bits, a, N, min_angle=0.0):
+    angles = []
+    for i in range(n_bits):
+        angles += draper_angles(n_bits, ((2**i) * a) % N, min_angle=min_angle)
+    return {"a": angles, "N": draper_angles(n_bits, N, min_angle=min_angle),
+            "metadata": approx_metadata(ctrl_mult_mod_error(n_bits, a, N, min_angle))}
+
+
+def expmod_template(n_bits, bits_expoente, min_angle=0.0):
+    """expmod (mesmos registradores) com um ctrl_mult_mod template por multiplicação."""
+    def build():
+        size = n_bits * (n_bits + 1)
+        a = ParameterVector("a", bits_expoente * size)
+        ainv = ParameterVector("ainv", bits_expoente * size)
+        N = ParameterVector("N", n_bits + 1)
+        base = ctrl_mult_mod_template(n_bits, min_angle)
+        base_a, base_N = _vectors(base)
+
+        reg_x = QuantumRegister(bits_expoente, "x")
+        reg_b = QuantumRegister(n_bits, "b")
+        reg_0 = QuantumRegister(n_bits, "0")
+        reg_cout = QuantumRegister(1, "cout")
+        reg_help = QuantumRegister(1, "help")
+        qc = QuantumCircuit(reg_x, reg_b, reg_0, reg_cout, reg_help, name="expmod")
+
+        for i in range(bits_expoente):
+            ### mesmo template, parâmetros renomeados para o bloco i
+            mult = base.assign_parameters({**dict(zip(base_a, a[i * size:(i + 1) * size])),
+                                           **dict(zip(base_N, N))}).to_gate()
+            mult_inv = base.assign_parameters({**dict(zip(base_a, ainv[i * size:(i + 1) * size])),
+                                               **dict(zip(base_N, N))}).to_gate().inverse()
+            qc.append(mult, reg_x[i:i+1] + reg_b[:] + reg_0[:] + reg_cout[:] + reg_help[:])
+            qc.append(mult_inv, reg_x[i:i+1] + reg_0[:] + reg_b[:] + reg_cout[:] + reg_help[:])
+            for j in range(n_bits):
+                qc.cswap(reg_x[i], reg_0[j], reg_b[j])
+        return qc
+    return TEMPLATE_CACHE.get(("expmod", n_bits, bits_expoente, min_angle), build)
+
+
+def expmod_values(N, base, bits_expoente, min_angle=0.0):
+    n_bits = int(log2(N)) + 1
+    a, ainv, error = [], [], 0.0
+    for i in range(bits_expoente):
+        a_i = pow(base, 2**i, N)
+        a_inv = pow(a_i, -1, N)
+        a += ctrl_mult_mod_values(n_bits, a_i, N, min_angle)["a"]
+        ainv += ctrl_mult_mod_values(n_bits, a_inv, N, min_angle)["a"]
+        error += ctrl_mult_mod_error(n_bits, a_i, N, min_angle) + ctrl_mult_mod_error(n_bits, a_inv, N, min_angle)
+    return {"a": a, "ainv": ainv, "N": draper_angles(n_bits, N, min_angle=min_angle),
+            "metadata": approx_metadata(error)}
+
+
+def _vectors(qc):
+    """ParameterVectors "a" e "N" de um template (ordenados pelo índice)."""
+    by_name = {}
+    for p in qc.parameters:
+        by_name.setdefault(p.vector.name, []).append(p)
+    return [sorted(by_name[name], key=lambda p: p.index) for name in ("a", "N")]
+
+
+_BUILDERS = {"adder_mod": adder_mod_template, "ctrl_mult_mod": ctrl_mult_mod_template,
+             "expmod": expmod_template}
+
+
+def transpiled_template(kind, backend, **kwargs):
+    """
+    Template kind ("adder_mod", "ctrl_mult_mod", "expmod") transpilado para backend, em cache.
+    A chave é a descrição do alvo (disk_cache.target_id), não só backend.name.
+    """
+    key = ("transpiled", kind, repr(target_id(backend, None)), tuple(sorted(kwargs.items())))
+    return TEMPLATE_CACHE.get(key, lambda: transpile(_BUILDERS[kind](**kwargs), backend))
+
+
+def bind(template, values):
+    """Atribui os valores (nome do ParameterVector --> lista) a um template, transpilado ou não.
+
+    values["metadata"] (cota de erro das constantes, ver *_values) vai para o circuito ligado.
+    """
+    bound = template.assign_parameters({p: values[p.vector.name][p.index] for p in template.parameters})
+    bound.metadata = dict(values.get("metadata", {}))
+    return bound
+
+
+if __name__ == "__main__":
+    from time import perf_counter
+    from qiskit.quantum_info import Operator
+    from qiskit_aer import AerSimulator
+    from ctrl_mult_mod import ctrl_mult_mod
+    from expmod import expmod
+    from fourier_sim import run_fourier
+    from gate_cache import cache_clear
+
+    ### template ligado == builder normal
+    for n, a, N in ((3, 3, 7), (3, 5, 7), (4, 7, 13)):
+        ok = Operator(bind(ctrl_mult_mod_template(n), ctrl_mult_mod_values(n, a, N))).equiv(
+            Operator(ctrl_mult_mod(n, a, N)))
+        assert ok, (n, a, N)
+    for N, base, x in ((15, 7, 4), (21, 2, 3)):
+        n = int(log2(N)) + 1
+        for qc in (expmod(N, base, x), bind(expmod_template(n, x), expmod_values(N, base, x))):
+            out, _ = run_fourier(qc, {"x": list(range(1 << x)), "b": 1})
+            assert list(out["b"]) == [pow(base, e, N) for e in range(1 << x)]
+    print("templates ligados conferem com ctrl_mult_mod / expmod")
+
+    ### cota de erro do modo aproximado: a do bind é a do builder com as mesmas constantes
+    for kind, n, a, N in (("adder_mod", 6, 45, 59), ("ctrl_mult_mod", 6, 45, 59)):
+        tpl = {"adder_mod": adder_mod_template, "ctrl_mult_mod": ctrl_mult_mod_template}[kind](n, min_angle=0.05)
+        vals = {"adder_mod": adder_mod_values, "ctrl_mult_mod": ctrl_mult_mod_values}[kind](n, a, N, min_angle=0.05)
+        real = adder_mod(n, a, N, True, min_angle=0.05) if kind == "adder_mod" else ctrl_mult_mod(n, a, N, min_angle=0.05)
+        got = bind(tpl, vals).metadata["approx_error"]
+        assert abs(got - real.metadata["approx_error"]) < 1e-12 and "approx_error" not in tpl.metadata, kind
+        print(f"{kind} n = {n} a = {a} N = {N} min_angle = 0.05: approx_error do bind = {got:.3f} (builder {real.metadata['approx_error']:.3f})")
+
+    ### varredura de bases (N = 77): rebuild + transpile vs bind do template transpilado
+    backend = AerSimulator()
+    N, n = 77, 7
+    bases = [b for b in range(2, 20) if b % 7 and b % 11]
+
+    t0 = perf_counter()
+    for b in bases:
+        cache_clear()
+        transpile(ctrl_mult_mod(n, b, N), backend)
+    t_full = perf_counter() - t0
+
+    t0 = perf_counter()
+    tpl = transpiled_template("ctrl_mult_mod", backend, n_bits=n)
+    t_tpl = perf_counter() - t0
+    t0 = perf_counter()
+    for b in bases:
+        bind(tpl, ctrl_mult_mod_values(n, b, N))
+    t_bind = perf_counter() - t0
+    print(f"{len(bases)} bases, N = {N}: build + transpile {t_full:.2f} s  |  "
+          f"template {t_tpl:.2f} s (uma vez) + bind {t_bind:.2f} s")
+
+    ### cache por alvo: dois AerSimulator com o mesmo nome e alvos diferentes (base cx/u, coupling map em linha)
+    line = AerSimulator(basis_gates=["cx", "u"],
+                        coupling_map=[[i, i + 1] for i in range(27)] + [[i + 1, i] for i in range(27)])
+    t_all, t_line = transpiled_template("adder_mod", backend, n_bits=3), transpiled_template("adder_mod", line, n_bits=3)
+    assert t_all is not t_line and t_all is transpiled_template("adder_mod", AerSimulator(), n_bits=3)
+    assert set(t_line.count_ops()) <= {"cx", "u"}
+    print("transpiled_template: um template por alvo (base / coupling map), não por backend.name")
@@ -1,7 +1,8 @@
 ## #test.py
-from qiskit import QuantumCircuit, ClassicalRegister, transpile
+from qiskit import QuantumCircuit, ClassicalRegister
 from qiskit_aer import AerSimulator
 from expmod_windowed import expmod_windowed
+from disk_cache import cached_circuit
 
 ### parâmetros da exponenciação
 N       = 15          ## módulo
@@ -10,18 +11,19 @@ n_e     = 4           ## nº de qubits do expoente
 c_exp   = 2           ## janela sobre o expoente
 c_mul   = 2           ## janela dentro das multiplicações
 
-## #gera o circuito unitário 
-circ = expmod_windowed(N, base, n_e, c_exp, c_mul)
+## #gera o circuito unitário e acrescenta medições em TODOS os qubits
+def expmod_windowed_measured(N, base, n_e, c_exp, c_mul):
+    circ = expmod_windowed(N, base, n_e, c_exp, c_mul)
+    creg = ClassicalRegister(circ.num_qubits, "meas")
+    circ.add_register(creg)
+    circ.measure(range(circ.num_qubits), range(circ.num_clbits))
+    return circ
 
-## #acrescenta medições em TODOS os qubits
-creg = ClassicalRegister(circ.num_qubits, "meas")
-circ.add_register(creg)
-circ.measure(range(circ.num_qubits), range(circ.num_clbits))
 
-
-## #simulacao 
+## #simulacao (circuito e transpile em cache no disco, ver disk_cache.py)
 backend = AerSimulator()
-tcirc    = transpile(circ, backend)
+circ     = cached_circuit(expmod_windowed_measured, N, base, n_e, c_exp, c_mul)
+tcirc    = cached_circuit(expmod_windowed_measured, N, base, n_e, c_exp, c_mul, backend=backend)
 result   = backend.run(tcirc).result()
 counts   = result.get_counts()
 